@@ -1,16 +1,34 @@
 import time
 import math
-import numpy as np
+import threading
 import pandas as pd
 import pyotp
 from SmartApi import SmartConnect
 import google.generativeai as genai
+from candle_store import CandleStore, fetch_with_store
+from resample import TimeframeCache
+from poller import InstrumentPoller
+from tick_feed import SmartWebSocketSource, TickFeed
+from sentiment import GeminiBackend, SentimentService
+from latency import LatencyRecorder
+from live_engine import LiveEngine
+from position_book import PositionBook
+from instruments import SCRIP_MASTER_FILE, InstrumentMaster, downloaded_on, downloaded_today
+import warm_start
+from scalp_strategy import (
+    RSI_PERIOD, ATR_PERIOD, ADX_PERIOD, MACD_SHORT, MACD_LONG, MACD_SIGNAL, VWAP_LOOKBACK,
+    INDICATOR_SMOOTHING, WARMUP_BARS, LONG, SHORT, scalp_indicator_state, sl_tp_levels, snapshot_signal,
+)
 from config import GEMINI_API_KEY, api_key, client_id, password, totp_key
 
 genai.configure(api_key=GEMINI_API_KEY)
 
 gemini_model = genai.GenerativeModel("gemini-1.5-flash")
 
+# Sentiment is refreshed in the background and cached per underlying
+SENTIMENT_TTL = 300  # Seconds before a cached sentiment is refreshed
+sentiment_service = SentimentService(GeminiBackend(gemini_model), ttl=SENTIMENT_TTL)
+
 # =========================
 # SMART API LOGIN
 # =========================
@@ -33,26 +51,72 @@ options = [
 
 lot_size = 30  # BANKNIFTY lot size
 
+# Strikes are picked around the ATM of the nearest expiry from the local scrip master
+# (instruments.py); the list above is only used if that fails
+USE_INSTRUMENT_MASTER = True
+UNDERLYING = "BANKNIFTY"
+SPOT_SYMBOL, SPOT_TOKEN = "Nifty Bank", "99926009"  # NSE index quote used for the ATM strike
+STRIKES_AROUND_ATM = 1  # Strikes either side of ATM, for both CE and PE
+
+
+def select_options():
+    try:
+        master = InstrumentMaster.load()
+        if not downloaded_today():
+            print(f"[instruments] WARNING: {SCRIP_MASTER_FILE} is from {downloaded_on()}; "
+                  f"new expiries may be missing (python instruments.py --download)")
+        spot = float(obj.ltpData("NSE", SPOT_SYMBOL, SPOT_TOKEN)["data"]["ltp"])
+    except Exception as e:
+        print(f"[instruments] {e}; trading the configured options")
+        return None
+    chain = master.strikes_around(UNDERLYING, spot, STRIKES_AROUND_ATM)
+    if not chain:
+        print(f"[instruments] No {UNDERLYING} options listed; trading the configured options")
+        return None
+    print(f"[instruments] {UNDERLYING} spot {spot}, ATM {master.atm(UNDERLYING, spot)}, "
+          f"expiry {chain[0]['expiry']}: {len(chain)} options")
+    return chain
+
+
+if USE_INSTRUMENT_MASTER:
+    selected = select_options()
+    if selected:
+        options = selected
+        lot_size = options[0]["lotsize"]
+
 # =========================
 # STRATEGY PARAMETERS
 # =========================
 
-RSI_PERIOD = 14
-ATR_PERIOD = 14
-ADX_PERIOD = 14
-EMA_SHORT = 12
-EMA_LONG = 26
-MACD_SHORT = 12
-MACD_LONG = 26
-MACD_SIGNAL = 9
-
-MACD_NEAR_ZERO_THRESHOLD = 0.5
-ATR_SL_MULTIPLIER = 1.5
-TP_SL_RATIO = 1.8
-MIN_SL_POINTS = 10
-ADX_THRESHOLD = 18
+# Signal parameters (periods, thresholds, SL/TP sizing, warm-up) are imported from
+# scalp_strategy.py, so its backtest always trades the same rules as this bot
+
 SLEEP_LOOP = 5
-VWAP_LOOKBACK = 60
+CANDLE_MINUTES = 1  # Candle interval the indicators run on; above 1 it is derived from 1-minute bars
+POLL_TIMEOUT = 3  # Seconds one symbol's LTP + candle fetch may take per loop
+STALE_DATA_SECONDS = 2 * SLEEP_LOOP  # Warn when a symbol has had no fresh data this long
+USE_SENTIMENT_FILTER = False  # Skip BUY on NEG and SELL on POS underlying sentiment
+USE_TICK_FEED = True  # Drive decisions from websocket ticks; REST polling is the fallback
+FEED_SILENCE_SECONDS = 10  # REST polling takes over for a symbol with no tick for this long
+USE_METRICS = True  # Per-stage latency histograms, jitter and overruns (about 2µs per timed stage)
+METRICS_PORT = 9108  # Local /metrics (Prometheus text) and /metrics.csv endpoint; None = no server
+METRICS_CSV = "latency_metrics.csv"  # Rewritten every METRICS_CSV_EVERY loops; None = never
+METRICS_CSV_EVERY = 12
+USE_LIVE_ENGINE = False  # Shard indicator work for a long options list across processes (live_engine.py)
+ENGINE_WORKERS = 4  # Worker processes for USE_LIVE_ENGINE
+MAX_PORTFOLIO_LOSS = 5000  # ₹ realized + MTM loss that exits everything and stops new entries
+MAX_OPEN_LOTS = 6  # Lots open across all options
+MAX_UNDERLYING_LOTS = 4  # Lots open per underlying
+USE_WARM_START = True  # Resume positions and indicator state from SNAPSHOT_FILE after a restart
+SNAPSHOT_FILE = "ai_bot.snapshot"
+SNAPSHOT_INTERVAL = 5  # Seconds between snapshots; entries and exits also save one at once
+
+latency = LatencyRecorder(enabled=USE_METRICS)
+
+# Local candle history; each fetch only asks the API for bars after the last stored one
+candle_store = CandleStore()
+# CANDLE_MINUTES bars derived from the stored 1-minute bars; each fetch only re-aggregates new buckets
+timeframes = TimeframeCache()
 
 # =========================
 # INDICATOR FUNCTIONS
@@ -60,88 +124,33 @@ VWAP_LOOKBACK = 60
 
 def fetch_candles(symbol, token, interval="ONE_MINUTE"):
     try:
-        params = {
-            "exchange": "NFO",
-            "symboltoken": token,
-            "interval": interval,
-            "fromdate": (pd.Timestamp.now() - pd.Timedelta(days=1)).strftime("%Y-%m-%d 09:15"),
-            "todate": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M"),
-        }
-        candles = obj.getCandleData(params)
-        if not candles or "data" not in candles or len(candles["data"]) == 0:
+        with latency.timed("candles", symbol):
+            df = fetch_with_store(
+                obj,
+                candle_store,
+                "NFO",
+                token,
+                interval,
+                (pd.Timestamp.now() - pd.Timedelta(days=1)).strftime("%Y-%m-%d 09:15"),
+            )
+        if df.empty:
             return None
 
-        df = pd.DataFrame(
-            candles["data"],
-            columns=["timestamp", "open", "high", "low", "close", "volume"],
-        )
-        df[["open", "high", "low", "close", "volume"]] = df[
-            ["open", "high", "low", "close", "volume"]
-        ].astype(float)
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-        return df.set_index("timestamp")
+        with latency.timed("dataframe", symbol):
+            if CANDLE_MINUTES > 1:
+                df = timeframes.sync(token, df, [CANDLE_MINUTES])[CANDLE_MINUTES]
+            df.columns = ["timestamp", "open", "high", "low", "close", "volume"]
+            return df.set_index("timestamp")
 
     except Exception as e:
         print(f"[fetch_candles] {symbol} error: {e}")
         return None
 
 
-def calculate_vwap(df):
-    if df is None or df.empty:
-        return None
-    df = df.iloc[-VWAP_LOOKBACK:]
-    tp = (df["close"] * df["volume"]).cumsum()
-    vol = df["volume"].cumsum()
-    return tp.iloc[-1] / vol.iloc[-1] if vol.iloc[-1] > 0 else None
-
-
-def calculate_rsi(df, period=RSI_PERIOD):
-    delta = df["close"].diff()
-    gain = delta.clip(lower=0).rolling(period).mean()
-    loss = -delta.clip(upper=0).rolling(period).mean()
-    rs = gain / loss
-    return (100 - (100 / (1 + rs))).iloc[-1]
-
-
-def calculate_macd(df):
-    ema_short = df["close"].ewm(span=MACD_SHORT).mean()
-    ema_long = df["close"].ewm(span=MACD_LONG).mean()
-    macd = ema_short - ema_long
-    signal = macd.ewm(span=MACD_SIGNAL).mean()
-    return macd.iloc[-1], signal.iloc[-1], ema_short.iloc[-1], ema_long.iloc[-1]
-
-
-def calculate_atr(df):
-    high_low = df["high"] - df["low"]
-    high_close = (df["high"] - df["close"].shift()).abs()
-    low_close = (df["low"] - df["close"].shift()).abs()
-    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-    return tr.rolling(ATR_PERIOD).mean().iloc[-1]
-
-
-def calculate_adx(df):
-    high, low, close = df["high"], df["low"], df["close"]
-    plus_dm = high.diff()
-    minus_dm = low.diff().abs()
-
-    plus_dm = np.where((plus_dm > minus_dm) & (plus_dm > 0), plus_dm, 0)
-    minus_dm = np.where((minus_dm > plus_dm) & (minus_dm > 0), minus_dm, 0)
-
-    tr = pd.concat(
-        [(high - low), (high - close.shift()).abs(), (low - close.shift()).abs()],
-        axis=1,
-    ).max(axis=1)
-
-    atr = tr.rolling(ADX_PERIOD).mean()
-    plus_di = 100 * pd.Series(plus_dm).rolling(ADX_PERIOD).mean() / atr
-    minus_di = 100 * pd.Series(minus_dm).rolling(ADX_PERIOD).mean() / atr
-    dx = (abs(plus_di - minus_di) / (plus_di + minus_di)) * 100
-    return dx.rolling(ADX_PERIOD).mean().iloc[-1]
-
-
 def get_ltp(symbol, token):
     try:
-        ltp_data = obj.ltpData("NFO", symbol, token)
+        with latency.timed("ltp", symbol):
+            ltp_data = obj.ltpData("NFO", symbol, token)
         return float(ltp_data["data"]["ltp"])
     except:
         return None
@@ -155,25 +164,9 @@ def get_gemini_sentiment_for_symbol(symbol):
     """
     Gemini-based short-term sentiment classifier
     Returns: POS / NEG / NEU
+    Never blocks: answers from the cache (NEU until known) and refreshes in the background
     """
-
-    prompt = f"""
-    You are an intraday options trader.
-    Classify short-term sentiment for {symbol}.
-    Reply with only one word: POS, NEG, or NEU.
-    """
-
-    try:
-        response = gemini_model.generate_content(prompt)
-        sentiment = response.text.strip().upper()
-
-        if sentiment in ["POS", "NEG", "NEU"]:
-            return sentiment
-        return "NEU"
-
-    except Exception as e:
-        print("[Gemini Error]", e)
-        return "NEU"
+    return sentiment_service.get(symbol)
 
 
 # =========================
@@ -192,20 +185,40 @@ def place_order(symbol, token, qty, action):
         "duration": "DAY",
         "quantity": qty,
     }
-    return obj.placeOrder(params)
+    with latency.timed("order", symbol):
+        return obj.placeOrder(params)
 
 
 # =========================
 # POSITION MANAGEMENT
 # =========================
 
-positions = {}
+# Entry, quantity, SL/TP and live MTM per open position, re-marked in one pass per tick
+positions = PositionBook(max_loss=MAX_PORTFOLIO_LOSS, max_open_lots=MAX_OPEN_LOTS,
+                         max_underlying_lots=MAX_UNDERLYING_LOTS)
+
+# Seconds between a symbol's data arriving and the decision made on it
+decision_age = {}
+
+# Streaming indicator state per symbol, seeded on first sight and topped up each loop
+indicator_state = {}
+
+
+def get_indicator_state(symbol):
+    if symbol not in indicator_state:
+        indicator_state[symbol] = scalp_indicator_state()
+    return indicator_state[symbol]
 
 
 def enter_position(opt, side, ltp, atr):
-    sl_points = max(MIN_SL_POINTS, atr * ATR_SL_MULTIPLIER)
-    sl = ltp - sl_points if side == "BUY" else ltp + sl_points
-    tp = ltp + sl_points * TP_SL_RATIO if side == "BUY" else ltp - sl_points * TP_SL_RATIO
+    underlying = opt.get("name", UNDERLYING)
+    blocked = positions.block_reason(underlying)
+    if blocked:
+        print(f"[RISK] {opt['symbol']} {side} skipped: {blocked}")
+        return
+
+    # Same levels as the live engine and the scalp backtest
+    sl, tp = (float(level) for level in sl_tp_levels(ltp, LONG if side == "BUY" else SHORT, atr))
 
     place_order(opt["symbol"], opt["token"], lot_size, side)
 
@@ -213,69 +226,272 @@ def enter_position(opt, side, ltp, atr):
         "side": side,
         "sl": sl,
         "tp": tp,
+        "entry": ltp,
+        "qty": lot_size,
+        "token": opt["token"],
+        "underlying": underlying,
     }
+    snapshots.request()
     print(f"[ENTRY] {opt['symbol']} {side} @ {ltp}")
 
 
-def exit_position(symbol, opt, side):
-    place_order(opt["symbol"], opt["token"], lot_size, side)
-    del positions[symbol]
-    print(f"[EXIT] {symbol}")
+def exit_positions(batch):
+    """Close every (symbol, token, action, qty, reason) of a PositionBook.mark() exit batch"""
+    for symbol, token, action, qty, reason in batch:
+        place_order(symbol, token, qty, action)
+        pnl = positions.close(symbol)
+        print(f"[EXIT] {symbol} {reason} P&L {pnl:.2f}")
+    if batch:
+        snapshots.request()
+        book = positions.summary()
+        print(f"[BOOK] realized {book['realized']:.2f} MTM {book['unrealized']:.2f} open lots {book['lots']}"
+              + (" [HALTED]" if book["halted"] else ""))
 
 
+# =========================
+# WARM START
+# =========================
+
+# Indicator settings the saved streaming state was built with; a change discards that state
+INDICATOR_PARAMS = (RSI_PERIOD, ATR_PERIOD, ADX_PERIOD, MACD_SHORT, MACD_LONG, MACD_SIGNAL,
+                    VWAP_LOOKBACK, INDICATOR_SMOOTHING)
+
+
+def collect_snapshot():
+    # Runs under the lock guarding `positions`, on the snapshot thread. With USE_LIVE_ENGINE
+    # the indicators live in the worker processes, so indicator_state stays empty and a
+    # restart resumes only the positions; the workers re-seed from the candle store.
+    return {"positions": positions.state(), "indicators": indicator_state, "indicator_params": INDICATOR_PARAMS}
+
+
+def resume_from_snapshot():
+    """
+    Restore today's open positions and indicator state; fetch_candles then only asks
+    the API for the candles after the stored ones, and sync() only feeds those
+    """
+    saved = warm_start.load(SNAPSHOT_FILE)
+    if saved is None:
+        return
+    state = saved["state"]
+    positions.restore(state["positions"])
+    if state["indicator_params"] == INDICATOR_PARAMS:
+        indicator_state.update(state["indicators"])
+    # Open positions keep getting ticks (and exits) even if the ATM strikes moved since
+    traded = {opt["symbol"] for opt in options}
+    for symbol in positions:
+        if symbol not in traded:
+            options.append({"symbol": symbol, "token": positions[symbol]["token"]})
+    print(f"[RESUME] {len(positions)} open positions, {len(indicator_state)} indicator states "
+          f"from {saved['age']:.0f}s ago")
+
+
+snapshots = warm_start.Snapshotter(SNAPSHOT_FILE, collect_snapshot, SNAPSHOT_INTERVAL)
+if USE_WARM_START:
+    resume_from_snapshot()
+
 # =========================
 # MAIN LOOP
 # =========================
 
+def fetch_market(opt):
+    """LTP and candles for one option; runs on a poller thread"""
+    symbol, token = opt["symbol"], opt["token"]
+    ltp = get_ltp(symbol, token)
+    df = fetch_candles(symbol, token)
+    if ltp is None or df is None:
+        return None
+    return ltp, df
+
+
+# All options are fetched at once; a stuck request only costs that symbol its cycle
+poller = InstrumentPoller(fetch_market, timeout=POLL_TIMEOUT)
+
+
+# Tick callbacks (websocket thread) and REST polling (main thread) share indicator state
+decision_lock = threading.Lock()
+
+
+def evaluate_symbol(opt, ltp, df):
+    # O(1) per closed candle; the forming candle is priced at the LTP
+    with decision_lock:
+        state = get_indicator_state(opt["symbol"])
+        with latency.timed("indicators", opt["symbol"]):
+            state.sync(df)
+        decide(opt, ltp, state)
+
+
+def decide(opt, ltp, state):
+    symbol = opt["symbol"]
+    latency.mark(symbol)
+    if state.bars + 1 < WARMUP_BARS:
+        return
+
+    with latency.timed("snapshot", symbol):
+        ind = state.snapshot(ltp)
+    signal_start = time.perf_counter()
+    atr = ind["atr"]
+    entry = snapshot_signal(ind, ltp)
+    buy_cond = entry == "BUY"
+    sell_cond = entry == "SELL"
+    latency.observe("signal", time.perf_counter() - signal_start, symbol)
+
+    if symbol not in positions:
+        if USE_SENTIMENT_FILTER and (buy_cond or sell_cond):
+            sentiment = get_gemini_sentiment_for_symbol(symbol)
+            buy_cond = buy_cond and sentiment != "NEG"
+            sell_cond = sell_cond and sentiment != "POS"
+
+        if buy_cond:
+            enter_position(opt, "BUY", ltp, atr)
+        elif sell_cond:
+            enter_position(opt, "SELL", ltp, atr)
+
+    else:
+        # One pass re-marks every open position and applies the portfolio limits
+        exit_positions(positions.mark(symbol, ltp))
+
+
+# =========================
+# TICK FEED
+# =========================
+
+tick_feed = TickFeed(intervals=(CANDLE_MINUTES,))
+options_by_token = {opt["token"]: opt for opt in options}
+
+
+@tick_feed.on_bar
+def on_feed_bar(token, minutes, bar):
+    opt = options_by_token.get(token)
+    if opt is None:
+        return
+    start, o, h, l, c, v = bar
+    start = pd.Timestamp(start, unit="s", tz="UTC").tz_convert("Asia/Kolkata")
+    with decision_lock:
+        state = get_indicator_state(opt["symbol"])
+        # After a feed gap REST polling has already committed these minutes via sync();
+        # the aggregator's stale forming bar must not be counted a second time
+        if state.last_time is not None and start <= state.last_time:
+            return
+        state.update(h, l, c, v, time=start)
+
+
+@tick_feed.on_tick
+def on_feed_tick(token, ts, price, volume):
+    opt = options_by_token.get(token)
+    if opt is None:
+        return
+    forming = tick_feed.aggregator(token, CANDLE_MINUTES).forming
+    with decision_lock:
+        state = get_indicator_state(opt["symbol"])
+        state.set_forming(*forming)
+        decision_age[opt["symbol"]] = 0.0
+        try:
+            decide(opt, price, state)
+        except Exception as e:
+            print(f"[ERROR] {opt['symbol']}: {e}")
+
+
+def start_tick_feed():
+    # Seed indicators and the forming candle from REST once, then let ticks take over
+    for opt in options:
+        df = fetch_candles(opt["symbol"], opt["token"])
+        if df is None:
+            continue
+        with decision_lock:
+            get_indicator_state(opt["symbol"]).sync(df)
+        # fetch_candles returns CANDLE_MINUTES bars, the interval on_feed_tick reads
+        tick_feed.seed(opt["token"], CANDLE_MINUTES, df)
+
+    source = SmartWebSocketSource(
+        data["data"]["jwtToken"], api_key, client_id, feedToken, [opt["token"] for opt in options]
+    )
+    source.start(tick_feed)
+    print("[START] Tick feed connected")
+    return source
+
+
+def sentiment_allows(symbol, side):
+    sentiment = get_gemini_sentiment_for_symbol(symbol)
+    return sentiment != ("NEG" if side == "BUY" else "POS")
+
+
+def run_live_engine():
+    """
+    Tick-driven scalping with indicators sharded across ENGINE_WORKERS processes;
+    this process keeps the websocket, `positions` and every order
+    """
+    engine = LiveEngine(
+        options, place_order, lot_size, workers=ENGINE_WORKERS, positions=positions, latency=latency,
+        entry_filter=sentiment_allows if USE_SENTIMENT_FILTER else None, minutes=CANDLE_MINUTES,
+    )
+    for opt in options:
+        df = fetch_candles(opt["symbol"], opt["token"])
+        if df is not None:
+            engine.seed(opt["token"], df)
+    # Workers fork before the websocket, metrics and snapshot threads exist
+    engine.start()
+    if USE_WARM_START:
+        snapshots.lock = engine.lock
+        snapshots.start()
+
+    source = SmartWebSocketSource(
+        data["data"]["jwtToken"], api_key, client_id, feedToken, [opt["token"] for opt in options]
+    )
+    source.start(engine.feed)
+    if USE_METRICS and METRICS_PORT is not None:
+        latency.serve(port=METRICS_PORT)
+
+    try:
+        while True:
+            time.sleep(SLEEP_LOOP * METRICS_CSV_EVERY)
+            if USE_METRICS and METRICS_CSV:
+                latency.write_csv(METRICS_CSV)
+    finally:
+        source.stop()
+        engine.stop()
+        if USE_WARM_START:
+            snapshots.stop()
+
+
 def expiry_day_scalp_loop():
     print("[START] Expiry scalping started")
 
+    if USE_LIVE_ENGINE:
+        run_live_engine()
+        return
+
+    if USE_TICK_FEED:
+        start_tick_feed()
+    if USE_METRICS and METRICS_PORT is not None:
+        latency.serve(port=METRICS_PORT)
+    if USE_WARM_START:
+        snapshots.lock = decision_lock
+        snapshots.start()
+
+    loops = 0
     while True:
         try:
-            for opt in options:
-                symbol, token = opt["symbol"], opt["token"]
-                ltp = get_ltp(symbol, token)
-                df = fetch_candles(symbol, token)
-
-                if ltp is None or df is None or len(df) < 50:
-                    continue
-
-                vwap = calculate_vwap(df)
-                rsi = calculate_rsi(df)
-                macd, signal, ema_s, ema_l = calculate_macd(df)
-                atr = calculate_atr(df)
-                adx = calculate_adx(df)
-
-                buy_cond = (
-                    macd > signal
-                    and abs(macd) < MACD_NEAR_ZERO_THRESHOLD
-                    and ema_s > ema_l
-                    and ltp > vwap
-                    and rsi > 50
-                    and adx > ADX_THRESHOLD
-                )
-
-                sell_cond = (
-                    macd < signal
-                    and abs(macd) < MACD_NEAR_ZERO_THRESHOLD
-                    and ema_s < ema_l
-                    and ltp < vwap
-                    and rsi < 50
-                    and adx > ADX_THRESHOLD
-                )
-
-                if symbol not in positions:
-                    if buy_cond:
-                        enter_position(opt, "BUY", ltp, atr)
-                    elif sell_cond:
-                        enter_position(opt, "SELL", ltp, atr)
-
-                else:
-                    pos = positions[symbol]
-                    if pos["side"] == "BUY" and (ltp <= pos["sl"] or ltp >= pos["tp"]):
-                        exit_position(symbol, opt, "SELL")
-                    elif pos["side"] == "SELL" and (ltp >= pos["sl"] or ltp <= pos["tp"]):
-                        exit_position(symbol, opt, "BUY")
+            loop_start = time.perf_counter()
+            # Ticks drive decisions; REST polling only covers symbols the feed has gone quiet on
+            polled = [opt for opt in options if tick_feed.silence(opt["token"]) > FEED_SILENCE_SECONDS]
+
+            # Each symbol is evaluated as soon as its own data arrives
+            for opt, (ltp, df), age in poller.poll(polled):
+                decision_age[opt["symbol"]] = age
+                try:
+                    evaluate_symbol(opt, ltp, df)
+                except Exception as e:
+                    print(f"[ERROR] {opt['symbol']}: {e}")
+
+            for symbol, age in poller.staleness(options).items():
+                if age > STALE_DATA_SECONDS:
+                    print(f"[STALE] {symbol} decision data is {age:.1f}s old")
+
+            # A loop body longer than SLEEP_LOOP means the polling cadence has slipped
+            latency.loop_done("scalp", time.perf_counter() - loop_start, SLEEP_LOOP)
+            loops += 1
+            if USE_METRICS and METRICS_CSV and loops % METRICS_CSV_EVERY == 0:
+                latency.write_csv(METRICS_CSV)
 
             time.sleep(SLEEP_LOOP)
 
@@ -0,0 +1,192 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from logzero import logger
+
+from candle_store import STORE_TZ, CandleStore, candles_to_frame
+
+# ================= BACKFILL SETTINGS =================
+# Longest date range SmartAPI getCandleData accepts per request, in calendar days
+MAX_DAYS_PER_REQUEST = {
+    "ONE_MINUTE": 30,
+    "THREE_MINUTE": 60,
+    "FIVE_MINUTE": 100,
+    "TEN_MINUTE": 100,
+    "FIFTEEN_MINUTE": 200,
+    "THIRTY_MINUTE": 200,
+    "ONE_HOUR": 400,
+    "ONE_DAY": 2000,
+}
+REQUESTS_PER_SECOND = 3  # Historical API rate limit
+MAX_WORKERS = 8
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # Seconds; doubled on every retry
+MANIFEST_NAME = "backfill_manifest.txt"
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` acquisitions per second, bursts up to `burst`"""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+class BackfillManifest:
+    """
+    Append-only record of completed (exchange, token, interval, trading day) keys, so a
+    crashed or re-ranged backfill only fetches the days it does not have yet
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.done = {line.strip() for line in f if line.strip()}
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def mark(self, keys):
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        if not keys:
+            return
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write("".join(key + "\n" for key in keys))
+                f.flush()
+                os.fsync(f.fileno())
+            self.done.update(keys)
+
+
+def day_key(exchange, token, interval, day):
+    return "|".join([exchange, str(token), interval, str(pd.Timestamp(day).date())])
+
+
+def split_windows(days, interval):
+    """
+    Group trading days into request windows no longer than the API allows. Days that
+    are consecutive trading days share a window; a gap (a day already fetched) starts a
+    new one. Returns [(fromdate, todate, days)] with API time strings.
+    """
+    max_days = MAX_DAYS_PER_REQUEST[interval]
+    days = sorted(pd.Timestamp(day).normalize() for day in days)
+    windows = []
+    group = []
+    for day in days:
+        if group and (day - group[0] >= pd.Timedelta(days=max_days)
+                      or len(pd.bdate_range(group[-1], day)) > 2):
+            windows.append(group)
+            group = []
+        group.append(day)
+    if group:
+        windows.append(group)
+    return [(f"{g[0].date()} 09:15", f"{g[-1].date()} 15:30", g) for g in windows]
+
+
+def fetch_window(api, limiter, exchange, token, interval, window,
+                 retries=MAX_RETRIES, backoff=BACKOFF_BASE, sleep=time.sleep):
+    """
+    Fetch one window with exponential backoff on errors
+    Returns a candle frame (possibly empty for holidays); raises after the last retry
+    """
+    params = {
+        "exchange": exchange,
+        "symboltoken": token,
+        "interval": interval,
+        "fromdate": window[0],
+        "todate": window[1],
+    }
+    error = None
+    for attempt in range(retries):
+        limiter.acquire()
+        try:
+            response = api.getCandleData(params)
+            if response and response.get("status"):
+                return candles_to_frame(response.get("data") or [])
+            error = response.get("errorcode") if response else "empty response"
+        except Exception as e:
+            error = e
+        if attempt < retries - 1:
+            sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.25))
+    raise RuntimeError(f"{exchange}:{token}:{interval} {window[0]} -> {window[1]} failed: {error}")
+
+
+def run_backfill(api, instruments, start_date, end_date, intervals, store=None, exchange="NFO",
+                 workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND, retries=MAX_RETRIES, backoff=BACKOFF_BASE,
+                 manifest_path=None, sleep=time.sleep, clock=time.monotonic, today=None):
+    """
+    Backfill every (instrument, interval) concurrently into the candle store.
+    instruments: list of {"symbol", "token"} dicts (an "exchange" key overrides the default).
+    Only trading days missing from the manifest are fetched, whatever the range, and
+    today's session (still open) is fetched but never marked done. Returns a summary dict
+    ("skipped" counts days, the other counters windows and candles).
+    """
+    store = store or CandleStore()
+    os.makedirs(store.root, exist_ok=True)
+    manifest = BackfillManifest(manifest_path or os.path.join(store.root, MANIFEST_NAME))
+    limiter = RateLimiter(rate, clock=clock, sleep=sleep)
+    today = pd.Timestamp.now(tz=STORE_TZ).tz_localize(None).normalize() if today is None else pd.Timestamp(today)
+    days = pd.bdate_range(pd.Timestamp(start_date).normalize(), min(pd.Timestamp(end_date).normalize(), today))
+
+    jobs = []
+    skipped = 0
+    for instrument in instruments:
+        inst_exchange = instrument.get("exchange", exchange)
+        for interval in intervals:
+            missing = [day for day in days if day_key(inst_exchange, instrument["token"], interval, day) not in manifest]
+            skipped += len(days) - len(missing)
+            for fromdate, todate, window_days in split_windows(missing, interval):
+                jobs.append((instrument, inst_exchange, interval, (fromdate, todate), window_days))
+
+    logger.info(f"📦 Backfill: {len(jobs)} windows to fetch, {skipped} days already done")
+    summary = {"fetched": 0, "skipped": skipped, "failed": 0, "candles": 0}
+    started = time.perf_counter()
+
+    def work(job):
+        instrument, inst_exchange, interval, window, window_days = job
+        df = fetch_window(api, limiter, inst_exchange, instrument["token"], interval, window,
+                          retries=retries, backoff=backoff, sleep=sleep)
+        store.write(inst_exchange, instrument["token"], interval, df)
+        manifest.mark(day_key(inst_exchange, instrument["token"], interval, day)
+                      for day in window_days if day < today)
+        return len(df)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(work, job): job for job in jobs}
+        for future in as_completed(futures):
+            instrument, _, interval, window, _ = futures[future]
+            try:
+                summary["candles"] += future.result()
+                summary["fetched"] += 1
+            except Exception as e:
+                summary["failed"] += 1
+                logger.error(f"❌ {instrument['symbol']} {interval} {window[0]} -> {window[1]}: {e}")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"✅ Backfill done in {elapsed:.1f}s | fetched {summary['fetched']} windows, "
+                f"{summary['candles']} candles, {summary['failed']} failed")
+    return summary
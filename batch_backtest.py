@@ -0,0 +1,250 @@
+import argparse
+import glob
+import os
+import re
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+import csv_cache
+import strategy_backtest as sb
+
+# ================= BATCHED MULTI-SYMBOL BACKTEST =================
+# All instruments of one session go into a single timestamp-indexed matrix
+# (rows = union of bar times, columns = symbols, NaN where a symbol has no bar).
+# Each column is packed to its own bars for indicators and the entry/exit state
+# machine, which steps through bars once for every column together, so a column
+# sees exactly the bars its CSV has (e.g. the 28-bar 2026-02-02 PUT file).
+
+SESSION_PATTERN = re.compile(r"NIFTY_(\d+MIN)_(\d{4}-\d{2}-\d{2})_")
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class SessionMatrix:
+    """Timestamp-indexed (T x S) OHLCV arrays for the instruments of one session"""
+
+    def __init__(self, times, labels, data):
+        self.times = times  # DatetimeIndex, length T
+        self.labels = labels  # list of S labels
+        self.data = data  # {"Open": (T, S), ...}
+        self.mask = ~np.isnan(data["Close"])  # True where the symbol has a bar
+
+    @classmethod
+    def from_frames(cls, frames):
+        """frames: {label: DataFrame with Datetime + OHLCV columns}"""
+        labels = list(frames)
+        stacked = pd.concat([frames[label] for label in labels], ignore_index=True)
+        column = np.repeat(np.arange(len(labels)), [len(frames[label]) for label in labels])
+        stamps = pd.DatetimeIndex(pd.to_datetime(stacked["Datetime"]))
+        times = stamps.unique().sort_values()
+        rows = times.get_indexer(stamps)
+        data = {}
+        for col in OHLCV:
+            data[col] = np.full((len(times), len(labels)), np.nan)
+            data[col][rows, column] = stacked[col].to_numpy(dtype=np.float64)
+        return cls(times, labels, data)
+
+    @classmethod
+    def from_files(cls, files):
+        frames = {}
+        for file, df in zip(files, csv_cache.load_many(files)):
+            if not df.empty:
+                frames[os.path.basename(file)[:-4]] = df
+        return cls.from_frames(frames)
+
+    def packed(self):
+        """
+        Move every column's bars to the top, keeping their order.
+        Returns (row_index (T, S), lengths (S,), packed {col: (T, S)}); rows past a
+        column's length are NaN.
+        """
+        order = np.argsort(~self.mask, axis=0, kind="stable")
+        lengths = self.mask.sum(axis=0)
+        pad = np.arange(len(self.times))[:, None] >= lengths[None, :]
+        out = {}
+        for col, values in self.data.items():
+            p = np.take_along_axis(values, order, axis=0)
+            p[pad] = np.nan
+            out[col] = p
+        return order, lengths, out
+
+
+def run_state_machine(close, signal, lengths,
+                      trailing_sl_offset=sb.TRAILING_SL_OFFSET,
+                      sl_shift_trigger=sb.SL_SHIFT_TRIGGER,
+                      sl_difference=sb.SL_DIFFERENCE):
+    """
+    EMA/ADX entry + trailing SL exit for every column of packed (K, S) arrays at once.
+    Same rules as strategy_backtest.backtest_strategy, including the end-of-data close.
+    Returns (col, entry_k, exit_k, exit_price, end_of_data) arrays, one element per trade.
+    """
+    K, S = close.shape
+    in_trade = np.zeros(S, dtype=bool)
+    entry_k = np.zeros(S, dtype=np.int64)
+    entry_px = np.zeros(S)
+    trailing_sl = np.zeros(S)
+    last_k = lengths - 1
+    records = []
+
+    for k in range(K):
+        c = close[k]
+        enter = ~in_trade & signal[k] & (k <= last_k)
+        entry_k[enter] = k
+        entry_px[enter] = c[enter]
+        trailing_sl[enter] = c[enter] - trailing_sl_offset
+        in_trade |= enter
+
+        trail = in_trade & (c >= entry_px + sl_shift_trigger)
+        trailing_sl = np.where(trail, np.maximum(trailing_sl, c - sl_difference), trailing_sl)
+
+        hit = in_trade & (c <= trailing_sl)
+        if hit.any():
+            cols = np.flatnonzero(hit)
+            records.append((cols, entry_k[cols], np.full(cols.size, k), trailing_sl[cols],
+                            np.zeros(cols.size, dtype=bool)))
+            in_trade &= ~hit
+
+        end = in_trade & (k == last_k)
+        if end.any():
+            cols = np.flatnonzero(end)
+            records.append((cols, entry_k[cols], np.full(cols.size, k), c[cols],
+                            np.ones(cols.size, dtype=bool)))
+            in_trade &= ~end
+
+    if not records:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0), np.empty(0, dtype=bool)
+    return tuple(np.concatenate(parts) for parts in zip(*records))
+
+
+def backtest_session(session, adx_threshold=sb.ADX_THRESHOLD):
+    """
+    Vectorized backtest of every symbol in a SessionMatrix
+    Returns ({label: [trade dicts]}, portfolio curve DataFrame indexed by time)
+    """
+    order, lengths, packed = session.packed()
+    close = packed["Close"]
+    signal = sb.TREND_RULES.arrays(
+        sb.trend_inputs(packed["High"], packed["Low"], close, adx_threshold=adx_threshold))["BUY"]
+
+    cols, entry_k, exit_k, exit_px, at_end = run_state_machine(close, signal, lengths)
+    entry_px = close[entry_k, cols]
+    pnl = (exit_px - entry_px) * sb.QUANTITY - 2 * sb.BROKERAGE_CHARGE
+    pnl_pct = (exit_px - entry_px) / entry_px * 100
+    candles = np.where(at_end, lengths[cols] - entry_k, exit_k - entry_k)
+    entry_row = order[entry_k, cols]
+    exit_row = order[exit_k, cols]
+
+    entry_times = list(session.times[entry_row])
+    exit_times = list(session.times[exit_row])
+    trades = {label: [] for label in session.labels}
+    for i in np.lexsort((entry_k, cols)):
+        trades[session.labels[cols[i]]].append({
+            'Entry_Time': entry_times[i],
+            'Exit_Time': exit_times[i],
+            'Entry_Price': entry_px[i],
+            'Exit_Price': exit_px[i],
+            'P&L': pnl[i],
+            'P&L%': pnl_pct[i],
+            'Candles': int(candles[i])
+        })
+
+    return trades, portfolio_curve(session, order, close, cols, entry_k, exit_k, exit_row, entry_px, pnl)
+
+
+def portfolio_curve(session, order, close, cols, entry_k, exit_k, exit_row, entry_px, pnl):
+    """Realized, unrealized (marked at each symbol's last close) and total equity per bar time"""
+    T, S = close.shape
+    held_px = np.full((T, S), np.nan)
+    for c, k0, k1, px in zip(cols, entry_k, exit_k, entry_px):
+        held_px[k0:k1, c] = px
+
+    # Back to the timestamp grid; between a symbol's bars, carry its last close/position
+    grid_px = np.full((T, S), np.nan)
+    grid_close = np.full((T, S), np.nan)
+    np.put_along_axis(grid_px, order, held_px, axis=0)
+    np.put_along_axis(grid_close, order, close, axis=0)
+    grid_px[~session.mask] = np.nan
+    grid_close[~session.mask] = np.nan
+    flat_marker = np.where(session.mask & np.isnan(grid_px), 0.0, grid_px)
+    held = pd.DataFrame(flat_marker).ffill().to_numpy()
+    marks = pd.DataFrame(grid_close).ffill().to_numpy()
+    open_pos = np.nan_to_num(held) > 0
+    unrealized = np.where(open_pos, (marks - held) * sb.QUANTITY, 0.0).sum(axis=1)
+
+    realized = np.zeros(T)
+    np.add.at(realized, exit_row, pnl)
+    realized = np.cumsum(realized)
+    return pd.DataFrame({
+        'Realized': realized,
+        'Unrealized': unrealized,
+        'Equity': realized + unrealized,
+        'Open_Positions': open_pos.sum(axis=1),
+    }, index=session.times.rename('Datetime'))
+
+
+def group_sessions(files):
+    """{(interval, date): [files]} from NIFTY_<interval>_<date>_<side>.csv names"""
+    sessions = defaultdict(list)
+    for file in files:
+        match = SESSION_PATTERN.search(os.path.basename(file))
+        if match:
+            sessions[match.groups()].append(file)
+    return dict(sorted(sessions.items()))
+
+
+def verify_against_files(files):
+    """Check per-symbol batch trades against backtest_strategy_fast on each file"""
+    mismatches = 0
+    for key, session_files in group_sessions(files).items():
+        session = SessionMatrix.from_files(sorted(session_files))
+        trades, _ = backtest_session(session)
+        for file in session_files:
+            df = csv_cache.load_csv(file)
+            expected = sb.backtest_strategy_fast(df)
+            if trades.get(os.path.basename(file)[:-4], []) != expected:
+                mismatches += 1
+                logger.error(f"❌ Batch mismatch on {file}")
+    logger.info(f"Checked {len(files)} files, {mismatches} mismatches")
+    return mismatches == 0
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched multi-symbol backtest, one pass per session")
+    parser.add_argument("--pattern", default="NIFTY_*MIN_*_*.csv")
+    parser.add_argument("--verify", action="store_true", help="Compare with the per-file backtest")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(args.pattern))
+    if not files:
+        logger.error("❌ No CSV files found. Make sure data files exist.")
+        exit()
+
+    if args.verify:
+        exit(0 if verify_against_files(files) else 1)
+
+    total_trades = 0
+    total_pnl = 0.0
+    for (interval, date), session_files in group_sessions(files).items():
+        start = time.perf_counter()
+        session = SessionMatrix.from_files(sorted(session_files))
+        trades, curve = backtest_session(session)
+        elapsed = time.perf_counter() - start
+
+        session_trades = sum(len(t) for t in trades.values())
+        drawdown = (curve['Equity'].cummax() - curve['Equity']).max()
+        total_trades += session_trades
+        total_pnl += curve['Realized'].iloc[-1]
+        logger.info(f"{interval} {date}: {len(session.labels)} symbols x {len(session.times)} bars | "
+                    f"{session_trades} trades | P&L ₹{curve['Realized'].iloc[-1]:.2f} | "
+                    f"Max DD ₹{drawdown:.2f} | {elapsed * 1000:.1f} ms")
+        for label, symbol_trades in trades.items():
+            if symbol_trades:
+                logger.info(f"   {label}: {len(symbol_trades)} trades, "
+                            f"₹{sum(t['P&L'] for t in symbol_trades):.2f}")
+
+    logger.info(f"📊 OVERALL: {total_trades} trades | P&L ₹{total_pnl:.2f}")
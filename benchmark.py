@@ -0,0 +1,348 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import logzero
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+import csv_cache
+import indicators
+import scalp_strategy as scalp
+import strategy_backtest as sb
+from candle_store import STORE_TZ
+from streaming_indicators import IndicatorState
+from trade_store import TradeStore, compute_metrics
+
+# ================= BENCHMARK SETTINGS =================
+# Times the hot paths (indicator kernels with the live bots' parameters, the backtest
+# engines, CSV loading and the summary/metrics path) on synthetic option candles of
+# configurable size, and writes machine-readable results that a later run on the same
+# machine can be compared against (--baseline) to catch regressions.
+SESSION_BARS = {1: 375, 3: 125, 5: 75}  # Bars per 09:15-15:30 session by interval
+DEFAULT_BARS = [1_000, 100_000]
+DEFAULT_SYMBOLS = [1, 10]
+REPEATS = 5
+TOLERANCE = 0.25  # A case regresses when its best (min) time grows by more than this fraction
+MIN_COMPARE_SECONDS = 0.005  # Cases faster than this in the baseline are timer noise, not compared
+FINGERPRINT = ("python", "numpy", "machine", "processor", "cpus")  # Must match for timings to be comparable
+RESULTS_FILE = "benchmark_results.json"  # Each run's results; never the baseline unless asked
+BASELINE_FILE = os.path.join("benchmarks", "baseline.json")  # Reference run on the 1-CPU dev machine
+TICK_SIZE = 0.05
+
+# Slow reference paths are skipped above this many total bars (bars x symbols);
+# --no-limit runs them anyway
+ROW_LOOP_LIMIT = 50_000
+STREAMING_LIMIT = 100_000
+
+
+def synthetic_ohlcv(bars, symbol="NIFTYSYN00000CE", interval=1, start="2026-01-05", seed=0, base_price=120.0):
+    """
+    Option-premium-like candles on 09:15-aligned session bars (weekdays only): each
+    session is a fresh contract whose log price random-walks from a day-level premium
+    with volatility regimes and time decay, with a U-shaped intraday volume profile.
+    Prices are rounded to the exchange tick and floored at one tick.
+    Columns match the data_extraction CSVs: Datetime/Open/High/Low/Close/Volume/Symbol.
+    """
+    rng = np.random.default_rng(seed)
+    per_day = SESSION_BARS[interval]
+
+    n_days = -(-bars // per_day)
+    days = pd.bdate_range(start, periods=n_days)
+    opens_at = (days + pd.Timedelta(hours=9, minutes=15)).to_numpy(dtype="datetime64[ns]")
+    offsets = np.arange(per_day) * np.timedelta64(interval, "m")
+    local = (opens_at[:, None] + offsets[None, :]).ravel()[:bars]
+    times = pd.DatetimeIndex(local).tz_localize(STORE_TZ)
+
+    size = n_days * per_day
+    regime = np.repeat(rng.choice([0.004, 0.008, 0.016], size=-(-size // 50)), 50)[:size]
+    steps = (rng.normal(-0.0002, 1.0, size) * regime * np.sqrt(interval)).reshape(n_days, per_day)
+    level = rng.normal(0.0, 0.3, (n_days, 1))
+    close = (base_price * np.exp(level + np.cumsum(steps, axis=1))).ravel()[:bars]
+    regime = regime[:bars]
+    open_ = np.concatenate([[base_price], close[:-1]]) * np.exp(rng.normal(0, 0.001, bars))
+    wick = np.abs(rng.normal(0, 1.0, (2, bars))) * regime * close
+    high = np.maximum(open_, close) + wick[0]
+    low = np.minimum(open_, close) - wick[1]
+
+    slot = np.arange(bars) % per_day / max(per_day - 1, 1)
+    profile = 1.0 + 2.0 * (slot - 0.5) ** 2 * 4
+    volume = np.maximum(1, rng.lognormal(5.0, 0.8, bars) * profile).round() * 15
+
+    prices = np.maximum(np.round(np.stack([open_, high, low, close]) / TICK_SIZE) * TICK_SIZE, TICK_SIZE)
+    return pd.DataFrame({
+        "Datetime": times,
+        "Open": prices[0],
+        "High": prices[1],
+        "Low": prices[2],
+        "Close": prices[3],
+        "Volume": volume.astype(np.int64),
+        "Symbol": symbol,
+    })
+
+
+def synthetic_universe(bars, symbols, interval=1, seed=0):
+    """One synthetic frame per symbol, seeded per symbol"""
+    return [synthetic_ohlcv(bars, f"NIFTYSYN{k:05d}{'CE' if k % 2 == 0 else 'PE'}", interval,
+                            seed=seed * 100_003 + k, base_price=60.0 + 5 * (k % 40))
+            for k in range(symbols)]
+
+
+def write_csvs(frames, folder, interval=1):
+    """Write frames the way data_extraction names them; returns the paths"""
+    paths = []
+    for k, df in enumerate(frames):
+        side = "CALL" if k % 2 == 0 else "PUT"
+        path = os.path.join(folder, f"NIFTY_{interval}MIN_SYN{k:05d}_{side}.csv")
+        df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+# ================= CASES =================
+# Each case is (name, prepare, limit): prepare(frames, paths) returns the callable to
+# time, limit caps total bars for the slow reference paths (None = no cap)
+
+def _lower(df):
+    """Ai_bot's candle frame layout (lower-case columns indexed by timestamp)"""
+    out = df.drop(columns="Symbol")
+    out.columns = ["timestamp", "open", "high", "low", "close", "volume"]
+    return out.set_index("timestamp")
+
+
+def _ai_bot_kernel(name):
+    """The kernels Ai_bot's calculate_* functions call, with its parameters"""
+    def prepare(frames, paths):
+        data = [_lower(df) for df in frames]
+        cols = [{c: d[c].to_numpy() for c in ("high", "low", "close", "volume")} for d in data]
+        calls = {
+            "vwap": lambda c: indicators.rolling_vwap(c["close"], c["volume"], scalp.VWAP_LOOKBACK),
+            "rsi": lambda c: indicators.rsi(c["close"], scalp.RSI_PERIOD, scalp.INDICATOR_SMOOTHING),
+            "macd": lambda c: indicators.macd(c["close"], scalp.MACD_SHORT, scalp.MACD_LONG, scalp.MACD_SIGNAL),
+            "atr": lambda c: indicators.atr(c["high"], c["low"], c["close"], scalp.ATR_PERIOD,
+                                            scalp.INDICATOR_SMOOTHING),
+            "adx": lambda c: indicators.adx(c["high"], c["low"], c["close"], scalp.ADX_PERIOD,
+                                            scalp.INDICATOR_SMOOTHING),
+        }
+        call = calls[name]
+        return lambda: [call(c) for c in cols]
+    return prepare
+
+
+def _per_frame(fn):
+    def prepare(frames, paths):
+        return lambda: [fn(df) for df in frames]
+    return prepare
+
+
+def _streaming(frames, paths):
+    """Live path: one IndicatorState update per closed candle"""
+    cols = [[df[c].to_numpy() for c in ("High", "Low", "Close", "Volume")] for df in frames]
+
+    def run():
+        for high, low, close, volume in cols:
+            state = IndicatorState(rsi_period=scalp.RSI_PERIOD, atr_period=scalp.ATR_PERIOD,
+                                   adx_period=scalp.ADX_PERIOD, macd_short=scalp.MACD_SHORT,
+                                   macd_long=scalp.MACD_LONG, macd_signal=scalp.MACD_SIGNAL,
+                                   vwap_lookback=scalp.VWAP_LOOKBACK, smoothing=scalp.INDICATOR_SMOOTHING)
+            for h, l, c, v in zip(high.tolist(), low.tolist(), close.tolist(), volume.tolist()):
+                state.update(h, l, c, v)
+    return run
+
+
+def _load_csvs(frames, paths):
+    def run():
+        for path in paths:
+            df = pd.read_csv(path)
+            df['Datetime'] = pd.to_datetime(df['Datetime'])
+    return run
+
+
+def _load_cached(frames, paths):
+    """csv_cache.load_csv on warm entries (the cache is built before timing)"""
+    folder = os.path.join(os.path.dirname(paths[0]), "cache")
+    csv_cache.warm(paths, folder)
+
+    def run():
+        for path in paths:
+            csv_cache.load_csv(path, folder, use_cache=True)
+    return run
+
+
+def _summary(frames, paths):
+    """print_backtest_summary on the row-loop trade dicts plus the trade-store metrics"""
+    trades = [sb.backtest_strategy_fast(df, "BENCH") for df in frames]
+    store = TradeStore()
+    for k, df in enumerate(frames):
+        arrays = sb.trade_arrays(df)
+        store.add(f"SYN{k}", *arrays.values(), bars=len(df))
+
+    def run():
+        for t in trades:
+            sb.print_backtest_summary(t, "BENCH")
+        compute_metrics(store)
+    return run
+
+
+CASES = [
+    ("ai_bot.vwap", _ai_bot_kernel("vwap"), None),
+    ("ai_bot.rsi", _ai_bot_kernel("rsi"), None),
+    ("ai_bot.macd", _ai_bot_kernel("macd"), None),
+    ("ai_bot.atr", _ai_bot_kernel("atr"), None),
+    ("ai_bot.adx", _ai_bot_kernel("adx"), None),
+    ("ai_bot.streaming_update", _streaming, STREAMING_LIMIT),
+    ("strategy.calculate_adx", _per_frame(sb.calculate_adx), None),
+    ("strategy.calculate_indicators", _per_frame(sb.calculate_indicators), None),
+    ("strategy.backtest_strategy", _per_frame(sb.backtest_strategy), ROW_LOOP_LIMIT),
+    ("strategy.backtest_strategy_fast", _per_frame(sb.backtest_strategy_fast), None),
+    ("scalp.backtest", _per_frame(lambda df: scalp.scalp_trade_arrays(df)), None),
+    ("csv.load", _load_csvs, None),
+    ("csv.cache_load", _load_cached, None),
+    ("summary", _summary, None),
+]
+
+
+def time_call(fn, repeats=REPEATS):
+    """Seconds per run for `repeats` runs"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+        "timestamp": pd.Timestamp.now(tz=STORE_TZ).isoformat(),
+    }
+
+
+def run_benchmarks(bars_list, symbols_list, cases=None, repeats=REPEATS, interval=1, seed=0, no_limit=False):
+    """Every selected case at every (bars, symbols) size; returns result records"""
+    selected = [c for c in CASES if cases is None or any(c[0].startswith(p) for p in cases)]
+    results = []
+    level = logger.level
+    logzero.loglevel(logging.WARNING)  # Per-trade logs of the reference engine would dominate the timings
+    try:
+        for bars in bars_list:
+            for symbols in symbols_list:
+                frames = synthetic_universe(bars, symbols, interval, seed)
+                with tempfile.TemporaryDirectory() as folder:
+                    needs_files = any(name.startswith("csv.") for name, _, _ in selected)
+                    paths = write_csvs(frames, folder, interval) if needs_files else []
+                    for name, prepare, limit in selected:
+                        total = bars * symbols
+                        if limit is not None and total > limit and not no_limit:
+                            print(f"  skip {name:34s} {bars:>10,} x {symbols:<4} (over {limit:,} bars)")
+                            continue
+                        fn = prepare(frames, paths)
+                        times = time_call(fn, repeats)
+                        median = statistics.median(times)
+                        results.append({
+                            "case": name, "bars": bars, "symbols": symbols, "repeats": repeats,
+                            "median_s": median, "min_s": min(times), "bars_per_s": total / median,
+                        })
+                        print(f"  {name:39s} {bars:>10,} x {symbols:<4} {median * 1000:10.2f} ms"
+                              f" (min {min(times) * 1000:.2f}) {total / median:14,.0f} bars/s")
+    finally:
+        logzero.loglevel(level)
+    return results
+
+
+def fingerprint_mismatch(env, baseline_env):
+    """Fields of FINGERPRINT that differ between two environment() records"""
+    return [k for k in FINGERPRINT if env.get(k) != baseline_env.get(k)]
+
+
+def compare(results, baseline, tolerance=TOLERANCE, floor=MIN_COMPARE_SECONDS):
+    """
+    Rows of (case, bars, symbols, baseline_s, now_s, ratio) whose best-of-repeats time got
+    slower than tolerance allows. Cases under `floor` seconds in the baseline are skipped:
+    at that scale scheduler and timer jitter alone exceed any sensible tolerance.
+    """
+    previous = {(r["case"], r["bars"], r["symbols"]): r["min_s"] for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        key = (r["case"], r["bars"], r["symbols"])
+        if key in previous and previous[key] >= floor and r["min_s"] > previous[key] * (1 + tolerance):
+            regressions.append((*key, previous[key], r["min_s"], r["min_s"] / previous[key]))
+    return regressions
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark indicators, backtests, CSV loading and summaries")
+    parser.add_argument("--bars", type=int, nargs="+", default=DEFAULT_BARS, help="Bars per symbol (1k..10M)")
+    parser.add_argument("--symbols", type=int, nargs="+", default=DEFAULT_SYMBOLS, help="Symbols (1..500)")
+    parser.add_argument("--cases", nargs="+", help="Only cases whose name starts with one of these")
+    parser.add_argument("--interval", type=int, choices=sorted(SESSION_BARS), default=1, help="Candle minutes")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-limit", action="store_true", help="Also run the slow reference paths on big sizes")
+    parser.add_argument("--output", default=RESULTS_FILE, help="Where to write this run's results (JSON)")
+    parser.add_argument("--baseline", help=f"Results file to compare against, e.g. {BASELINE_FILE}; "
+                                            "exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed slowdown, e.g. 0.25 = 25%%")
+    parser.add_argument("--floor", type=float, default=MIN_COMPARE_SECONDS,
+                        help="Skip cases faster than this many seconds in the baseline")
+    parser.add_argument("--any-machine", action="store_true",
+                        help="Compare even when the baseline's CPU/Python/NumPy fingerprint differs")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, _, limit in CASES:
+            print(name if limit is None else f"{name}  (up to {limit:,} bars)")
+        sys.exit()
+
+    # Read before the run, so --output pointing at the baseline refreshes it after the comparison
+    baseline = None
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            logger.warning(f"⚠️ No baseline at {args.baseline}; results are not compared")
+        else:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            mismatch = fingerprint_mismatch(environment(), baseline.get("environment", {}))
+            if mismatch and not args.any_machine:
+                logger.warning(f"⚠️ Baseline was recorded on a different setup ({', '.join(mismatch)}); "
+                               f"results are not compared (--any-machine to compare anyway)")
+                baseline = None
+
+    logger.info(f"⏱️ Benchmarking {args.bars} bars x {args.symbols} symbols, {args.repeats} repeats")
+    results = run_benchmarks(args.bars, args.symbols, args.cases, args.repeats, args.interval,
+                             args.seed, args.no_limit)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=1)
+    logger.info(f"✅ {len(results)} results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance, args.floor)
+        for case, bars, symbols, before, now, ratio in regressions:
+            logger.error(f"❌ {case} {bars:,} x {symbols}: {before * 1000:.2f} ms -> {now * 1000:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        logger.info(f"✅ No case of {args.floor * 1000:g} ms or more slower than {args.baseline} "
+                    f"by more than {args.tolerance:.0%}")
@@ -0,0 +1,214 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ================= STORE SETTINGS =================
+CANDLE_STORE_DIR = os.environ.get("CANDLE_STORE_DIR", "candle_store")
+STORE_TZ = "Asia/Kolkata"
+API_TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# One raw little-endian file per column, so every column can be np.memmap'd directly
+COLUMNS = {
+    "timestamp": np.dtype("<i8"),  # epoch seconds (UTC)
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+PRICE_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# SmartAPI interval names -> bar length in minutes
+INTERVAL_MINUTES = {
+    "ONE_MINUTE": 1,
+    "THREE_MINUTE": 3,
+    "FIVE_MINUTE": 5,
+    "TEN_MINUTE": 10,
+    "FIFTEEN_MINUTE": 15,
+    "THIRTY_MINUTE": 30,
+    "ONE_HOUR": 60,
+    "ONE_DAY": 375,
+}
+FRAME_COLUMNS = ["Datetime", "Open", "High", "Low", "Close", "Volume"]
+
+
+class CandleStore:
+    """
+    On-disk columnar candle store keyed by (exchange, token, interval).
+    Layout: <root>/<exchange>/<token>/<interval>/<column>.bin
+    """
+
+    def __init__(self, root=CANDLE_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _dir(self, exchange, token, interval):
+        return os.path.join(self.root, str(exchange), str(token), str(interval))
+
+    def _path(self, exchange, token, interval, column):
+        return os.path.join(self._dir(exchange, token, interval), f"{column}.bin")
+
+    def keys(self):
+        """Yield every (exchange, token, interval) key with data"""
+        if not os.path.isdir(self.root):
+            return
+        for exchange in sorted(os.listdir(self.root)):
+            for token in sorted(os.listdir(os.path.join(self.root, exchange))):
+                for interval in sorted(os.listdir(os.path.join(self.root, exchange, token))):
+                    yield exchange, token, interval
+
+    def count(self, exchange, token, interval):
+        """Number of complete rows (a half-written append is ignored)"""
+        sizes = []
+        for column, dtype in COLUMNS.items():
+            path = self._path(exchange, token, interval, column)
+            sizes.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def arrays(self, exchange, token, interval):
+        """Memory-map every column; returns {column: read-only array}"""
+        n = self.count(exchange, token, interval)
+        if n == 0:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()}
+        return {
+            column: np.memmap(self._path(exchange, token, interval, column), dtype=dtype, mode="r", shape=(n,))
+            for column, dtype in COLUMNS.items()
+        }
+
+    def last_timestamp(self, exchange, token, interval):
+        """Last stored candle time as a tz-aware Timestamp, or None"""
+        n = self.count(exchange, token, interval)
+        if n == 0:
+            return None
+        ts = np.memmap(self._path(exchange, token, interval, "timestamp"), dtype=COLUMNS["timestamp"],
+                       mode="r", offset=(n - 1) * COLUMNS["timestamp"].itemsize, shape=(1,))
+        return pd.Timestamp(int(ts[0]), unit="s", tz="UTC").tz_convert(STORE_TZ)
+
+    def read(self, exchange, token, interval, start=None, end=None):
+        """Candles in [start, end] as a DataFrame with the repo's CSV columns"""
+        cols = self.arrays(exchange, token, interval)
+        ts = cols["timestamp"]
+        lo = 0 if start is None else int(np.searchsorted(ts, _to_epoch(start), side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, _to_epoch(end), side="right"))
+        return arrays_to_frame({column: values[lo:hi] for column, values in cols.items()})
+
+    def write(self, exchange, token, interval, df):
+        """
+        Merge candles (Datetime/Open/High/Low/Close/Volume frame) into the store.
+        Newer rows win on equal timestamps, so a re-fetched forming candle replaces the old one.
+        """
+        if df is None or df.empty:
+            return 0
+        new = frame_to_arrays(df)
+        with self._lock:
+            os.makedirs(self._dir(exchange, token, interval), exist_ok=True)
+            n = self.count(exchange, token, interval)
+            if n == 0:
+                self._rewrite(exchange, token, interval, new)
+                return len(new["timestamp"])
+
+            stored = self.arrays(exchange, token, interval)
+            if new["timestamp"][-1] >= stored["timestamp"][-1]:
+                # Common live case: new data overlaps or extends the tail
+                keep = int(np.searchsorted(stored["timestamp"], new["timestamp"][0], side="left"))
+                del stored
+                self._truncate(exchange, token, interval, keep)
+                self._append(exchange, token, interval, new)
+            else:
+                # Backfill inside existing history: merge and rewrite
+                merged = {c: np.concatenate([np.asarray(stored[c]), new[c]]) for c in COLUMNS}
+                del stored
+                order = np.argsort(merged["timestamp"], kind="stable")
+                merged = {c: v[order] for c, v in merged.items()}
+                last = np.r_[merged["timestamp"][1:] != merged["timestamp"][:-1], True]
+                self._rewrite(exchange, token, interval, {c: v[last] for c, v in merged.items()})
+        return len(new["timestamp"])
+
+    def _truncate(self, exchange, token, interval, rows):
+        for column, dtype in COLUMNS.items():
+            path = self._path(exchange, token, interval, column)
+            if os.path.exists(path):
+                os.truncate(path, rows * dtype.itemsize)
+
+    def _append(self, exchange, token, interval, arrays):
+        # Timestamp column last, so count() never sees a row without its prices
+        for column in PRICE_COLUMNS + ["timestamp"]:
+            with open(self._path(exchange, token, interval, column), "ab") as f:
+                f.write(np.ascontiguousarray(arrays[column], dtype=COLUMNS[column]).tobytes())
+
+    def _rewrite(self, exchange, token, interval, arrays):
+        for column in PRICE_COLUMNS + ["timestamp"]:
+            path = self._path(exchange, token, interval, column)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(np.ascontiguousarray(arrays[column], dtype=COLUMNS[column]).tobytes())
+            os.replace(tmp, path)
+
+
+def _to_epoch(value):
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize(STORE_TZ)
+    return int(ts.timestamp())
+
+
+def arrays_to_frame(cols):
+    """{timestamp, open, ...} column arrays -> Datetime/Open/High/Low/Close/Volume frame"""
+    df = pd.DataFrame({
+        "Datetime": pd.to_datetime(np.asarray(cols["timestamp"]), unit="s", utc=True).tz_convert(STORE_TZ),
+        **{column.capitalize(): np.array(cols[column]) for column in PRICE_COLUMNS},
+    })
+    return df[FRAME_COLUMNS]
+
+
+def frame_to_arrays(df):
+    """Datetime/Open/... frame -> sorted {timestamp, open, ...} arrays, last copy of duplicate times kept"""
+    ts = pd.to_datetime(df["Datetime"])
+    if ts.dt.tz is None:
+        ts = ts.dt.tz_localize(STORE_TZ)
+    epoch = ((ts - pd.Timestamp("1970-01-01", tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+    order = np.argsort(epoch, kind="stable")
+    arrays = {"timestamp": epoch[order]}
+    for column in PRICE_COLUMNS:
+        arrays[column] = pd.to_numeric(df[column.capitalize()], errors="coerce").to_numpy(dtype=np.float64)[order]
+    # Keep the last copy of duplicate timestamps
+    last = np.r_[arrays["timestamp"][1:] != arrays["timestamp"][:-1], True]
+    return {c: v[last] for c, v in arrays.items()}
+
+
+def candles_to_frame(data):
+    """Convert a getCandleData 'data' payload to a Datetime/Open/High/Low/Close/Volume frame"""
+    df = pd.DataFrame(data, columns=FRAME_COLUMNS)
+    df[FRAME_COLUMNS[1:]] = df[FRAME_COLUMNS[1:]].astype(float)
+    df["Datetime"] = pd.to_datetime(df["Datetime"])
+    return df
+
+
+def fetch_with_store(smart_api, store, exchange, token, interval, fromdate, todate=None):
+    """
+    Return candles from fromdate to todate, asking the API only for bars from the
+    last stored timestamp onwards (the last stored bar is re-fetched, since it may
+    still have been forming). API errors propagate to the caller.
+    """
+    fromdate = pd.Timestamp(fromdate)
+    if fromdate.tzinfo is None:
+        fromdate = fromdate.tz_localize(STORE_TZ)
+    todate = pd.Timestamp.now(tz=STORE_TZ) if todate is None else pd.Timestamp(todate)
+    if todate.tzinfo is None:
+        todate = todate.tz_localize(STORE_TZ)
+
+    last = store.last_timestamp(exchange, token, interval)
+    request_from = fromdate if last is None or last < fromdate else last
+    response = smart_api.getCandleData({
+        "exchange": exchange,
+        "symboltoken": token,
+        "interval": interval,
+        "fromdate": request_from.strftime(API_TIME_FORMAT),
+        "todate": todate.strftime(API_TIME_FORMAT),
+    })
+    if response and response.get("data"):
+        store.write(exchange, token, interval, candles_to_frame(response["data"]))
+
+    return store.read(exchange, token, interval, start=fromdate, end=todate)
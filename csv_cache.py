@@ -0,0 +1,284 @@
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+# ================= CSV CACHE SETTINGS =================
+# Transparent binary cache for the candle CSVs. The first read of a CSV parses it once
+# and writes every column as a raw little-endian .bin file (Datetime as int64 epoch
+# seconds, numeric columns as float64/int64 or float32, text columns as int32 category
+# codes) plus meta.json. Later reads validate the source (mtime + size, or a content
+# hash) and np.memmap the columns, skipping CSV and timestamp parsing entirely.
+CSV_CACHE_DIR = os.environ.get("CSV_CACHE_DIR", ".csv_cache")
+USE_CSV_CACHE = os.environ.get("CSV_CACHE", "1") != "0"  # CSV_CACHE=0 reads the CSVs directly
+VALIDATE = ("mtime", "hash")
+CACHE_VERSION = 1
+META_FILE = "meta.json"
+TIME_COLUMN = "Datetime"
+LOAD_WORKERS = 8
+
+
+def _entry_dir(path, cache_dir):
+    """One cache directory per source file; the path hash keeps equal basenames apart"""
+    source = os.path.abspath(path)
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cache_dir, f"{name}-{zlib.crc32(source.encode()):08x}")
+
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_info(path):
+    # The hash is always recorded, so switching to validate="hash" does not force a rebuild
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": file_hash(path)}
+
+
+def _read_meta(folder):
+    try:
+        with open(os.path.join(folder, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(path, cache_dir=CSV_CACHE_DIR, validate="mtime", float32=False):
+    """True if the cache entry for path exists, was built the same way and still matches the CSV"""
+    if validate not in VALIDATE:
+        raise ValueError(f"Unknown validate: {validate}")
+    meta = _read_meta(_entry_dir(path, cache_dir))
+    if meta is None or meta.get("version") != CACHE_VERSION or meta.get("float32") != float32:
+        return False
+    source = meta["source"]
+    stat = os.stat(path)
+    if validate == "mtime":
+        return source["mtime_ns"] == stat.st_mtime_ns and source["size"] == stat.st_size
+    # A touched but unchanged file still hits; the new mtime is not written back
+    return source["size"] == stat.st_size and source.get("hash") == file_hash(path)
+
+
+def _tz_spec(tz):
+    """JSON form of a column's timezone: a zone name or a fixed UTC offset in seconds"""
+    if tz is None:
+        return None
+    if isinstance(tz, datetime.timezone):
+        return {"offset": tz.utcoffset(None).total_seconds()}
+    return {"name": str(tz)}
+
+
+def _tz_from_spec(spec):
+    if "offset" in spec:
+        return datetime.timezone(datetime.timedelta(seconds=spec["offset"]))
+    return spec["name"]
+
+
+def build(path, cache_dir=CSV_CACHE_DIR, float32=False):
+    """Parse the CSV and (re)write its cache entry; returns the parsed DataFrame"""
+    info = _source_info(path)
+    df = pd.read_csv(path)
+    columns = []
+    arrays = {}
+    for name in df.columns:
+        col = df[name]
+        if name == TIME_COLUMN:
+            ts = pd.to_datetime(col)
+            df[name] = ts
+            delta = ts - pd.Timestamp("1970-01-01", tz="UTC" if ts.dt.tz is not None else None)
+            if (delta.dt.floor("s") != delta).any():
+                raise ValueError(f"{path}: {TIME_COLUMN} has sub-second values")
+            arrays[name] = (delta // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+            columns.append({"name": name, "kind": "time", "dtype": "<i8", "unit": ts.dt.unit,
+                            "tz": _tz_spec(ts.dt.tz)})
+        elif pd.api.types.is_numeric_dtype(col):
+            dtype = np.dtype("<f4") if float32 and col.dtype.kind == "f" else col.dtype.newbyteorder("<")
+            arrays[name] = col.to_numpy(dtype=dtype)
+            columns.append({"name": name, "kind": "numeric", "dtype": dtype.str})
+        else:
+            codes, categories = pd.factorize(col, use_na_sentinel=True)
+            arrays[name] = codes.astype("<i4")
+            columns.append({"name": name, "kind": "category", "dtype": "<i4",
+                            "categories": [str(c) for c in categories]})
+
+    folder = _entry_dir(path, cache_dir)
+    tmp = f"{folder}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for k, column in enumerate(columns):
+        arrays[column["name"]].tofile(os.path.join(tmp, f"{k}.bin"))
+    meta = {"version": CACHE_VERSION, "path": os.path.abspath(path), "source": info,
+            "rows": len(df), "float32": float32, "columns": columns}
+    with open(os.path.join(tmp, META_FILE), "w") as f:
+        json.dump(meta, f)
+    # Swap the finished entry in; readers see either the old entry, none, or the new one
+    shutil.rmtree(folder, ignore_errors=True)
+    try:
+        os.replace(tmp, folder)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)  # Another process won the race with the same data
+    return df
+
+
+def load_arrays(path, cache_dir=CSV_CACHE_DIR, mmap=True):
+    """
+    Raw cached columns of a fresh entry: {name: array} (memmaps when mmap=True) plus
+    the column metadata, or None if there is no entry
+    """
+    folder = _entry_dir(path, cache_dir)
+    meta = _read_meta(folder)
+    if meta is None:
+        return None
+    rows = meta["rows"]
+    arrays = {}
+    for k, column in enumerate(meta["columns"]):
+        file = os.path.join(folder, f"{k}.bin")
+        dtype = np.dtype(column["dtype"])
+        if rows == 0:
+            arrays[column["name"]] = np.empty(0, dtype=dtype)
+        elif mmap:
+            arrays[column["name"]] = np.memmap(file, dtype=dtype, mode="r", shape=(rows,))
+        else:
+            arrays[column["name"]] = np.fromfile(file, dtype=dtype, count=rows)
+    return arrays, meta
+
+
+def _frame(arrays, meta):
+    data = {}
+    for column in meta["columns"]:
+        values = arrays[column["name"]]
+        if column["kind"] == "time":
+            times = pd.to_datetime(np.asarray(values), unit="s", utc=column["tz"] is not None)
+            if column["tz"] is not None:
+                times = times.tz_convert(_tz_from_spec(column["tz"]))
+            data[column["name"]] = times.as_unit(column["unit"])
+        elif column["kind"] == "category":
+            data[column["name"]] = pd.Categorical.from_codes(np.asarray(values), column["categories"])
+        else:
+            data[column["name"]] = values
+    return pd.DataFrame(data)
+
+
+def load_csv(path, cache_dir=CSV_CACHE_DIR, validate="mtime", mmap=True, float32=False, use_cache=None):
+    """
+    pd.read_csv(path) with Datetime already parsed, served from the cache when fresh.
+    Text columns (Symbol) come back categorical.
+    """
+    use_cache = USE_CSV_CACHE if use_cache is None else use_cache
+    if not use_cache:
+        df = pd.read_csv(path)
+        if TIME_COLUMN in df:
+            df[TIME_COLUMN] = pd.to_datetime(df[TIME_COLUMN])
+        return df
+    if not is_fresh(path, cache_dir, validate, float32):
+        build(path, cache_dir, float32)
+    cached = load_arrays(path, cache_dir, mmap)
+    if cached is None:
+        raise OSError(f"Cache entry for {path} vanished while loading")
+    return _frame(*cached)
+
+
+def _build_stale(args):
+    path, cache_dir, validate, float32 = args
+    try:
+        if not is_fresh(path, cache_dir, validate, float32):
+            build(path, cache_dir, float32)
+    except Exception as e:
+        return f"{path}: {e}"
+    return None
+
+
+def warm(paths, cache_dir=CSV_CACHE_DIR, validate="mtime", float32=False, workers=None):
+    """
+    Build the missing/stale entries, in parallel processes (CSV parsing holds the GIL).
+    A file that fails to build is only logged here; loading it raises the real error.
+    Returns the number of entries built.
+    """
+    if not USE_CSV_CACHE:
+        return 0
+    stale = [p for p in paths if not is_fresh(p, cache_dir, validate, float32)]
+    jobs = [(p, cache_dir, validate, float32) for p in stale]
+    if len(stale) <= 1:
+        errors = [_build_stale(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            errors = list(pool.map(_build_stale, jobs))
+    for error in filter(None, errors):
+        logger.warning(f"⚠️ Not cached: {error}")
+    return len(stale) - sum(e is not None for e in errors)
+
+
+def load_many(paths, cache_dir=CSV_CACHE_DIR, validate="mtime", mmap=True, float32=False,
+              workers=LOAD_WORKERS, use_cache=None):
+    """load_csv for every path, in order; stale entries are rebuilt across processes first"""
+    use_cache = USE_CSV_CACHE if use_cache is None else use_cache
+    if use_cache and len(paths) > 1:
+        warm(paths, cache_dir, validate, float32)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda p: load_csv(p, cache_dir, validate, mmap, float32, use_cache), paths))
+
+
+def clear(cache_dir=CSV_CACHE_DIR):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build, check or time the binary CSV cache")
+    parser.add_argument("--pattern", default="NIFTY_*MIN_*.csv")
+    parser.add_argument("--cache-dir", default=CSV_CACHE_DIR)
+    parser.add_argument("--validate", choices=VALIDATE, default="mtime")
+    parser.add_argument("--float32", action="store_true", help="Store float columns as float32")
+    parser.add_argument("--clear", action="store_true", help="Delete the cache first")
+    parser.add_argument("--verify", action="store_true", help="Check cached frames equal pd.read_csv + to_datetime")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(args.pattern))
+    if not files:
+        logger.error("❌ No CSV files found. Make sure data files exist.")
+        exit()
+    if args.clear:
+        clear(args.cache_dir)
+
+    start = time.perf_counter()
+    frames = load_many(files, args.cache_dir, args.validate, use_cache=False)
+    csv_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    built = warm(files, args.cache_dir, args.validate, args.float32)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = load_many(files, args.cache_dir, args.validate, float32=args.float32)
+    cache_time = time.perf_counter() - start
+
+    rows = sum(len(df) for df in frames)
+    logger.info(f"📦 {len(files)} files, {rows:,} rows; {built} cache entries (re)built in {build_time:.2f}s")
+    logger.info(f"CSV parse:  {csv_time:.3f}s ({rows / csv_time:,.0f} rows/s)")
+    logger.info(f"Cache load: {cache_time:.3f}s ({rows / cache_time:,.0f} rows/s)")
+
+    if args.verify:
+        mismatches = 0
+        for file, expected, actual in zip(files, frames, cached):
+            actual = actual.astype({c: expected[c].dtype for c in expected if actual[c].dtype.name == "category"})
+            try:
+                pd.testing.assert_frame_equal(expected, actual, check_dtype=not args.float32,
+                                              rtol=1e-6 if args.float32 else 0)
+            except AssertionError as e:
+                mismatches += 1
+                logger.error(f"❌ Cache mismatch on {file}: {e}")
+        logger.info(f"Checked {len(files)} files, {mismatches} mismatches")
+        exit(0 if mismatches == 0 else 1)
@@ -1,9 +1,14 @@
+import argparse
 import pandas as pd
 from SmartApi import SmartConnect
 import pyotp
 from datetime import datetime, time
 from logzero import logger
 import time as t
+from candle_store import CandleStore, INTERVAL_MINUTES
+import resample
+from instruments import SCRIP_MASTER_FILE, InstrumentMaster, downloaded_on, downloaded_today
+from backfill import BACKOFF_BASE, MAX_WORKERS, REQUESTS_PER_SECOND, run_backfill
 
 # ================= LOGIN DETAILS =================
 API_KEY = "qZd3Xgul"
@@ -29,6 +34,49 @@ INSTRUMENTS = [
 EXCHANGE = "NFO"
 INTERVAL = "THREE_MINUTE"
 
+# Every fetched day is also merged into the local binary candle store
+candle_store = CandleStore()
+
+# ================= MODE =================
+# Default: fetch DATE_TO_FETCH into daily CSVs.
+# --backfill: fetch a date range for every instrument/interval into the candle store,
+#   concurrently and rate-limited; rerunning skips windows that already finished.
+parser = argparse.ArgumentParser(description="Fetch NIFTY option candles")
+parser.add_argument("--backfill", action="store_true", help="Backfill a date range into the candle store")
+parser.add_argument("--start", help="First date to backfill (YYYY-MM-DD)")
+parser.add_argument("--end", default=DATE_TO_FETCH, help="Last date to backfill (YYYY-MM-DD)")
+parser.add_argument("--intervals", nargs="+", default=[INTERVAL], help="e.g. ONE_MINUTE THREE_MINUTE")
+parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="API requests per second")
+parser.add_argument("--timeframes", type=int, nargs="+", metavar="MIN",
+                    help="Fetch ONE_MINUTE once and derive a CSV per interval (e.g. 3 5), instead of fetching INTERVAL")
+parser.add_argument("--underlying", help="Pick INSTRUMENTS from the scrip master instead, e.g. NIFTY")
+parser.add_argument("--spot", type=float, help="Spot price whose ATM strike --underlying trades")
+parser.add_argument("--strikes", type=int, default=0, help="Strikes either side of ATM with --underlying")
+args = parser.parse_args()
+
+if args.backfill and not args.start:
+    parser.error("--backfill needs --start")
+if args.underlying and args.spot is None:
+    parser.error("--underlying needs --spot")
+
+# CE/PE around the ATM of the first expiry on or after the fetched day
+if args.underlying:
+    master = InstrumentMaster.load()
+    if not downloaded_today():
+        logger.warning(f"{SCRIP_MASTER_FILE} is from {downloaded_on()}; "
+                       f"new expiries may be missing (python instruments.py --download)")
+    expiry = master.nearest_expiry(args.underlying, EXCHANGE, on_or_after=DATE_TO_FETCH)
+    INSTRUMENTS = master.strikes_around(args.underlying, args.spot, args.strikes, expiry, exchange=EXCHANGE)
+    if not INSTRUMENTS:
+        logger.error(f"❌ No {args.underlying} options expiring on or after {DATE_TO_FETCH} in the scrip master")
+        exit()
+    logger.info(f"Instruments: {[inst['symbol'] for inst in INSTRUMENTS]}")
+
+# One 1-minute fetch feeds every derived interval, instead of one API call per interval
+if args.timeframes:
+    INTERVAL = "ONE_MINUTE"
+
 # ================= LOGIN =================
 smartApi = SmartConnect(API_KEY)
 
@@ -45,6 +93,13 @@ except Exception as e:
     logger.error(f"❌ Login error: {e}")
     exit()
 
+# ================= BACKFILL MODE =================
+if args.backfill:
+    summary = run_backfill(smartApi, INSTRUMENTS, args.start, args.end, args.intervals,
+                           store=candle_store, exchange=EXCHANGE,
+                           workers=args.workers, rate=args.rate)
+    exit(1 if summary["failed"] else 0)
+
 # ================= MARKET-CLOSE CHECK =================
 market_close = datetime.combine(
     datetime.strptime(DATE_TO_FETCH, "%Y-%m-%d"),
@@ -84,7 +139,10 @@ def fetch_5min_candles(symbol, token, retries=3):
                 for col in numeric_cols:
                     df[col] = pd.to_numeric(df[col], errors='coerce')
 
-                # 3. Add Symbol
+                # 3. Keep a copy in the candle store
+                candle_store.write(EXCHANGE, token, INTERVAL, df)
+
+                # 4. Add Symbol
                 df["Symbol"] = symbol
 
                 return df
@@ -98,7 +156,7 @@ def fetch_5min_candles(symbol, token, retries=3):
         except Exception as e:
             logger.error(f"{symbol} | API error: {e}")
 
-        t.sleep(2)
+        t.sleep(BACKOFF_BASE * 2 ** attempt)
 
     return None
 
@@ -124,20 +182,24 @@ for instrument in INSTRUMENTS:
     else:
         logger.warning(f"⚠️ No data fetched for {symbol}")
 
-# Save CALL data
-if call_data:
-    call_df = pd.concat(call_data, ignore_index=True)
-    call_filename = f"NIFTY_3MIN_{DATE_TO_FETCH}_CALL.csv"
-    call_df.to_csv(call_filename, index=False)
-    logger.info(f"✅ CALL data saved to {call_filename} ({len(call_df)} records)")
-else:
-    logger.warning("⚠️ No CALL data to save")
-
-# Save PUT data
-if put_data:
-    put_df = pd.concat(put_data, ignore_index=True)
-    put_filename = f"NIFTY_3MIN_{DATE_TO_FETCH}_PUT.csv"
-    put_df.to_csv(put_filename, index=False)
-    logger.info(f"✅ PUT data saved to {put_filename} ({len(put_df)} records)")
-else:
-    logger.warning("⚠️ No PUT data to save")
\ No newline at end of file
+def derive(frames, minutes):
+    """Resample each symbol's fetched candles to `minutes` bars, keeping the Symbol column"""
+    out = []
+    for df in frames:
+        bars = resample.resample_frame(df, minutes, INTERVAL_MINUTES[INTERVAL])
+        bars["Symbol"] = df["Symbol"].iloc[0]
+        out.append(bars)
+    return out
+
+# Save CALL / PUT data, one file per interval
+for minutes in args.timeframes or [INTERVAL_MINUTES[INTERVAL]]:
+    for side, frames in (("CALL", call_data), ("PUT", put_data)):
+        if not frames:
+            logger.warning(f"⚠️ No {side} data to save")
+            continue
+        if args.timeframes:
+            frames = derive(frames, minutes)
+        side_df = pd.concat(frames, ignore_index=True)
+        filename = f"NIFTY_{minutes}MIN_{DATE_TO_FETCH}_{side}.csv"
+        side_df.to_csv(filename, index=False)
+        logger.info(f"✅ {side} data saved to {filename} ({len(side_df)} records)")
\ No newline at end of file
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+# ================= INTRABAR EXECUTION =================
+# Decides stop/target hits from High/Low instead of Close and prices the fills.
+# An IntrabarPath is the price path the checks walk: the bars themselves, or a finer
+# sub-interval series (e.g. 1-minute bars inside 3-minute bars), which also tells
+# whether a bar's stop or target was touched first.
+#
+# Stop and trailing levels are only moved on bar closes, as in the close-based
+# engines, so a bar is always checked against the levels in force when it opened.
+
+EXIT_SCAN_WINDOW = 256  # Bars scanned per step while looking for a hit
+GAP_FILLS = ("open", "level")
+SAME_BAR = ("stop", "target")
+
+
+class ExecutionModel:
+    """
+    How fills are priced.
+    slippage:  points lost on every market fill (entries, stops, end-of-data exits)
+    gap_fill:  "open"  - a stop gapped through fills at the open (realistic)
+               "level" - always fill at the stop level (the old optimistic behaviour)
+               Targets gapped through fill at the open with "open" as well.
+    same_bar:  which leg wins when one path element touches both stop and target
+    """
+
+    def __init__(self, slippage=0.0, gap_fill="open", same_bar="stop"):
+        if gap_fill not in GAP_FILLS:
+            raise ValueError(f"Unknown gap_fill: {gap_fill}")
+        if same_bar not in SAME_BAR:
+            raise ValueError(f"Unknown same_bar: {same_bar}")
+        self.slippage = float(slippage)
+        self.gap_fill = gap_fill
+        self.same_bar = same_bar
+
+    def market_fill(self, price, side):
+        """Market order in the trade's direction (entry) costs slippage against it"""
+        return price + side * self.slippage
+
+    def stop_fill(self, level, open_price, side):
+        """Exit a side (1 long, -1 short) position at its stop"""
+        gapped = (open_price - level) * side <= 0
+        price = open_price if gapped and self.gap_fill == "open" else level
+        return price - side * self.slippage
+
+    def target_fill(self, level, open_price, side):
+        """Limit exit at the target; no slippage"""
+        gapped = (open_price - level) * side >= 0
+        return open_price if gapped and self.gap_fill == "open" else level
+
+
+class IntrabarPath:
+    """
+    Open/High/Low arrays of the path plus the bar each element belongs to.
+    start[b]:start[b + 1] are the path elements of bar b.
+    """
+
+    def __init__(self, open_, high, low, parent, bars):
+        self.open = np.ascontiguousarray(open_, dtype=np.float64)
+        self.high = np.ascontiguousarray(high, dtype=np.float64)
+        self.low = np.ascontiguousarray(low, dtype=np.float64)
+        self.parent = np.asarray(parent, dtype=np.int64)
+        self.start = np.searchsorted(self.parent, np.arange(bars + 1))
+
+    @classmethod
+    def from_bars(cls, df):
+        """Each bar is its own (single-element) path"""
+        n = len(df)
+        return cls(df['Open'].to_numpy(), df['High'].to_numpy(), df['Low'].to_numpy(), np.arange(n), n)
+
+    @classmethod
+    def from_sub_bars(cls, df, sub_df):
+        """
+        Finer candles (Datetime/Open/High/Low) mapped onto df's bars by start time.
+        Bars without any sub-bar fall back to their own OHLC.
+        """
+        bar_times = pd.DatetimeIndex(pd.to_datetime(df['Datetime']))
+        sub_times = pd.DatetimeIndex(pd.to_datetime(sub_df['Datetime']))
+        parent = bar_times.searchsorted(sub_times, side="right") - 1
+        keep = parent >= 0
+        n = len(df)
+        missing = np.setdiff1d(np.arange(n), parent[keep])
+
+        parent = np.concatenate([parent[keep], missing])
+        columns = [np.concatenate([sub_df[col].to_numpy(dtype=np.float64)[keep],
+                                   df[col].to_numpy(dtype=np.float64)[missing]])
+                   for col in ('Open', 'High', 'Low')]
+        sub_order = np.concatenate([sub_times.asi8[keep], bar_times.asi8[missing]])
+        order = np.lexsort((sub_order, parent))
+        return cls(*(c[order] for c in columns), parent[order], n)
+
+    def window(self, first_bar, stop_bar):
+        """Slice of path elements covering bars [first_bar, stop_bar)"""
+        return slice(self.start[first_bar], self.start[stop_bar])
+
+
+def _resolve(path, model, sl, tp, side, j, stop_hit, target_hit):
+    """Exit price of path element j given which legs it touched"""
+    take_stop = stop_hit and (not target_hit or model.same_bar == "stop")
+    if take_stop:
+        return model.stop_fill(sl, path.open[j], side)
+    return model.target_fill(tp, path.open[j], side)
+
+
+def trailing_stop_exit(path, close, entry_index, model, trailing_sl_offset, sl_shift_trigger, sl_difference):
+    """
+    Long trade entered at close[entry_index] with strategy_backtest's trailing SL.
+    The SL starts at entry - offset and, on each close at least sl_shift_trigger above
+    the entry, ratchets up to close - sl_difference. A bar is stopped out when its path
+    trades at or below the SL in force before its close.
+    The entry close already counts: it can move the SL (sl_shift_trigger <= 0) and, if the
+    SL is then at or above the entry, the trade is stopped out on the entry bar.
+    Returns (exit_bar, exit_price), or (-1, nan) if the SL is never hit.
+    """
+    n = len(close)
+    entry_price = close[entry_index]
+    trigger = entry_price + sl_shift_trigger
+    trailing_sl = entry_price - trailing_sl_offset
+    if entry_price >= trigger:
+        trailing_sl = max(trailing_sl, entry_price - sl_difference)
+    if entry_price <= trailing_sl:
+        return entry_index, model.stop_fill(trailing_sl, entry_price, 1)
+    start = entry_index + 1
+    width = EXIT_SCAN_WINDOW
+
+    while start < n:
+        stop = min(n, start + width)
+        window = close[start:stop]
+        candidates = np.where(window >= trigger, window - sl_difference, -np.inf)
+        after_close = np.maximum(np.maximum.accumulate(candidates), trailing_sl)
+        active = np.concatenate([[trailing_sl], after_close[:-1]])
+
+        span = path.window(start, stop)
+        levels = active[path.parent[span] - start]
+        hits = np.flatnonzero(path.low[span] <= levels)
+        if hits.size:
+            j = span.start + hits[0]
+            return path.parent[j], model.stop_fill(levels[hits[0]], path.open[j], 1)
+        trailing_sl = after_close[-1]
+        start = stop
+        width *= 2
+
+    return -1, np.nan
+
+
+def bracket_exit(path, entry_index, side, sl, tp, model):
+    """
+    Fixed stop and target for a side (1 long, -1 short) position entered at the close
+    of bar entry_index.
+    Returns (exit_bar, exit_price), or (-1, nan) if neither is touched.
+    """
+    n = len(path.start) - 1
+    start = entry_index + 1
+    width = EXIT_SCAN_WINDOW
+    while start < n:
+        stop = min(n, start + width)
+        span = path.window(start, stop)
+        if side > 0:
+            stop_hits = path.low[span] <= sl
+            target_hits = path.high[span] >= tp
+        else:
+            stop_hits = path.high[span] >= sl
+            target_hits = path.low[span] <= tp
+        hits = np.flatnonzero(stop_hits | target_hits)
+        if hits.size:
+            k = hits[0]
+            j = span.start + k
+            return path.parent[j], _resolve(path, model, sl, tp, side, j, stop_hits[k], target_hits[k])
+        start = stop
+        width *= 2
+    return -1, np.nan
@@ -0,0 +1,139 @@
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from candle_store import INTERVAL_MINUTES, STORE_TZ
+
+# ================= FAKE SMARTCONNECT =================
+# Offline stand-in for SmartApi.SmartConnect. Serves deterministic synthetic candles
+# (a per-token random walk) with optional latency and injected failures, so data
+# fetching, backfill and live-loop code can be exercised without a broker session.
+
+SESSION_OPEN = "09:15"
+SESSION_CLOSE = "15:30"
+
+
+class FakeSmartConnect:
+
+    def __init__(self, base_price=100.0, latency=0.0, fail_rate=0.0, seed=0):
+        self.base_price = base_price
+        self.latency = latency  # Seconds slept per call
+        self.fail_rate = fail_rate  # Fraction of calls returning an error response
+        self.seed = seed
+        self.calls = {"getCandleData": 0, "ltpData": 0, "placeOrder": 0}
+        self.orders = []
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    # ----- session -----
+    def generateSession(self, client_id, password, totp):
+        return {"status": True, "data": {"clientcode": client_id}}
+
+    def getfeedToken(self):
+        return "FAKE_FEED_TOKEN"
+
+    # ----- market data -----
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+            failed = self._rng.random() < self.fail_rate
+        if self.latency:
+            time.sleep(self.latency)
+        return failed
+
+    def day_candles(self, token, day, interval="ONE_MINUTE"):
+        """Full synthetic session for one token and trading day"""
+        minutes = INTERVAL_MINUTES[interval]
+        day = pd.Timestamp(day).normalize()
+        if day.dayofweek >= 5:
+            return pd.DataFrame(columns=["Datetime", "Open", "High", "Low", "Close", "Volume"])
+        start = pd.Timestamp(f"{day.date()} {SESSION_OPEN}", tz=STORE_TZ)
+        end = pd.Timestamp(f"{day.date()} {SESSION_CLOSE}", tz=STORE_TZ)
+        # Build 1-minute path, then aggregate, so every interval agrees with ONE_MINUTE
+        index = pd.date_range(start, end, freq="1min", inclusive="left")
+        rng = np.random.default_rng([self.seed, zlib.crc32(str(token).encode()), day.toordinal()])
+        opens = self.base_price * np.exp(np.cumsum(rng.normal(0, 0.002, len(index))))
+        closes = opens * np.exp(rng.normal(0, 0.002, len(index)))
+        highs = np.maximum(opens, closes) * (1 + np.abs(rng.normal(0, 0.001, len(index))))
+        lows = np.minimum(opens, closes) * (1 - np.abs(rng.normal(0, 0.001, len(index))))
+        volumes = rng.integers(1, 500, len(index)).astype(float)
+        bars = pd.DataFrame({"Open": opens, "High": highs, "Low": lows, "Close": closes, "Volume": volumes},
+                            index=index).round(2)
+        if minutes > 1:
+            bars = bars.resample(f"{minutes}min", origin=start).agg(
+                {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
+        return bars.rename_axis("Datetime").reset_index()
+
+    def getCandleData(self, params):
+        if self._call("getCandleData"):
+            return {"status": False, "message": "Access denied", "errorcode": "AB1004", "data": None}
+        start = pd.Timestamp(params["fromdate"]).tz_localize(STORE_TZ)
+        end = pd.Timestamp(params["todate"]).tz_localize(STORE_TZ)
+        frames = [self.day_candles(params["symboltoken"], day, params["interval"])
+                  for day in pd.date_range(start.normalize(), end.normalize(), freq="D")]
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return {"status": True, "message": "SUCCESS", "errorcode": "", "data": []}
+        df = pd.concat(frames, ignore_index=True)
+        df = df[(df["Datetime"] >= start) & (df["Datetime"] <= end)]
+        data = [[ts.isoformat(), o, h, l, c, v] for ts, o, h, l, c, v in df.itertuples(index=False)]
+        return {"status": True, "message": "SUCCESS", "errorcode": "", "data": data}
+
+    def ltpData(self, exchange, tradingsymbol, symboltoken):
+        if self._call("ltpData"):
+            return {"status": False, "message": "Access denied", "errorcode": "AB1004", "data": None}
+        now = pd.Timestamp.now(tz=STORE_TZ)
+        day = self.day_candles(symboltoken, now)
+        past = day[day["Datetime"] <= now]
+        ltp = float(past["Close"].iloc[-1]) if len(past) else self.base_price
+        return {"status": True, "data": {"tradingsymbol": tradingsymbol, "symboltoken": symboltoken, "ltp": ltp}}
+
+    # ----- orders -----
+    def placeOrder(self, params):
+        self._call("placeOrder")
+        with self._lock:
+            self.orders.append(dict(params))
+            return f"FAKE{len(self.orders):06d}"
+
+
+# ================= SYNTHETIC SCRIP MASTER =================
+# Same record layout as the broker's OpenAPIScripMaster.json (strike and tick size in
+# paise, expiry as DDMONYYYY), for exercising instruments.py offline.
+
+SCRIP_UNDERLYINGS = {  # name: (exchange, spot, strike step, lot size)
+    "NIFTY": ("NFO", 25950, 50, 65),
+    "BANKNIFTY": ("NFO", 51700, 100, 30),
+    "FINNIFTY": ("NFO", 24100, 50, 60),
+    "CRUDEOIL": ("MCX", 5750, 50, 100),
+}
+
+
+def scrip_master(day=None, expiries=6, strikes=60, equities=5000, underlyings=SCRIP_UNDERLYINGS):
+    """Records for weekly option expiries from day on, strikes around each spot, and filler equities"""
+    day = pd.Timestamp(day or pd.Timestamp.now(tz=STORE_TZ).date()).normalize()
+    records = []
+    tokens = {}  # Token numbering is per exchange, so the same token appears on NFO and MCX
+    for name, (exchange, spot, step, lot) in underlyings.items():
+        first = day + pd.Timedelta(days=(1 - day.dayofweek) % 7)  # Weekly Tuesday expiries
+        atm = round(spot / step) * step
+        for week in range(expiries):
+            expiry = first + pd.Timedelta(weeks=week)
+            code = expiry.strftime("%d%b%y").upper()
+            for k in range(-strikes, strikes + 1):
+                strike = atm + k * step
+                for suffix in ("CE", "PE"):
+                    token = tokens[exchange] = tokens.get(exchange, 35000) + 1
+                    records.append({
+                        "token": str(token), "symbol": f"{name}{code}{strike}{suffix}", "name": name,
+                        "expiry": expiry.strftime("%d%b%Y").upper(), "strike": f"{strike * 100:.6f}",
+                        "lotsize": str(lot), "instrumenttype": "OPTIDX" if exchange == "NFO" else "OPTFUT",
+                        "exch_seg": exchange, "tick_size": "5.000000",
+                    })
+    for k in range(equities):
+        records.append({"token": str(100000 + k), "symbol": f"EQ{k:05d}-EQ", "name": f"EQ{k:05d}", "expiry": "",
+                        "strike": "-1.000000", "lotsize": "1", "instrumenttype": "", "exch_seg": "NSE",
+                        "tick_size": "5.000000"})
+    return records
@@ -0,0 +1,256 @@
+import numpy as np
+
+# ================= INDICATOR KERNELS =================
+# Plain-NumPy indicator kernels shared by the backtester and both live bots.
+# Every function takes 1-D arrays (one series) or 2-D arrays (time x symbols) and
+# returns arrays of the same shape; nothing is written into the caller's data.
+# 2-D columns may start with NaN padding (e.g. an instrument that listed late);
+# each column is then computed from its own first valid row.
+#
+# smoothing="sma"    rolling simple means (what the bots have always used)
+# smoothing="wilder" true recursive Wilder smoothing (RMA, seeded with an SMA)
+
+
+def _as_2d(x):
+    x = np.asarray(x, dtype=np.float64)
+    return x[:, None] if x.ndim == 1 else x
+
+
+def _like(out, x):
+    return out[:, 0] if np.ndim(x) == 1 else out
+
+
+def _first_valid(x):
+    """Index of the first non-NaN row per column (len(x) for all-NaN columns)"""
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), x.shape[0])
+
+
+def _by_start(fn, *arrays):
+    """
+    Run fn on column groups that share a first valid row, so recursive kernels
+    start each column at its own beginning. fn gets and returns 2-D arrays.
+    """
+    arrays = [_as_2d(a) for a in arrays]
+    starts = _first_valid(arrays[0])
+    unique = np.unique(starts)
+    if unique.size == 1:
+        s = unique[0]
+        results = fn(*(a[s:] for a in arrays))
+        single = not isinstance(results, tuple)
+        results = (results,) if single else results
+        outs = []
+        for r in results:
+            out = np.full((arrays[0].shape[0], r.shape[1]), np.nan)
+            out[s:] = r
+            outs.append(out)
+        return outs[0] if single else tuple(outs)
+
+    outs = None
+    for s in unique:
+        cols = np.flatnonzero(starts == s)
+        if s >= arrays[0].shape[0]:
+            continue
+        results = fn(*(a[s:, cols] for a in arrays))
+        single = not isinstance(results, tuple)
+        results = (results,) if single else results
+        if outs is None:
+            outs = [np.full(arrays[0].shape, np.nan) for _ in results]
+        for out, r in zip(outs, results):
+            out[s:, cols] = r
+    if outs is None:
+        return np.full(arrays[0].shape, np.nan)
+    return outs[0] if len(outs) == 1 else tuple(outs)
+
+
+def _linear_recursion(x, alpha, prev):
+    """
+    y_t = alpha * x_t + (1 - alpha) * y_{t-1}, starting from y_{-1} = prev.
+    Evaluated block by block in closed form (powers of the decay + cumsum), so the
+    Python loop runs once per block instead of once per bar.
+    """
+    n = x.shape[0]
+    out = np.empty_like(x)
+    decay = 1.0 - alpha
+    if n == 0:
+        return out
+    if decay <= 0.0:
+        out[:] = x
+        return out
+    # Largest block whose decay**-block stays far from float overflow
+    block = int(max(1, min(256, 150 / -np.log10(decay))))
+    k = np.arange(block, dtype=np.float64)
+    fwd = decay ** k  # decay^k
+    inv = decay ** -k  # decay^-k
+    prev = np.asarray(prev, dtype=np.float64)
+    for start in range(0, n, block):
+        stop = min(n, start + block)
+        m = stop - start
+        acc = np.cumsum(inv[:m, None] * x[start:stop], axis=0)
+        out[start:stop] = fwd[:m, None] * (decay * prev + alpha * acc)
+        prev = out[stop - 1]
+    return out
+
+
+# ================= MOVING AVERAGES =================
+
+def sma(x, period):
+    """Rolling simple mean; NaN until `period` values (matches pandas rolling(period).mean())"""
+    x2 = _as_2d(x)
+    out = np.full(x2.shape, np.nan)
+    if x2.shape[0] >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(x2, period, axis=0)
+        out[period - 1:] = windows.mean(axis=-1)
+    return _like(out, x)
+
+
+def ema(x, span, adjust=False):
+    """Exponential moving average (matches pandas ewm(span=span, adjust=adjust).mean())"""
+    alpha = 2.0 / (span + 1.0)
+
+    def kernel(v):
+        if adjust:
+            # Weighted mean with weights decay^i == unadjusted recursion from 0, renormalised
+            z = _linear_recursion(v, alpha, np.zeros(v.shape[1]))
+            norm = 1.0 - (1.0 - alpha) ** np.arange(1, v.shape[0] + 1)[:, None]
+            return z / norm
+        return _linear_recursion(v, alpha, v[0])
+
+    return _like(_by_start(kernel, x), x)
+
+
+def wilder(x, period):
+    """Wilder's smoothing (RMA): SMA of the first `period` values, then y += (x - y) / period"""
+
+    def kernel(v):
+        out = np.full(v.shape, np.nan)
+        if v.shape[0] < period:
+            return out
+        seed = v[:period].mean(axis=0)
+        out[period - 1] = seed
+        out[period:] = _linear_recursion(v[period:], 1.0 / period, seed)
+        return out
+
+    return _like(_by_start(kernel, x), x)
+
+
+def _smooth(x, period, smoothing):
+    if smoothing == "wilder":
+        return wilder(x, period)
+    if smoothing == "sma":
+        return sma(x, period)
+    raise ValueError(f"Unknown smoothing: {smoothing}")
+
+
+# ================= TREND / VOLATILITY =================
+
+def true_range(high, low, close):
+    """max(H-L, |H-prevC|, |L-prevC|); the first bar is H-L"""
+    h, l, c = _as_2d(high), _as_2d(low), _as_2d(close)
+    prev_close = np.vstack([np.full((1, c.shape[1]), np.nan), c[:-1]])
+    with np.errstate(invalid="ignore"):
+        tr = np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+    return _like(tr, close)
+
+
+def directional_movement(high, low):
+    """Standard +DM/-DM: the larger of the up/down move, if positive; 0 on the first bar"""
+    h, l = _as_2d(high), _as_2d(low)
+    up = np.vstack([np.full((1, h.shape[1]), np.nan), h[1:] - h[:-1]])
+    down = np.vstack([np.full((1, l.shape[1]), np.nan), l[:-1] - l[1:]])
+    with np.errstate(invalid="ignore"):
+        plus = np.where((up > down) & (up > 0), up, 0.0)
+        minus = np.where((down > up) & (down > 0), down, 0.0)
+    # Keep NaN padding NaN so smoothing starts at each column's first bar
+    pad = np.isnan(h)
+    plus[pad] = np.nan
+    minus[pad] = np.nan
+    return _like(plus, high), _like(minus, high)
+
+
+def atr(high, low, close, period=14, smoothing="sma"):
+    """Average true range"""
+    return _smooth(true_range(high, low, close), period, smoothing)
+
+
+def adx(high, low, close, period=14, smoothing="sma"):
+    """
+    Average directional index
+    Returns (adx, plus_di, minus_di)
+    """
+    tr = _smooth(true_range(high, low, close), period, smoothing)
+    plus_dm, minus_dm = directional_movement(high, low)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = 100 * _smooth(plus_dm, period, smoothing) / tr
+        minus_di = 100 * _smooth(minus_dm, period, smoothing) / tr
+        dx = np.abs(plus_di - minus_di) / np.abs(plus_di + minus_di) * 100
+    return _smooth(dx, period, smoothing), plus_di, minus_di
+
+
+# ================= MOMENTUM =================
+
+def rsi(close, period=14, smoothing="sma"):
+    """Relative strength index from smoothed gains/losses"""
+    c = _as_2d(close)
+    delta = np.vstack([np.full((1, c.shape[1]), np.nan), c[1:] - c[:-1]])
+    gain = np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None))
+    loss = np.where(np.isnan(delta), np.nan, -np.clip(delta, None, 0))
+    # The first delta is always NaN, so Wilder smoothing starts on the second bar
+    avg_gain, avg_loss = _smooth(gain, period, smoothing), _smooth(loss, period, smoothing)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 - 100 / (1 + avg_gain / avg_loss)
+    return _like(out, close)
+
+
+def macd(close, fast=12, slow=26, signal=9, adjust=True):
+    """
+    MACD line, signal line and both EMAs
+    Returns (macd, signal, ema_fast, ema_slow)
+    """
+    ema_fast = ema(close, fast, adjust=adjust)
+    ema_slow = ema(close, slow, adjust=adjust)
+    line = ema_fast - ema_slow
+    return line, ema(line, signal, adjust=adjust), ema_fast, ema_slow
+
+
+def rolling_vwap(close, volume, lookback=60):
+    """Volume-weighted close over the last `lookback` bars (shorter at the start)"""
+    c, v = _as_2d(close), _as_2d(volume)
+    pv = np.nancumsum(c * v, axis=0)
+    vol = np.nancumsum(v, axis=0)
+    pv_prev = np.vstack([np.zeros((lookback, c.shape[1])), pv[:-lookback]])[:c.shape[0]]
+    vol_prev = np.vstack([np.zeros((lookback, c.shape[1])), vol[:-lookback]])[:c.shape[0]]
+    window_vol = vol - vol_prev
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(window_vol > 0, (pv - pv_prev) / window_vol, np.nan)
+    out[np.isnan(c)] = np.nan
+    return _like(out, close)
+
+
+# ================= MICRO-BENCHMARK =================
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    for shape in [(1_000_000,), (10_000, 500)]:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, shape), axis=0))
+        high = close * (1 + np.abs(rng.normal(0, 0.001, shape)))
+        low = close * (1 - np.abs(rng.normal(0, 0.001, shape)))
+        volume = rng.integers(1, 500, shape).astype(np.float64)
+        kernels = [
+            ("ema", lambda: ema(close, 9)),
+            ("wilder", lambda: wilder(close, 14)),
+            ("rsi", lambda: rsi(close, 14)),
+            ("rsi/wilder", lambda: rsi(close, 14, "wilder")),
+            ("atr", lambda: atr(high, low, close, 14)),
+            ("adx", lambda: adx(high, low, close, 14)),
+            ("adx/wilder", lambda: adx(high, low, close, 14, "wilder")),
+            ("macd", lambda: macd(close)),
+            ("vwap", lambda: rolling_vwap(close, volume, 60)),
+        ]
+        print(f"\nshape {shape}")
+        for name, fn in kernels:
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            print(f"  {name:<11} {elapsed * 1000:9.1f} ms  {close.size / elapsed / 1e6:7.1f} M values/sec")
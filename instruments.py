@@ -0,0 +1,400 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+from candle_store import STORE_TZ
+
+# ================= INSTRUMENT MASTER =================
+# The broker's scrip-master dump (OpenAPIScripMaster.json, ~100 MB of JSON) is parsed
+# once per download into compact binary columns: tokens, strikes and lot sizes as
+# integers, expiry as days since epoch, names/exchanges as category codes, and symbols
+# as one byte blob plus offsets. Rows are sorted by (exchange, name, option type,
+# expiry, strike), so each option chain is a contiguous slice and strike lookups are a
+# searchsorted on it. Everything reads from the local file; download() is the only
+# network access and is never called implicitly.
+SCRIP_MASTER_URL = "https://margincalculator.angelbroking.com/OpenAPI_files/json/OpenAPIScripMaster.json"
+SCRIP_MASTER_FILE = os.environ.get("SCRIP_MASTER_FILE", "OpenAPIScripMaster.json")
+INSTRUMENT_CACHE_DIR = os.environ.get("INSTRUMENT_CACHE_DIR", ".instrument_cache")
+CACHE_VERSION = 1
+META_FILE = "meta.json"
+NAMES_FILE = "names.json"  # All underlying/equity names; only read when a row is materialised
+NO_EXPIRY = -1
+IST_OFFSET = 5 * 3600 + 30 * 60  # Seconds; expiries roll over at IST midnight
+OPTION_TYPES = {"CE": 1, "PE": 2}
+OPTION_SIDES = {1: "CALL", 2: "PUT"}  # Ai_bot's "type" values
+FIELDS = ("token", "symbol", "name", "expiry", "strike", "lotsize", "instrumenttype", "exch_seg", "tick_size")
+COLUMNS = {  # Binary columns and their dtypes
+    "token": "<i8", "strike": "<i8", "expiry": "<i4", "lotsize": "<i4", "tick_size": "<f8",
+    "option_type": "<i1", "name": "<i4", "exchange": "<i4", "instrumenttype": "<i4",
+    "symbol_offsets": "<i8", "symbol_blob": "|u1", "token_order": "<i8", "symbol_order": "<i8",
+}
+
+
+def downloaded_on(path=SCRIP_MASTER_FILE):
+    """IST date the local scrip master was last written, or None if there is none"""
+    if not os.path.exists(path):
+        return None
+    return pd.Timestamp(os.path.getmtime(path), unit="s", tz="UTC").tz_convert(STORE_TZ).date()
+
+
+def downloaded_today(path=SCRIP_MASTER_FILE):
+    """False once the local scrip master is from an earlier day: new expiries and strikes are missing"""
+    return downloaded_on(path) == pd.Timestamp.now(tz=STORE_TZ).date()
+
+
+def download(path=SCRIP_MASTER_FILE, url=SCRIP_MASTER_URL, force=False):
+    """Fetch the scrip master unless the local copy is already from today (IST); returns path"""
+    if not force and downloaded_today(path):
+        return path
+    tmp = f"{path}.tmp{os.getpid()}"
+    with urllib.request.urlopen(url, timeout=60) as response, open(tmp, "wb") as f:
+        shutil.copyfileobj(response, f)
+    os.replace(tmp, path)
+    logger.info(f"📥 Scrip master downloaded to {path}")
+    return path
+
+
+def _source_info(path):
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(path=SCRIP_MASTER_FILE, cache_dir=INSTRUMENT_CACHE_DIR, meta=None):
+    meta = meta or _read_meta(cache_dir)
+    return (meta is not None and meta.get("version") == CACHE_VERSION
+            and meta["path"] == os.path.abspath(path) and meta["source"] == _source_info(path))
+
+
+def build(path=SCRIP_MASTER_FILE, cache_dir=INSTRUMENT_CACHE_DIR):
+    """Parse the JSON dump and (re)write the binary cache; returns the number of instruments"""
+    info = _source_info(path)
+    with open(path) as f:
+        df = pd.DataFrame.from_records(json.load(f), columns=list(FIELDS))
+    df = df.fillna("").astype(str)
+
+    symbols = df["symbol"]
+    option = df["instrumenttype"].str.startswith("OPT")
+    option_type = np.select([option & symbols.str.endswith("CE"), option & symbols.str.endswith("PE")],
+                            [OPTION_TYPES["CE"], OPTION_TYPES["PE"]], 0).astype(np.int8)
+    expiry = pd.to_datetime(df["expiry"], format="%d%b%Y", errors="coerce")
+    expiry_days = ((expiry - pd.Timestamp("1970-01-01")) // pd.Timedelta(days=1)).fillna(NO_EXPIRY)
+    names, name_codes = _codes(df["name"])
+    exchanges, exchange_codes = _codes(df["exch_seg"])
+    kinds, kind_codes = _codes(df["instrumenttype"])
+    columns = {
+        "token": pd.to_numeric(df["token"], errors="coerce").fillna(-1).to_numpy(np.int64),
+        "strike": np.rint(pd.to_numeric(df["strike"], errors="coerce").fillna(-1)).to_numpy(np.int64),
+        "expiry": expiry_days.to_numpy(np.int32),
+        "lotsize": pd.to_numeric(df["lotsize"], errors="coerce").fillna(0).to_numpy(np.int32),
+        "tick_size": pd.to_numeric(df["tick_size"], errors="coerce").fillna(0).to_numpy(np.float64),
+        "option_type": option_type,
+        "name": name_codes,
+        "exchange": exchange_codes,
+        "instrumenttype": kind_codes,
+    }
+    # Every chain (exchange, name, CE/PE, expiry) becomes one slice with ascending strikes
+    order = np.lexsort((columns["strike"], columns["expiry"], columns["option_type"],
+                        columns["name"], columns["exchange"]))
+    columns = {k: v[order] for k, v in columns.items()}
+    symbols = symbols.to_numpy()[order]
+    encoded = [s.encode() for s in symbols]
+    columns["symbol_offsets"] = np.r_[0, np.cumsum([len(s) for s in encoded])].astype(np.int64)
+    columns["symbol_blob"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    columns["token_order"] = np.argsort(columns["token"], kind="stable").astype(np.int64)
+    columns["symbol_order"] = np.argsort(symbols, kind="stable").astype(np.int64)
+
+    tmp = f"{cache_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, dtype in COLUMNS.items():
+        columns[name].astype(dtype).tofile(os.path.join(tmp, f"{name}.bin"))
+    option_names = np.unique(columns["name"][columns["option_type"] > 0])
+    meta = {"version": CACHE_VERSION, "path": os.path.abspath(path), "source": info, "rows": len(df),
+            "option_names": {names[k]: int(k) for k in option_names}, "exchanges": exchanges,
+            "instrumenttypes": kinds}
+    with open(os.path.join(tmp, META_FILE), "w") as f:
+        json.dump(meta, f)
+    with open(os.path.join(tmp, NAMES_FILE), "w") as f:
+        json.dump(names, f)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp, cache_dir)
+    return len(df)
+
+
+def _today():
+    """Today (IST) in days since epoch"""
+    return int((time.time() + IST_OFFSET) // 86400)
+
+
+def _days(day):
+    """Days since epoch of a date-like value (ints pass through)"""
+    if isinstance(day, (int, np.integer)):
+        return int(day)
+    return int(np.datetime64(pd.Timestamp(day).date(), "D").astype(np.int64))
+
+
+def _codes(values):
+    codes, categories = pd.factorize(values)
+    return [str(c) for c in categories], codes.astype(np.int32)
+
+
+class InstrumentMaster:
+    """
+    Lookups over the binary scrip master. Option results use Ai_bot's option format
+    ({"symbol", "token", "strike", "type": "CALL"/"PUT"}) plus expiry, lot size and exchange.
+    """
+
+    def __init__(self, columns, meta, cache_dir=INSTRUMENT_CACHE_DIR):
+        self.meta = meta
+        self.cache_dir = cache_dir
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+        # Only underlyings with options are looked up by name (the master lists ~100k equities)
+        self.name_codes = meta["option_names"]
+        self._names = None
+        self.exchange_codes = {e: k for k, e in enumerate(meta["exchanges"])}
+
+        # Chain slices: (exchange, name, option type, expiry) -> (lo, hi)
+        keys = (self.exchange, self.name, self.option_type, self.expiry)
+        change = np.zeros(len(self.token), dtype=bool)
+        change[:1] = True
+        for key in keys:
+            change[1:] |= key[1:] != key[:-1]
+        starts = np.flatnonzero(change)
+        ends = np.r_[starts[1:], len(self.token)]
+        options = self.option_type[starts] > 0
+        starts, ends = starts[options], ends[options]
+        self.chains = {
+            (int(e), int(n), int(t), int(x)): (int(lo), int(hi))
+            for e, n, t, x, lo, hi in zip(self.exchange[starts], self.name[starts], self.option_type[starts],
+                                         self.expiry[starts], starts, ends)
+        }
+        self._expiries = {}  # (exchange, name) -> sorted option expiries
+        for e, n, _, x in self.chains:
+            self._expiries.setdefault((e, n), set()).add(x)
+        self._expiries = {k: np.array(sorted(v), dtype=np.int32) for k, v in self._expiries.items()}
+
+    @classmethod
+    def load(cls, path=SCRIP_MASTER_FILE, cache_dir=INSTRUMENT_CACHE_DIR, rebuild=False):
+        """Binary cache of path, rebuilt first if path changed since it was written"""
+        meta = _read_meta(cache_dir)
+        if rebuild or not is_fresh(path, cache_dir, meta):
+            start = time.perf_counter()
+            rows = build(path, cache_dir)
+            logger.info(f"📦 Instrument master: {rows:,} instruments cached in {time.perf_counter() - start:.2f}s")
+            meta = _read_meta(cache_dir)
+        columns = {name: np.fromfile(os.path.join(cache_dir, f"{name}.bin"), dtype=dtype)
+                   for name, dtype in COLUMNS.items()}
+        return cls(columns, meta, cache_dir)
+
+    def __len__(self):
+        return len(self.token)
+
+    # ----- rows -----
+
+    @property
+    def names(self):
+        if self._names is None:
+            with open(os.path.join(self.cache_dir, NAMES_FILE)) as f:
+                self._names = json.load(f)
+        return self._names
+
+    def symbol_at(self, i):
+        return self.symbol_blob[self.symbol_offsets[i]:self.symbol_offsets[i + 1]].tobytes().decode()
+
+    def row(self, i):
+        strike = self.strike[i] / 100
+        expiry = int(self.expiry[i])
+        return {
+            "symbol": self.symbol_at(i),
+            "token": str(self.token[i]),
+            "name": self.names[self.name[i]],
+            "strike": int(strike) if strike.is_integer() else strike,
+            "type": OPTION_SIDES.get(int(self.option_type[i])),
+            "expiry": None if expiry == NO_EXPIRY else str(np.datetime64(expiry, "D")),
+            "lotsize": int(self.lotsize[i]),
+            "tick_size": self.tick_size[i] / 100,
+            "exchange": self.meta["exchanges"][self.exchange[i]],
+        }
+
+    def by_token(self, token, exchange="NFO"):
+        """The instrument with this token on exchange (tokens repeat across exchanges), or None"""
+        exchange_code = self.exchange_codes.get(exchange, -1)
+        lo = int(np.searchsorted(self.token, int(token), side="left", sorter=self.token_order))
+        hi = int(np.searchsorted(self.token, int(token), side="right", sorter=self.token_order))
+        for i in self.token_order[lo:hi]:
+            if self.exchange[i] == exchange_code:
+                return self.row(i)
+        return None
+
+    def by_symbol(self, symbol):
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.symbol_at(self.symbol_order[mid]) < symbol:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self.symbol_at(self.symbol_order[lo]) == symbol:
+            return self.row(self.symbol_order[lo])
+        return None
+
+    # ----- option chains -----
+
+    def _key(self, name, exchange):
+        return self.exchange_codes.get(exchange, -1), self.name_codes.get(name, -1)
+
+    def expiries(self, name, exchange="NFO"):
+        """Option expiries of an underlying as dates, nearest first"""
+        days = self._expiries.get(self._key(name, exchange), np.empty(0, dtype=np.int32))
+        return [pd.Timestamp(int(d), unit="D").date() for d in days]
+
+    def nearest_expiry(self, name, exchange="NFO", on_or_after=None):
+        """Days since epoch of the first expiry on or after the date (default: today IST), or None"""
+        days = self._expiries.get(self._key(name, exchange))
+        if days is None:
+            return None
+        k = int(np.searchsorted(days, _today() if on_or_after is None else _days(on_or_after)))
+        return int(days[k]) if k < len(days) else None
+
+    def _chain(self, name, option_type, expiry, exchange):
+        exchange_code, name_code = self._key(name, exchange)
+        expiry = self.nearest_expiry(name, exchange) if expiry is None else _days(expiry)
+        return self.chains.get((exchange_code, name_code, OPTION_TYPES[option_type], expiry), (0, 0))
+
+    def strikes(self, name, expiry=None, option_type="CE", exchange="NFO"):
+        """Listed strikes (rupees, ascending) of one chain"""
+        lo, hi = self._chain(name, option_type, expiry, exchange)
+        return self.strike[lo:hi] / 100
+
+    def nearest_strike(self, name, price, expiry=None, option_type="CE", exchange="NFO"):
+        """Row index of the listed strike closest to price (ties go to the lower strike), or None"""
+        lo, hi = self._chain(name, option_type, expiry, exchange)
+        if lo == hi:
+            return None
+        target = round(price * 100)
+        k = lo + int(np.searchsorted(self.strike[lo:hi], target))
+        if k == hi or (k > lo and target - self.strike[k - 1] <= self.strike[k] - target):
+            k -= 1
+        return k
+
+    def option(self, name, strike, option_type, expiry=None, exchange="NFO"):
+        """The contract at exactly this strike, or None"""
+        k = self.nearest_strike(name, strike, expiry, option_type, exchange)
+        if k is None or self.strike[k] != round(strike * 100):
+            return None
+        return self.row(k)
+
+    def atm(self, name, spot, expiry=None, exchange="NFO"):
+        """ATM strike in rupees (nearest listed call strike to spot), or None"""
+        k = self.nearest_strike(name, spot, expiry, "CE", exchange)
+        return None if k is None else self.row(k)["strike"]
+
+    def strikes_around(self, name, spot, n=0, expiry=None, option_types=("CE", "PE"), exchange="NFO"):
+        """Contracts from n strikes below to n strikes above ATM, for each option type"""
+        if expiry is None:
+            expiry = self.nearest_expiry(name, exchange)
+        out = []
+        for option_type in option_types:
+            k = self.nearest_strike(name, spot, expiry, option_type, exchange)
+            if k is None:
+                continue
+            lo, hi = self._chain(name, option_type, expiry, exchange)
+            out += [self.row(i) for i in range(max(lo, k - n), min(hi, k + n + 1))]
+        return out
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    from fake_smartapi import scrip_master
+
+    parser = argparse.ArgumentParser(description="Build and query the binary instrument master")
+    parser.add_argument("--file", default=SCRIP_MASTER_FILE)
+    parser.add_argument("--cache-dir", default=INSTRUMENT_CACHE_DIR)
+    parser.add_argument("--download", action="store_true", help="Fetch today's scrip master first")
+    parser.add_argument("--synthetic", action="store_true", help="Write a synthetic scrip master to --file first")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--name", default="NIFTY", help="Underlying for the lookup")
+    parser.add_argument("--exchange", default="NFO")
+    parser.add_argument("--spot", type=float, help="Spot price: print the ATM chain around it")
+    parser.add_argument("--around", type=int, default=2, help="Strikes either side of ATM")
+    parser.add_argument("--verify", action="store_true", help="Check lookups against a scan of the JSON records")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        with open(args.file, "w") as f:
+            json.dump(scrip_master(equities=150_000), f)
+    if args.download:
+        download(args.file)
+    if not os.path.exists(args.file):
+        logger.error(f"❌ {args.file} not found; use --download (or --synthetic for an offline sample)")
+        exit(1)
+
+    start = time.perf_counter()
+    with open(args.file) as f:
+        records = json.load(f)
+    json_time = time.perf_counter() - start
+    master = InstrumentMaster.load(args.file, args.cache_dir, args.rebuild)
+    start = time.perf_counter()
+    master = InstrumentMaster.load(args.file, args.cache_dir)
+    load_time = time.perf_counter() - start
+    logger.info(f"JSON parse: {json_time:.3f}s   binary load: {load_time * 1000:.1f}ms   "
+                f"({len(master):,} instruments, {len(master.chains):,} option chains)")
+
+    expiries = master.expiries(args.name, args.exchange)
+    logger.info(f"{args.name} expiries: {[str(d) for d in expiries[:6]]}")
+    spot = args.spot
+    if spot is None and expiries:
+        strikes = master.strikes(args.name, option_type="CE", exchange=args.exchange)
+        spot = float(strikes[len(strikes) // 2]) + 7 if len(strikes) else None
+    if spot is not None:
+        calls = 20_000
+        start = time.perf_counter()
+        for _ in range(calls):
+            master.strikes_around(args.name, spot, args.around, exchange=args.exchange)
+        lookup_us = (time.perf_counter() - start) / calls * 1e6
+        logger.info(f"ATM {master.atm(args.name, spot, exchange=args.exchange)} for spot {spot} "
+                    f"({lookup_us:.1f}µs per {2 * args.around + 1}-strike CE+PE lookup)")
+        for opt in master.strikes_around(args.name, spot, args.around, exchange=args.exchange):
+            logger.info(f"  {opt['symbol']:<28} {opt['token']:>8} {opt['strike']:>8} {opt['type']:<4} "
+                        f"{opt['expiry']} lot {opt['lotsize']}")
+
+    if args.verify:
+        mismatches = 0
+        rng = np.random.default_rng(0)
+        for record in (records[i] for i in rng.choice(len(records), min(2000, len(records)), replace=False)):
+            got = master.by_token(record["token"], record["exch_seg"])
+            by_symbol = master.by_symbol(record["symbol"])
+            if got is None or got["symbol"] != record["symbol"] or by_symbol != got:
+                mismatches += 1
+                logger.error(f"❌ Lookup mismatch for {record['token']} {record['symbol']}")
+        for name, exchange in {(r["name"], r["exch_seg"]) for r in records if r["instrumenttype"].startswith("OPT")}:
+            for day in master.expiries(name, exchange)[:3]:
+                code = day.strftime("%d%b%Y").upper()
+                for option_type in OPTION_TYPES:
+                    chain = sorted(float(r["strike"]) / 100 for r in records
+                                   if r["name"] == name and r["exch_seg"] == exchange and r["expiry"] == code
+                                   and r["instrumenttype"].startswith("OPT") and r["symbol"].endswith(option_type))
+                    price = float(rng.uniform(chain[0], chain[-1]))
+                    expected = min(chain, key=lambda s: (abs(s - price), s))
+                    k = master.nearest_strike(name, price, day, option_type, exchange)
+                    if master.strike[k] / 100 != expected or list(master.strikes(name, day, option_type, exchange)) != chain:
+                        mismatches += 1
+                        logger.error(f"❌ Strike mismatch for {name} {day} {option_type} at {price}")
+        logger.info(f"Checked token/symbol/strike lookups, {mismatches} mismatches")
+        exit(0 if mismatches == 0 else 1)
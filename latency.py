@@ -0,0 +1,262 @@
+import argparse
+import bisect
+import csv
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =========================
+# HOT-PATH LATENCY METRICS
+# =========================
+# Per-stage latency histograms (LTP fetch, candle fetch, indicators, order round trip,
+# ...) keyed by (stage, symbol), per-symbol loop jitter and loop overrun counts.
+# Recording is a perf_counter() pair, a bisect into fixed buckets and a few integer
+# adds under one lock, so it can stay on in production. Exported as Prometheus text
+# or CSV, optionally from a small local HTTP endpoint.
+
+# Histogram upper bounds in seconds (+Inf is implicit)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+METRIC_PREFIX = "algotradex"
+CSV_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """Bucket counts plus count/sum/max of observed seconds"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, capped at the observed max"""
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for k, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return min(BUCKETS[k], self.max) if k < len(BUCKETS) else self.max
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("recorder", "stage", "symbol", "start")
+
+    def __init__(self, recorder, stage, symbol):
+        self.recorder = recorder
+        self.stage = stage
+        self.symbol = symbol
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.observe(self.stage, time.perf_counter() - self.start, self.symbol)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class LatencyRecorder:
+    """
+    observe(stage, seconds, symbol)  - record one measurement
+    timed(stage, symbol)             - context manager timing a block
+    mark(symbol)                     - per-symbol evaluation tick; records loop jitter
+    loop_done(loop, seconds, budget) - loop body duration; counts and reports overruns
+    """
+
+    def __init__(self, enabled=True, clock=time.perf_counter, on_overrun=None):
+        self.enabled = enabled
+        self.clock = clock
+        self.on_overrun = on_overrun or (lambda loop, seconds, budget: print(
+            f"[OVERRUN] {loop} loop took {seconds:.2f}s (budget {budget}s)"))
+        self.histograms = {}  # (stage, symbol) -> Histogram
+        self.overruns = {}  # loop -> count
+        self._last_mark = {}  # symbol -> clock() of the previous evaluation
+        self._last_interval = {}  # symbol -> previous evaluation interval
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, symbol=""):
+        if not self.enabled:
+            return
+        key = (stage, symbol)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    def timed(self, stage, symbol=""):
+        return _Timer(self, stage, symbol) if self.enabled else _NULL_TIMER
+
+    def mark(self, symbol):
+        """
+        Called each time a symbol is evaluated. Jitter is how much the interval since
+        the previous evaluation differs from the one before it (RFC 3550 style).
+        """
+        if not self.enabled:
+            return
+        now = self.clock()
+        # Ticks and the polling loop mark from different threads
+        with self._lock:
+            last = self._last_mark.get(symbol)
+            self._last_mark[symbol] = now
+            if last is None:
+                return
+            interval = now - last
+            previous = self._last_interval.get(symbol)
+            self._last_interval[symbol] = interval
+        self.observe("interval", interval, symbol)
+        if previous is not None:
+            self.observe("jitter", abs(interval - previous), symbol)
+
+    def loop_done(self, loop, seconds, budget):
+        """Record one loop body; returns True (and reports) if it overran budget"""
+        self.observe(f"{loop}_loop", seconds)
+        if seconds <= budget:
+            return False
+        with self._lock:
+            self.overruns[loop] = self.overruns.get(loop, 0) + 1
+        self.on_overrun(loop, seconds, budget)
+        return True
+
+    def snapshot(self):
+        """Copies of the histograms and overrun counts, taken under the lock"""
+        with self._lock:
+            hists = {}
+            for key, h in self.histograms.items():
+                copy = Histogram()
+                copy.counts, copy.count, copy.total, copy.max = list(h.counts), h.count, h.total, h.max
+                hists[key] = copy
+            return hists, dict(self.overruns)
+
+    # ----- export -----
+
+    def prometheus_text(self, prefix=METRIC_PREFIX):
+        hists, overruns = self.snapshot()
+        name = f"{prefix}_stage_seconds"
+        lines = [f"# HELP {name} Hot-path stage latency", f"# TYPE {name} histogram"]
+        for (stage, symbol), h in sorted(hists.items()):
+            labels = f'stage="{stage}",symbol="{symbol}"'
+            cumulative = 0
+            for bound, c in zip(BUCKETS + (float("inf"),), h.counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {h.total!r}")
+            lines.append(f"{name}_count{{{labels}}} {h.count}")
+        overrun = f"{prefix}_loop_overruns_total"
+        lines += [f"# HELP {overrun} Loop bodies that took longer than their sleep interval",
+                  f"# TYPE {overrun} counter"]
+        lines += [f'{overrun}{{loop="{loop}"}} {n}' for loop, n in sorted(overruns.items())]
+        return "\n".join(lines) + "\n"
+
+    def csv_text(self):
+        hists, overruns = self.snapshot()
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["stage", "symbol", "count", "mean_ms", "max_ms"]
+                        + [f"p{int(q * 100)}_ms" for q in CSV_QUANTILES])
+        for (stage, symbol), h in sorted(hists.items()):
+            writer.writerow([stage, symbol, h.count, f"{h.total / h.count * 1000:.3f}", f"{h.max * 1000:.3f}"]
+                            + [f"{h.quantile(q) * 1000:.3f}" for q in CSV_QUANTILES])
+        for loop, n in sorted(overruns.items()):
+            writer.writerow([f"{loop}_overruns", "", n, "", ""] + [""] * len(CSV_QUANTILES))
+        return out.getvalue()
+
+    def write_csv(self, path):
+        with open(path, "w", newline="") as f:
+            f.write(self.csv_text())
+
+    def serve(self, host=METRICS_HOST, port=METRICS_PORT):
+        """Serve /metrics (Prometheus text) and /metrics.csv on a daemon thread"""
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, kind = recorder.prometheus_text(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.csv":
+                    body, kind = recorder.csv_text(), "text/csv"
+                else:
+                    self.send_error(404)
+                    return
+                payload = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+        thread.start()
+        print(f"[metrics] http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+# =========================
+# OVERHEAD CHECK
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the per-call cost of latency recording")
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    recorder = LatencyRecorder()
+    symbols = [f"SYM{k}" for k in range(8)]
+
+    start = time.perf_counter()
+    for k in range(args.calls):
+        recorder.observe("ltp", 0.001 * (k % 50), symbols[k % 8])
+    observe_ns = (time.perf_counter() - start) / args.calls * 1e9
+
+    start = time.perf_counter()
+    for k in range(args.calls):
+        with recorder.timed("signal", symbols[k % 8]):
+            pass
+    timed_ns = (time.perf_counter() - start) / args.calls * 1e9
+
+    recorder.enabled = False
+    start = time.perf_counter()
+    for k in range(args.calls):
+        with recorder.timed("signal", symbols[k % 8]):
+            pass
+    disabled_ns = (time.perf_counter() - start) / args.calls * 1e9
+
+    print(f"observe(): {observe_ns:.0f} ns/call")
+    print(f"timed() block: {timed_ns:.0f} ns/call")
+    print(f"timed() block, disabled: {disabled_ns:.0f} ns/call")
+    print(recorder.csv_text())
@@ -0,0 +1,533 @@
+import argparse
+import multiprocessing as mp
+import queue
+import signal
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from latency import LatencyRecorder
+from position_book import PositionBook
+from scalp_strategy import LONG, SHORT, WARMUP_BARS, scalp_indicator_state, sl_tp_levels, snapshot_signal
+from tick_feed import ReplayTickSource, TickFeed
+
+# =========================
+# SHARDED LIVE ENGINE
+# =========================
+# Scans a whole option chain with the Ai_bot scalp rules across worker processes.
+# The coordinator process receives ticks, builds 1-minute bars and writes them into
+# one shared-memory block (closed-bar ring, forming bar and LTP per symbol). Each
+# worker owns a contiguous shard of symbols, keeps their streaming indicator state and
+# reads new bars straight from shared memory; only entry intents (a small tuple) go
+# back over a queue. The coordinator alone owns `positions` (a PositionBook), re-marks
+# it on every tick of an open position and places orders.
+
+ENGINE_WORKERS = 4  # Worker processes; 0 evaluates every symbol inline in the feed thread
+SHARED_CAPACITY = 1024  # Closed 1-minute bars kept per symbol in shared memory
+WAKE_TIMEOUT = 0.5  # Seconds a worker sleeps when its shard has no new ticks
+INTENT_MAX_AGE = 1.0  # Entry intents older than this (from the tick) are dropped
+READ_RETRIES = 100  # Seqlock re-reads before a row is left for the next wake-up
+READY_TIMEOUT = 60  # Seconds to wait for the workers' initial indicator sync
+# Workers are forked so they inherit the shared mapping; spawn/forkserver would
+# re-import the caller's __main__ (Ai_bot.py logs in at import time)
+ENGINE_START_METHOD = "fork"
+
+
+class SharedBars:
+    """
+    Per-symbol closed-bar rings, forming bar, LTP and position flag in one
+    SharedMemory block, as NumPy views. There is a single writer (the coordinator's
+    feed thread). Each row has a seqlock counter that is odd while the writer is
+    mid-update; a reader that sees it odd or changed simply reads again.
+    """
+
+    def __init__(self, symbols, capacity=SHARED_CAPACITY):
+        self.symbols = symbols
+        self.capacity = capacity
+        layout = [
+            ("seq", np.int64, (symbols,)),
+            ("count", np.int64, (symbols,)),  # Total closed bars ever appended
+            ("time", np.int64, (symbols, capacity)),
+            ("bars", np.float64, (symbols, 5, capacity)),  # open, high, low, close, volume
+            ("forming", np.float64, (symbols, 6)),  # start (0 = none), open, high, low, close, volume
+            ("ltp", np.float64, (symbols,)),
+            ("stamp", np.float64, (symbols,)),  # perf_counter() of the last tick, 0 = seeded only
+            ("position", np.int8, (symbols,)),  # Set by the coordinator while a position is open
+        ]
+        size = sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for _, dtype, shape in layout)
+        self.shm = SharedMemory(create=True, size=size)
+        offset = 0
+        for name, dtype, shape in layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            view[...] = 0
+            setattr(self, name, view)
+            offset += view.nbytes
+
+    # ----- writer -----
+
+    def tick(self, row, start, forming, ltp, stamp, closed=None):
+        """
+        Publish the forming bar and LTP, plus the bar this tick closed if any, in one
+        seqlock section, so no reader sees the closed bar with the old forming bar
+        """
+        self.seq[row] += 1
+        if closed is not None:
+            i = self.count[row] % self.capacity
+            self.time[row, i] = closed[0]
+            self.bars[row, :, i] = closed[1:]
+            self.count[row] += 1
+        self.forming[row, 0] = start
+        self.forming[row, 1:] = forming
+        self.ltp[row] = ltp
+        self.stamp[row] = stamp
+        self.seq[row] += 1
+
+    def load(self, row, times, ohlcv):
+        """Replace a row's history with closed bars (before the workers start)"""
+        n = min(len(times), self.capacity)
+        self.seq[row] += 1
+        self.time[row, :n] = times[len(times) - n:]
+        self.bars[row, :, :n] = ohlcv[:, len(times) - n:]
+        self.count[row] = n
+        self.seq[row] += 1
+
+    # ----- reader -----
+
+    def read(self, row, since):
+        """
+        Consistent copy of a row: (seq, count, times, ohlcv, forming, ltp, stamp) with
+        the closed bars appended after `since` (at most capacity of them), or None if
+        the writer kept the row busy for every retry
+        """
+        for _ in range(READ_RETRIES):
+            seq = int(self.seq[row])
+            if seq & 1:
+                continue
+            count = int(self.count[row])
+            idx = np.arange(max(since, count - self.capacity), count) % self.capacity
+            times = self.time[row, idx]
+            ohlcv = self.bars[row][:, idx]
+            forming = self.forming[row].copy()
+            ltp = float(self.ltp[row])
+            stamp = float(self.stamp[row])
+            if int(self.seq[row]) == seq:
+                return seq, count, times, ohlcv, forming, ltp, stamp
+        return None
+
+    def close(self):
+        for name in ("seq", "count", "time", "bars", "forming", "ltp", "stamp", "position"):
+            setattr(self, name, None)  # Views must go before the buffer can be released
+        self.shm.close()
+        self.shm.unlink()
+
+
+class Shard:
+    """
+    Streaming indicator state for a block of rows. poll() reads every row whose seqlock
+    moved since the last poll and emits (row, side, ltp, atr, stamp) entry intents.
+    """
+
+    def __init__(self, bars, rows):
+        self.bars = bars
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.states = [scalp_indicator_state() for _ in self.rows]
+        self.seen_seq = np.full(len(self.rows), -1, dtype=np.int64)
+        self.seen_count = np.zeros(len(self.rows), dtype=np.int64)
+        self.evaluations = 0
+        self.resyncs = 0  # Rows that fell more than a ring behind and were rebuilt
+
+    def poll(self, emit):
+        changed = np.flatnonzero(self.bars.seq[self.rows] != self.seen_seq)
+        for k in changed:
+            self._evaluate(k, emit)
+        return len(changed)
+
+    def _evaluate(self, k, emit):
+        row = int(self.rows[k])
+        read = self.bars.read(row, int(self.seen_count[k]))
+        if read is None:
+            return
+        seq, count, times, ohlcv, forming, ltp, stamp = read
+        state = self.states[k]
+        if count - self.seen_count[k] > len(times):
+            state = self.states[k] = scalp_indicator_state()
+            self.resyncs += 1
+        for h, l, c, v in zip(ohlcv[1], ohlcv[2], ohlcv[3], ohlcv[4]):
+            state.update(h, l, c, v)
+        self.seen_seq[k] = seq
+        self.seen_count[k] = count
+        if forming[0] == 0:
+            return
+        state.set_forming(*forming[1:])
+        # Like Ai_bot, decisions are made on ticks, not on the seeded history
+        if stamp == 0 or self.bars.position[row] or state.bars + 1 < WARMUP_BARS:
+            return
+        self.evaluations += 1
+        ind = state.snapshot(ltp)
+        side = snapshot_signal(ind, ltp)
+        if side is not None:
+            emit(row, side, ltp, ind["atr"], stamp)
+
+    def snapshots(self):
+        """{row: (closed bars, indicator snapshot)} for checking against a direct replay"""
+        return {int(row): (state.bars, state.snapshot()) for row, state in zip(self.rows, self.states)}
+
+
+def _worker(bars, rows, wake, stop, out, worker_id):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The coordinator decides when to stop
+    shard = Shard(bars, rows)
+    emit = lambda *intent: out.put(("intent", *intent))
+    shard.poll(emit)
+    out.put(("ready", worker_id))
+    while True:
+        wake.wait(WAKE_TIMEOUT)
+        wake.clear()
+        stopping = stop.is_set()
+        shard.poll(emit)
+        if stopping:
+            break
+    out.put(("done", worker_id, shard.evaluations, shard.resyncs, shard.snapshots()))
+
+
+class LiveEngine:
+    """
+    Coordinator for the sharded scalp engine.
+    options:     [{"symbol", "token", ...}], e.g. a whole expiry's strikes
+    place_order: place_order(symbol, token, qty, action), as in Ai_bot
+    positions:   PositionBook the engine fills and empties (pass Ai_bot.positions to share it)
+    entry_filter(symbol, side): optional veto on entries, e.g. the sentiment filter
+    minutes:     candle interval the ticks are aggregated into (seed with candles of the same interval)
+    Feed ticks with engine.feed.ingest (or any tick_feed source's start(engine.feed)).
+    """
+
+    def __init__(self, options, place_order, lot_size, workers=ENGINE_WORKERS, capacity=SHARED_CAPACITY,
+                 positions=None, latency=None, entry_filter=None, max_intent_age=INTENT_MAX_AGE,
+                 verbose=True, minutes=1):
+        self.options = list(options)
+        self.rows = {str(opt["token"]): k for k, opt in enumerate(self.options)}
+        self.place_order = place_order
+        self.lot_size = lot_size
+        self.workers = workers
+        self.positions = PositionBook() if positions is None else positions
+        self.latency = latency or LatencyRecorder()
+        self.entry_filter = entry_filter
+        self.max_intent_age = max_intent_age
+        self.verbose = verbose
+        self.stats = {"ticks": 0, "intents": 0, "stale_intents": 0, "blocked": 0, "entries": 0, "exits": 0}
+        self.worker_stats = {}  # worker -> {"evaluations", "resyncs", "snapshots"}
+
+        self.bars = SharedBars(len(self.options), capacity)
+        self.minutes = minutes
+        self.feed = TickFeed(intervals=(minutes,))
+        self.feed.on_bar(self._on_bar)
+        self.feed.on_tick(self._on_tick)
+
+        self.blocks = np.array_split(np.arange(len(self.options)), max(1, min(workers, len(self.options))))
+        self.shard_of = np.zeros(len(self.options), dtype=np.int64)
+        for k, rows in enumerate(self.blocks):
+            self.shard_of[rows] = k
+        self.inline = None if workers else Shard(self.bars, np.arange(len(self.options)))
+        ctx = mp.get_context(ENGINE_START_METHOD)
+        self._ctx = ctx
+        self.wakes = [ctx.Event() for _ in self.blocks] if workers else []
+        self.intents = ctx.Queue() if workers else None
+        self._stop = ctx.Event()
+        self.processes = []
+        self._drainer = None
+        self.lock = threading.Lock()  # Guards positions between the feed, drain and exit threads
+        self.closed = {}  # row -> bar closed by the tick being ingested (bar events fire first)
+        self.exiting = set()  # Symbols with an exit order queued or in flight
+        self.exit_orders = queue.Queue()  # (symbol, token, action, qty, reason) for the exit thread
+        self._exiter = None
+        # A book restored from a warm-start snapshot already holds positions
+        for symbol in self.positions:
+            row = self.rows.get(str(self.positions[symbol]["token"]))
+            if row is not None:
+                self.bars.position[row] = 1
+
+    # ----- history -----
+
+    def seed(self, token, df):
+        """Preload history from a fetch_candles() frame; its last row is the forming candle"""
+        row = self.rows[str(token)]
+        times = df.index.as_unit("s").asi8
+        ohlcv = df[["open", "high", "low", "close", "volume"]].to_numpy(dtype=np.float64).T
+        self.bars.load(row, times[:-1], ohlcv[:, :-1])
+        agg = self.feed.aggregator(str(token), self.minutes)
+        agg.seed(times[-1], *ohlcv[:, -1])
+        self.bars.tick(row, agg.start, agg.forming, agg.forming[3], 0.0)
+
+    # ----- feed callbacks (feed thread) -----
+
+    def _on_bar(self, token, minutes, bar):
+        row = self.rows.get(token)
+        if row is not None:
+            self.closed[row] = bar  # Published with the tick that closed it
+
+    def _on_tick(self, token, ts, price, volume):
+        row = self.rows.get(token)
+        if row is None:
+            return
+        start = time.perf_counter()
+        agg = self.feed.aggregator(token, self.minutes)
+        self.bars.tick(row, agg.start, agg.forming, price, start, self.closed.pop(row, None))
+        self.stats["ticks"] += 1
+        self._check_exit(row, price)
+        if self.workers:
+            self.wakes[self.shard_of[row]].set()
+        else:
+            self.inline.poll(self._on_intent)
+        self.latency.observe("engine_tick", time.perf_counter() - start)
+
+    # ----- positions and orders (coordinator only) -----
+
+    def _check_exit(self, row, price):
+        symbol = self.options[row]["symbol"]
+        if symbol not in self.positions:
+            return  # Only an open position's tick changes the book's MTM
+        with self.lock:
+            for order in self.positions.mark(symbol, price):
+                if order[0] not in self.exiting:
+                    self.exiting.add(order[0])
+                    self.exit_orders.put(order)
+
+    def _place_exits(self):
+        """
+        Exit orders, on their own thread so a slow broker call never holds up ticks.
+        A position leaves the book once its order is placed; if the order fails it
+        stays open and the next tick retries.
+        """
+        while True:
+            order = self.exit_orders.get()
+            if order is None:
+                return
+            symbol, token, action, qty, reason = order
+            try:
+                self.place_order(symbol, token, qty, action)
+            except Exception as e:
+                print(f"[ERROR] exit order {symbol}: {e}")
+                with self.lock:
+                    self.exiting.discard(symbol)
+                continue
+            with self.lock:
+                pnl = self.positions.close(symbol)
+                self.exiting.discard(symbol)
+                self.bars.position[self.rows[token]] = 0
+                self.stats["exits"] += 1
+            if self.verbose:
+                print(f"[EXIT] {symbol} {reason} P&L {pnl:.2f}")
+
+    def _on_intent(self, row, side, ltp, atr, stamp):
+        age = time.perf_counter() - stamp
+        self.latency.observe("tick_to_intent", age)
+        self.stats["intents"] += 1
+        if age > self.max_intent_age:
+            self.stats["stale_intents"] += 1
+            return
+        opt = self.options[row]
+        if self.entry_filter is not None and not self.entry_filter(opt["symbol"], side):
+            return
+        underlying = opt.get("name", "")
+        with self.lock:
+            if opt["symbol"] in self.positions:
+                return
+            blocked = self.positions.block_reason(underlying)
+            if blocked:
+                self.stats["blocked"] += 1
+                return
+            sl, tp = sl_tp_levels(ltp, LONG if side == "BUY" else SHORT, atr)
+            self.place_order(opt["symbol"], opt["token"], self.lot_size, side)
+            self.positions.open(opt["symbol"], side, ltp, float(sl), float(tp), self.lot_size,
+                                token=opt["token"], underlying=underlying)
+            self.bars.position[row] = 1
+            self.stats["entries"] += 1
+        if self.verbose:
+            print(f"[ENTRY] {opt['symbol']} {side} @ {ltp}")
+
+    def _handle(self, message):
+        kind = message[0]
+        if kind == "intent":
+            self._on_intent(*message[1:])
+        elif kind == "done":
+            _, worker, evaluations, resyncs, snapshots = message
+            self.worker_stats[worker] = {"evaluations": evaluations, "resyncs": resyncs, "snapshots": snapshots}
+
+    def _drain(self):
+        while True:
+            message = self.intents.get()
+            if message is None:
+                return
+            try:
+                self._handle(message)
+            except Exception as e:
+                print(f"[ERROR] live engine: {e}")
+
+    # ----- lifecycle -----
+
+    def start(self):
+        """Start the workers and wait until each has synced its shard's history"""
+        self._exiter = threading.Thread(target=self._place_exits, name="engine-exits", daemon=True)
+        self._exiter.start()
+        if not self.workers:
+            self.inline.poll(self._on_intent)
+            return self
+        for k, rows in enumerate(self.blocks):
+            process = self._ctx.Process(target=_worker, name=f"engine-{k}", daemon=True,
+                                        args=(self.bars, rows, self.wakes[k], self._stop, self.intents, k))
+            process.start()
+            self.processes.append(process)
+        ready = 0
+        while ready < len(self.processes):
+            message = self.intents.get(timeout=READY_TIMEOUT)
+            ready += message[0] == "ready"
+            self._handle(message)
+        self._drainer = threading.Thread(target=self._drain, name="engine-intents", daemon=True)
+        self._drainer.start()
+        print(f"[START] Live engine: {len(self.options)} symbols on {len(self.processes)} workers")
+        return self
+
+    def stop(self, timeout=10):
+        """Let the workers finish their last poll, collect their stats and free the shared memory"""
+        if self.workers:
+            self._stop.set()
+            for wake in self.wakes:
+                wake.set()
+            for process in self.processes:
+                process.join(timeout)
+            self.intents.put(None)
+            if self._drainer is not None:
+                self._drainer.join(timeout)
+        else:
+            self.worker_stats[0] = {"evaluations": self.inline.evaluations, "resyncs": self.inline.resyncs,
+                                    "snapshots": self.inline.snapshots()}
+        if self._exiter is not None:
+            self.exit_orders.put(None)
+            self._exiter.join(timeout)
+        self.bars.close()
+
+
+# =========================
+# SIMULATED FEED / LOAD TEST
+# =========================
+
+def simulated_session(symbols, day, seed=0):
+    """
+    Synthetic chain from FakeSmartConnect: options, the previous session per token
+    (fetch_candles format, for seeding) and the day's candles replayed as ticks,
+    interleaved across tokens in time order
+    """
+    from fake_smartapi import FakeSmartConnect
+
+    api = FakeSmartConnect(seed=seed)
+    day = pd.Timestamp(day)
+    previous = pd.bdate_range(end=day - pd.Timedelta(days=1), periods=1)[0]
+    options, history, candles, ticks = [], {}, {}, []
+    for k in range(symbols):
+        token = str(60000 + k)
+        options.append({"symbol": f"SIM{token}", "token": token})
+        prev = api.day_candles(token, previous)
+        history[token] = prev.rename(columns=str.lower).rename(columns={"datetime": "timestamp"}).set_index("timestamp")
+        candles[token] = api.day_candles(token, day)
+        ticks += ReplayTickSource.from_candles(token, candles[token]).ticks
+    ticks.sort(key=lambda tick: tick[1])
+    return api, options, history, candles, ticks
+
+
+def expected_snapshots(history, candles):
+    """Indicator snapshots after the replay, from one IndicatorState per token fed directly"""
+    out = {}
+    for token, prev in history.items():
+        cols = ["Open", "High", "Low", "Close", "Volume"]
+        day = candles[token][cols].to_numpy(dtype=np.float64)
+        closed = np.vstack([prev[[c.lower() for c in cols]].to_numpy(dtype=np.float64), day[:-1]])
+        state = scalp_indicator_state()
+        for o, h, l, c, v in closed:
+            state.update(h, l, c, v)
+        state.set_forming(*day[-1])
+        out[token] = (state.bars, state.snapshot())
+    return out
+
+
+def run_load_test(session, workers, rate=None, order_latency=0.0, max_open_lots=None):
+    """Replay the session through a LiveEngine; returns (engine, replay seconds, total seconds)"""
+    from fake_smartapi import FakeSmartConnect
+
+    _, options, history, _, ticks = session
+    api = FakeSmartConnect(latency=order_latency)
+
+    def place_order(symbol, token, qty, action):
+        return api.placeOrder({"variety": "NORMAL", "tradingsymbol": symbol, "symboltoken": token,
+                               "transactiontype": action, "exchange": "NFO", "ordertype": "MARKET",
+                               "producttype": "INTRADAY", "duration": "DAY", "quantity": qty})
+
+    engine = LiveEngine(options, place_order, lot_size=30, workers=workers, verbose=False,
+                        positions=PositionBook(max_open_lots=max_open_lots), max_intent_age=float("inf"))
+    for token, df in history.items():
+        engine.seed(token, df)
+    engine.start()
+
+    start = time.perf_counter()
+    for k, tick in enumerate(ticks):
+        if rate and k % 1000 == 0:
+            ahead = start + k / rate - time.perf_counter()
+            if ahead > 0:
+                time.sleep(ahead)
+        engine.feed.ingest(*tick)
+    replay = time.perf_counter() - start
+    engine.stop()
+    return engine, replay, time.perf_counter() - start
+
+
+# =========================
+# MAIN
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the sharded live engine on a simulated option chain")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, ENGINE_WORKERS])
+    parser.add_argument("--day", default="2026-02-03")
+    parser.add_argument("--rate", type=float, help="Ticks per second (default: as fast as possible)")
+    parser.add_argument("--order-latency", type=float, default=0.0, help="Seconds per simulated placeOrder")
+    parser.add_argument("--max-open-lots", type=int, help="Portfolio limit on open lots (PositionBook)")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check each worker's final indicators against a direct single-process replay")
+    args = parser.parse_args()
+
+    session = simulated_session(args.symbols, args.day)
+    ticks = session[4]
+    print(f"[load] {args.symbols} symbols, {len(ticks):,} ticks")
+    expected = expected_snapshots(session[2], session[3]) if args.verify else None
+
+    print(f"{'workers':>7} {'ticks/s':>10} {'drain s':>8} {'evals':>9} {'intents':>8} {'entries':>8} "
+          f"{'exits':>6} {'blocked':>7} {'p50 ms':>8} {'p99 ms':>8} {'tick us':>8} {'resyncs':>7}")
+    mismatches = 0
+    for workers in args.workers:
+        engine, replay, total = run_load_test(session, workers, args.rate, args.order_latency, args.max_open_lots)
+        hists, _ = engine.latency.snapshot()
+        intent = hists.get(("tick_to_intent", ""))
+        tick = hists[("engine_tick", "")]
+        p50, p99 = (intent.quantile(0.5) * 1000, intent.quantile(0.99) * 1000) if intent else (float("nan"),) * 2
+        stats = engine.worker_stats.values()
+        print(f"{workers:>7} {len(ticks) / replay:>10,.0f} {total - replay:>8.2f} "
+              f"{sum(s['evaluations'] for s in stats):>9,} {engine.stats['intents']:>8,} "
+              f"{engine.stats['entries']:>8,} {engine.stats['exits']:>6,} {engine.stats['blocked']:>7,} {p50:>8.2f} {p99:>8.2f} "
+              f"{tick.total / tick.count * 1e6:>8.1f} {sum(s['resyncs'] for s in stats):>7}")
+
+        if expected is not None:
+            got = {}
+            for s in stats:
+                got.update(s["snapshots"])
+            for row, opt in enumerate(engine.options):
+                bars, ind = got[row]
+                want_bars, want = expected[opt["token"]]
+                if bars != want_bars or not all(np.isclose(ind[k], want[k], equal_nan=True) for k in want):
+                    mismatches += 1
+                    print(f"[MISMATCH] workers={workers} {opt['symbol']}")
+
+    if expected is not None:
+        print(f"Checked {args.symbols} symbols x {len(args.workers)} worker counts, {mismatches} mismatches")
+        exit(0 if mismatches == 0 else 1)
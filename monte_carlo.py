@@ -0,0 +1,173 @@
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+import csv_cache
+import scalp_strategy
+import strategy_backtest as sb
+from trade_store import TradeStore, day_codes
+
+# ================= MONTE CARLO SETTINGS =================
+# Resamples a backtest's trade sequence into many alternative equity paths to get
+# distributions (final P&L, max drawdown, probability of ruin) instead of one number.
+#
+# Every unit (a trade, or a day for block bootstrap) is reduced to its gross P&L per
+# unit of quantity plus its order count, so one resampled index matrix can be priced
+# at any position size: P&L = quantity * gross - brokerage * orders.
+METHODS = ("bootstrap", "permute", "block")
+PATHS = 100_000
+BLOCK_DAYS = 2  # Block length for the daily block bootstrap
+CAPITAL = 100_000  # ₹ at risk for the ruin probability
+RUIN_FRACTION = 0.5  # Ruin = losing this fraction of CAPITAL at any point of a path
+MAX_RUIN_PROBABILITY = 1.0  # % of paths allowed to hit ruin when sizing
+CHUNK_ELEMENTS = 4_000_000  # Path x step elements simulated at once
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def units_from_store(store, quantity, method="bootstrap"):
+    """
+    (gross P&L per unit quantity, orders) per resampling unit: each trade, or each
+    exit day for the block bootstrap
+    """
+    cols = store.columns
+    order = np.argsort(cols["exit_time"], kind="stable")
+    pnl = cols["pnl"][order]
+    gross = (pnl + 2 * sb.BROKERAGE_CHARGE) / quantity
+    orders = np.full(pnl.size, 2.0)
+    if method != "block":
+        return gross, orders
+    _, day = np.unique(day_codes(cols["exit_time"][order]), return_inverse=True)
+    return np.bincount(day, weights=gross), np.bincount(day, weights=orders)
+
+
+def resample_indices(rng, n, paths, method, block=BLOCK_DAYS):
+    """(paths, n) matrix of unit indices for one chunk of paths"""
+    if method == "bootstrap":
+        return rng.integers(0, n, size=(paths, n))
+    if method == "permute":
+        return rng.permuted(np.broadcast_to(np.arange(n), (paths, n)), axis=1)
+    if method == "block":
+        # Circular block bootstrap: random block starts, consecutive days inside a block
+        blocks = -(-n // block)
+        starts = rng.integers(0, n, size=(paths, blocks, 1))
+        return ((starts + np.arange(block)) % n).reshape(paths, -1)[:, :n]
+    raise ValueError(f"Unknown method: {method}")
+
+
+def simulate(gross, orders, quantities, paths=PATHS, method="bootstrap", block=BLOCK_DAYS,
+             capital=CAPITAL, ruin_fraction=RUIN_FRACTION, seed=None):
+    """
+    Price the same resampled paths at every quantity
+    Returns {quantity: {"final": (paths,), "max_dd": (paths,), "ruined": (paths,) bool}}
+    """
+    rng = np.random.default_rng(seed)
+    n = len(gross)
+    ruin_level = -capital * ruin_fraction
+    out = {q: {"final": [], "max_dd": [], "ruined": []} for q in quantities}
+    if n == 0:
+        return {q: {k: np.zeros(paths, dtype=bool if k == "ruined" else float) for k in v} for q, v in out.items()}
+
+    chunk = max(1, CHUNK_ELEMENTS // n)
+    for done in range(0, paths, chunk):
+        idx = resample_indices(rng, n, min(chunk, paths - done), method, block)
+        g = np.cumsum(gross[idx], axis=1)
+        c = np.cumsum(orders[idx], axis=1)
+        for q in quantities:
+            equity = q * g - sb.BROKERAGE_CHARGE * c
+            peak = np.maximum(np.maximum.accumulate(equity, axis=1), 0.0)
+            out[q]["final"].append(equity[:, -1])
+            out[q]["max_dd"].append((peak - equity).max(axis=1))
+            out[q]["ruined"].append(equity.min(axis=1) <= ruin_level)
+    return {q: {k: np.concatenate(v) for k, v in r.items()} for q, r in out.items()}
+
+
+def summarize(results):
+    """One row per quantity: percentiles of final P&L and max drawdown, P(loss), P(ruin)"""
+    rows = []
+    for q, r in results.items():
+        final_pct = np.percentile(r["final"], PERCENTILES)
+        dd_pct = np.percentile(r["max_dd"], PERCENTILES)
+        row = {"Quantity": q}
+        row.update({f"P&L_p{p}": v for p, v in zip(PERCENTILES, final_pct)})
+        row.update({f"MaxDD_p{p}": v for p, v in zip(PERCENTILES, dd_pct)})
+        row["P(loss)%"] = (r["final"] < 0).mean() * 100
+        row["P(ruin)%"] = r["ruined"].mean() * 100
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def size_for_risk(summary, max_ruin=MAX_RUIN_PROBABILITY, max_drawdown=None):
+    """Largest quantity with P(ruin) <= max_ruin % (and 95th percentile drawdown <= max_drawdown)"""
+    ok = summary["P(ruin)%"] <= max_ruin
+    if max_drawdown is not None:
+        ok &= summary["MaxDD_p95"] <= max_drawdown
+    allowed = summary[ok]
+    return int(allowed["Quantity"].max()) if len(allowed) else None
+
+
+def backtest_store(files, strategy="ema"):
+    """Run the EMA (strategy_backtest) or scalp (scalp_strategy) backtest into a TradeStore"""
+    run = scalp_strategy.scalp_trade_arrays if strategy == "scalp" else sb.trade_arrays
+    store = TradeStore()
+    for file, df in zip(files, csv_cache.load_many(files)):
+        if df.empty:
+            continue
+        arrays = run(df)
+        store.add(os.path.basename(file)[:-4], *list(arrays.values())[:7], bars=len(df))
+    return store
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo resampling of backtest trades")
+    parser.add_argument("--store", help="Trade store saved with --save (default: run the backtest on the CSVs)")
+    parser.add_argument("--strategy", choices=["ema", "scalp"], default="ema")
+    parser.add_argument("--pattern", default="NIFTY_*MIN_*_*.csv")
+    parser.add_argument("--method", choices=METHODS, default="bootstrap")
+    parser.add_argument("--paths", type=int, default=PATHS)
+    parser.add_argument("--block", type=int, default=BLOCK_DAYS, help="Days per block (--method block)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--quantity", type=int, default=None,
+                        help="Quantity the trades were backtested with (default: the strategy's)")
+    parser.add_argument("--lot-size", type=int, default=None, help="Size step to evaluate (default: --quantity)")
+    parser.add_argument("--max-lots", type=int, default=5)
+    parser.add_argument("--capital", type=float, default=CAPITAL)
+    parser.add_argument("--ruin", type=float, default=RUIN_FRACTION, help="Fraction of capital lost that counts as ruin")
+    parser.add_argument("--max-ruin", type=float, default=MAX_RUIN_PROBABILITY, help="Allowed P(ruin) in %%")
+    parser.add_argument("--max-drawdown", type=float, default=None, help="Allowed 95th percentile drawdown in ₹")
+    args = parser.parse_args()
+
+    if args.store:
+        store = TradeStore.load(args.store)
+    else:
+        files = sorted(glob.glob(args.pattern))
+        if not files:
+            logger.error("❌ No CSV files found. Make sure data files exist.")
+            exit()
+        store = backtest_store(files, args.strategy)
+
+    if args.quantity is None:
+        args.quantity = scalp_strategy.QUANTITY if args.strategy == "scalp" else sb.QUANTITY
+    lot = args.lot_size or args.quantity
+    quantities = [lot * k for k in range(1, args.max_lots + 1)]
+
+    gross, orders = units_from_store(store, args.quantity, args.method)
+    logger.info(f"🎲 {args.paths:,} {args.method} paths over {len(gross)} "
+                f"{'days' if args.method == 'block' else 'trades'}, sizes {quantities}")
+    start = time.perf_counter()
+    results = simulate(gross, orders, quantities, args.paths, args.method, args.block,
+                       args.capital, args.ruin, args.seed)
+    logger.info(f"✅ Simulated in {time.perf_counter() - start:.2f}s")
+
+    summary = summarize(results)
+    logger.info(f"\n{summary.to_string(index=False, float_format=lambda v: f'{v:.2f}')}")
+    size = size_for_risk(summary, args.max_ruin, args.max_drawdown)
+    if size is None:
+        logger.warning(f"⚠️ Even {lot} breaches the risk limits on ₹{args.capital:,.0f}")
+    else:
+        logger.info(f"📏 Largest quantity within risk limits on ₹{args.capital:,.0f}: {size}")
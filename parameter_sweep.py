@@ -0,0 +1,193 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+import csv_cache
+import execution
+import indicators
+import strategy_backtest as sb
+from trade_store import to_epoch
+
+# ================= SEARCH SPACE =================
+# Every parameter the EMA/ADX/trailing-SL strategy exposes. Values are candidate lists;
+# grid mode takes the full product, random mode samples one value per parameter.
+DEFAULT_SEARCH_SPACE = {
+    "ema_fast": [3, 5, 8],
+    "ema_slow": [9, 13, 21],
+    "adx_period": [10, 14, 20],
+    "adx_threshold": [15, 20, 25, 30],
+    "trailing_sl_offset": [3, 5, 8],
+    "sl_shift_trigger": [0.5, 1, 2],
+    "sl_difference": [0.25, 0.5, 1],
+}
+
+PARAM_ORDER = list(DEFAULT_SEARCH_SPACE)
+RESULT_COLUMNS = PARAM_ORDER + ["Trades", "Wins", "Win_Rate", "Total_P&L", "Avg_P&L", "Max_Loss"]
+
+# Per-worker copy of the precomputed series and execution model, filled by _init_worker
+_SERIES = []
+_MODEL = None
+
+
+def load_series(files, space, intrabar=False):
+    """
+    Load each CSV once and precompute every indicator column the search space can ask for.
+    EMAs are computed once per distinct span and ADX once per distinct period, then shared
+    by every combination that uses them. The intrabar path is only built (and shipped to
+    the workers) when an execution model will read it.
+    """
+    spans = sorted(set(space["ema_fast"]) | set(space["ema_slow"]))
+    periods = sorted(set(space["adx_period"]))
+    series = []
+    for file, df in zip(files, csv_cache.load_many(files)):
+        if df.empty:
+            continue
+        close = np.ascontiguousarray(df["Close"].to_numpy(dtype=np.float64))
+        emas = {span: indicators.ema(close, span) for span in spans}
+        adxs = {period: sb.calculate_adx(df, period=period) for period in periods}
+        series.append({"file": os.path.basename(file), "close": close, "ema": emas, "adx": adxs,
+                       "path": execution.IntrabarPath.from_bars(df) if intrabar else None,
+                       "times": to_epoch(df["Datetime"])})
+    return series
+
+
+def grid_combinations(space):
+    """Yield every parameter combination in the space, skipping fast EMA >= slow EMA"""
+    for values in itertools.product(*(space[name] for name in PARAM_ORDER)):
+        params = dict(zip(PARAM_ORDER, values))
+        if params["ema_fast"] < params["ema_slow"]:
+            yield params
+
+
+def random_combinations(space, samples, seed=None):
+    """Yield up to `samples` distinct random combinations from the space"""
+    rng = random.Random(seed)
+    seen = set()
+    attempts = 0
+    while len(seen) < samples and attempts < samples * 20:
+        attempts += 1
+        values = tuple(rng.choice(space[name]) for name in PARAM_ORDER)
+        params = dict(zip(PARAM_ORDER, values))
+        if params["ema_fast"] >= params["ema_slow"] or values in seen:
+            continue
+        seen.add(values)
+        yield params
+
+
+def _init_worker(series, model=None):
+    global _SERIES, _MODEL
+    _SERIES = series
+    _MODEL = model
+
+
+def backtest_series(params, s, model=None):
+    """
+    One parameter combination on one loaded series
+    Returns (entry_idx, exit_idx, entry_price, exit_price, pnl, end_of_data) arrays
+    """
+    entries, exits, exit_prices, end_flags = sb.backtest_arrays(
+        s["close"],
+        s["ema"][params["ema_fast"]],
+        s["ema"][params["ema_slow"]],
+        s["adx"][params["adx_period"]],
+        adx_threshold=params["adx_threshold"],
+        trailing_sl_offset=params["trailing_sl_offset"],
+        sl_shift_trigger=params["sl_shift_trigger"],
+        sl_difference=params["sl_difference"],
+        path=None if model is None else s["path"],
+        model=model,
+    )
+    entry_prices = s["close"][entries] if model is None else model.market_fill(s["close"][entries], 1)
+    pnl = (exit_prices - entry_prices) * sb.QUANTITY - 2 * sb.BROKERAGE_CHARGE
+    return entries, exits, entry_prices, exit_prices, pnl, end_flags
+
+
+def evaluate_params(params, series=None, model=None):
+    """
+    Backtest one parameter combination over every loaded series and return its stats row
+    model: execution.ExecutionModel for intrabar High/Low stops (None = close-based)
+    """
+    series = _SERIES if series is None else series
+    model = _MODEL if model is None else model
+    pnl_parts = [backtest_series(params, s, model)[4] for s in series]
+
+    pnl = np.concatenate(pnl_parts) if pnl_parts else np.empty(0)
+    trades = int(pnl.size)
+    wins = int((pnl > 0).sum())
+    return [params[name] for name in PARAM_ORDER] + [
+        trades,
+        wins,
+        wins / trades * 100 if trades else 0.0,
+        float(pnl.sum()),
+        float(pnl.mean()) if trades else 0.0,
+        float(pnl.min()) if trades else 0.0,
+    ]
+
+
+def run_sweep(files, space=None, mode="grid", samples=1000, workers=None, seed=None, chunksize=64, model=None):
+    """
+    Fan parameter combinations out over a process pool
+    Returns a DataFrame of results ranked by total P&L
+    """
+    space = space or DEFAULT_SEARCH_SPACE
+    series = load_series(files, space, intrabar=model is not None)
+    if mode == "grid":
+        combos = list(grid_combinations(space))
+    else:
+        combos = list(random_combinations(space, samples, seed))
+
+    logger.info(f"🔎 Sweeping {len(combos)} combinations over {len(series)} series")
+    start = time.perf_counter()
+    if workers == 1:
+        rows = [evaluate_params(p, series, model) for p in combos]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(series, model)) as pool:
+            rows = list(pool.map(evaluate_params, combos, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+    logger.info(f"✅ Sweep finished in {elapsed:.2f}s ({len(combos) / max(elapsed, 1e-9):,.0f} combos/sec)")
+
+    results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    return results.sort_values(["Total_P&L", "Win_Rate"], ascending=False).reset_index(drop=True)
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parameter sweep for the EMA/ADX trailing-SL strategy")
+    parser.add_argument("--mode", choices=["grid", "random"], default="grid")
+    parser.add_argument("--samples", type=int, default=1000, help="Combinations to draw in random mode")
+    parser.add_argument("--space", help="JSON file mapping parameter name to a list of values")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20, help="Rows of the ranked table to log")
+    parser.add_argument("--output", default="sweep_results.csv")
+    parser.add_argument("--pattern", default="NIFTY_*MIN_*.csv")
+    parser.add_argument("--intrabar", action="store_true", help="Check the SL against High/Low instead of Close")
+    parser.add_argument("--slippage", type=float, default=0.0, help="Points lost per market fill (with --intrabar)")
+    parser.add_argument("--gap-fill", choices=execution.GAP_FILLS, default="open")
+    args = parser.parse_args()
+    model = execution.ExecutionModel(args.slippage, args.gap_fill) if args.intrabar else None
+
+    files = sorted(glob.glob(args.pattern))
+    if not files:
+        logger.error("❌ No CSV files found. Make sure data files exist.")
+        exit()
+
+    space = dict(DEFAULT_SEARCH_SPACE)
+    if args.space:
+        with open(args.space) as f:
+            space.update(json.load(f))
+
+    results = run_sweep(files, space, args.mode, args.samples, args.workers, args.seed, model=model)
+    results.to_csv(args.output, index=False)
+    logger.info(f"✅ Ranked results saved to {args.output}")
+    logger.info(f"\nTop {args.top} combinations:\n{results.head(args.top).to_string(index=False)}")
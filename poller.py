@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+
+# =========================
+# CONCURRENT INSTRUMENT POLLER
+# =========================
+
+POLL_WORKERS = 16
+POLL_TIMEOUT = 3.0  # Seconds a symbol's fetch may take before the cycle moves on
+
+
+class InstrumentPoller:
+    """
+    Fetches market data for many instruments at once on a thread pool.
+    poll() yields each result as soon as it arrives, so signals can be evaluated
+    while slower symbols are still in flight. A fetch that overruns the timeout is
+    left running but skipped for this cycle, and is not resubmitted until it returns.
+    """
+
+    def __init__(self, fetch, key=lambda item: item["symbol"], workers=POLL_WORKERS,
+                 timeout=POLL_TIMEOUT, clock=time.monotonic):
+        self.fetch = fetch  # fetch(item) -> data, or None on failure
+        self.key = key
+        self.timeout = timeout
+        self.clock = clock
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="poll")
+        self.inflight = {}  # key -> future still running from an earlier cycle
+        self.last_update = {}  # key -> clock() when good data last arrived
+        self.timeouts = {}  # key -> count of cycles skipped on timeout
+
+    def _timed_fetch(self, item):
+        data = self.fetch(item)
+        return data, self.clock()
+
+    def poll(self, items):
+        """
+        Yield (item, data, age) for every instrument whose fetch finished in time.
+        age is seconds since the data arrived, i.e. how stale it is when acted on.
+        """
+        futures = {}
+        for item in items:
+            k = self.key(item)
+            previous = self.inflight.get(k)
+            if previous is not None and not previous.done():
+                continue  # Still stuck from an earlier cycle
+            future = self.pool.submit(self._timed_fetch, item)
+            self.inflight[k] = future
+            futures[future] = item
+
+        try:
+            for future in as_completed(futures, timeout=self.timeout):
+                item = futures[future]
+                k = self.key(item)
+                self.inflight.pop(k, None)
+                try:
+                    data, fetched_at = future.result()
+                except Exception as e:
+                    print(f"[poll] {k} error: {e}")
+                    continue
+                if data is None:
+                    continue
+                self.last_update[k] = fetched_at
+                yield item, data, self.clock() - fetched_at
+        except TimeoutError:
+            for future, item in futures.items():
+                if not future.done():
+                    k = self.key(item)
+                    self.timeouts[k] = self.timeouts.get(k, 0) + 1
+                    print(f"[poll] {k} timed out after {self.timeout}s")
+
+    def staleness(self, items):
+        """Seconds since each instrument last delivered data (inf if never)"""
+        now = self.clock()
+        return {
+            self.key(item): now - self.last_update[self.key(item)] if self.key(item) in self.last_update
+            else float("inf")
+            for item in items
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,277 @@
+import argparse
+import time
+
+import numpy as np
+
+# =========================
+# POSITION BOOK
+# =========================
+# Open positions as parallel NumPy arrays (side, quantity, lots, entry, SL, TP, LTP,
+# MTM), kept packed in the first n slots so every pass is a plain slice with no mask.
+# Each tick re-marks the whole book in one vectorized pass. That pass applies the
+# portfolio limits and returns the exit batch. The book also behaves like Ai_bot's old
+# `positions` dict (in / [] / del / iteration), so existing callers keep working.
+
+BOOK_CAPACITY = 256  # Initial slots; the arrays double when full
+MAX_PORTFOLIO_LOSS = None  # Realized + unrealized loss (₹) that flattens the book and blocks entries
+MAX_OPEN_LOTS = None  # Lots open across all symbols
+MAX_UNDERLYING_LOTS = None  # Lots open per underlying (NIFTY, BANKNIFTY, ...)
+SIDES = {"BUY": 1, "SELL": -1}
+COLUMNS = {
+    "side": np.int8, "qty": np.int64, "lots": np.int64, "underlying": np.int32,
+    "entry": np.float64, "sl": np.float64, "tp": np.float64, "ltp": np.float64, "mtm": np.float64,
+}
+
+
+class PositionBook:
+
+    def __init__(self, max_loss=MAX_PORTFOLIO_LOSS, max_open_lots=MAX_OPEN_LOTS,
+                 max_underlying_lots=MAX_UNDERLYING_LOTS, capacity=BOOK_CAPACITY):
+        self.max_loss = max_loss
+        self.max_open_lots = max_open_lots
+        self.max_underlying_lots = max_underlying_lots
+        self.n = 0
+        self.realized = 0.0
+        self.halted = False  # Set once max_loss is breached; no new entries for the session
+        self.slots = {}  # symbol -> slot
+        self.symbols = []  # slot -> symbol
+        self.tokens = []  # slot -> token
+        self.underlyings = {}  # underlying -> code
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, "side", None)
+        for name, dtype in COLUMNS.items():
+            array = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                array[:self.n] = getattr(self, name)[:self.n]
+            setattr(self, name, array)
+
+    # ----- limits -----
+
+    def exposure(self):
+        """Open lots per underlying"""
+        lots = np.bincount(self.underlying[:self.n], weights=self.lots[:self.n], minlength=len(self.underlyings))
+        return {name: int(lots[code]) for name, code in self.underlyings.items() if lots[code]}
+
+    def block_reason(self, underlying="", lots=1):
+        """Why a new position of `lots` on underlying would breach a limit, or None"""
+        if self.halted:
+            return "max loss hit"
+        if self.max_open_lots is not None and self.lots[:self.n].sum() + lots > self.max_open_lots:
+            return f"max open lots {self.max_open_lots}"
+        if self.max_underlying_lots is not None and underlying in self.underlyings:
+            code = self.underlyings[underlying]
+            open_lots = self.lots[:self.n][self.underlying[:self.n] == code].sum()
+            if open_lots + lots > self.max_underlying_lots:
+                return f"max {underlying} lots {self.max_underlying_lots}"
+        return None
+
+    # ----- positions -----
+
+    def open(self, symbol, side, entry, sl, tp, qty, lots=1, token="", underlying=""):
+        if symbol in self.slots:
+            raise ValueError(f"{symbol} already has an open position")
+        if self.n == len(self.side):
+            self._allocate(2 * len(self.side))
+        slot = self.n
+        code = self.underlyings.setdefault(underlying, len(self.underlyings))
+        self.side[slot] = SIDES[side]
+        self.qty[slot] = qty
+        self.lots[slot] = lots
+        self.underlying[slot] = code
+        self.entry[slot] = self.ltp[slot] = entry
+        self.sl[slot] = sl
+        self.tp[slot] = tp
+        self.mtm[slot] = 0.0
+        self.slots[symbol] = slot
+        self.symbols.append(symbol)
+        self.tokens.append(str(token))
+        self.n += 1
+        return slot
+
+    def close(self, symbol, price=None):
+        """Realize a position at price (default: its last mark); returns its P&L"""
+        slot = self.slots.pop(symbol)
+        price = self.ltp[slot] if price is None else price
+        pnl = float((price - self.entry[slot]) * self.side[slot] * self.qty[slot])
+        self.realized += pnl
+        # Move the last position into the freed slot to keep the book packed
+        last = self.n - 1
+        if slot != last:
+            for name in COLUMNS:
+                array = getattr(self, name)
+                array[slot] = array[last]
+            self.symbols[slot] = self.symbols[last]
+            self.tokens[slot] = self.tokens[last]
+            self.slots[self.symbols[slot]] = slot
+        self.symbols.pop()
+        self.tokens.pop()
+        self.n = last
+        return pnl
+
+    def mark(self, symbol=None, price=None, prices=None):
+        """
+        Take one new LTP (symbol, price) and/or a {symbol: price} batch, re-mark every
+        position and return the exit batch: [(symbol, token, action, qty, reason)] with
+        reason "sl", "tp" or "max_loss". Positions stay open until close() is called.
+        """
+        if symbol is not None and symbol in self.slots:
+            self.ltp[self.slots[symbol]] = price
+        if prices:
+            known = [(self.slots[s], p) for s, p in prices.items() if s in self.slots]
+            if known:
+                slots, values = zip(*known)
+                self.ltp[list(slots)] = values
+        n = self.n
+        if not n:
+            return []
+        side, ltp = self.side[:n], self.ltp[:n]
+        np.multiply((ltp - self.entry[:n]) * side, self.qty[:n], out=self.mtm[:n])
+        # Signed distances: a long stops at or below its SL, a short at or above it
+        stop = (ltp - self.sl[:n]) * side <= 0
+        target = (ltp - self.tp[:n]) * side >= 0
+        if self.max_loss is not None and self.realized + self.mtm[:n].sum() <= -self.max_loss:
+            self.halted = True
+            hits, reasons = np.arange(n), np.full(n, "max_loss")
+        else:
+            hits = np.flatnonzero(stop | target)
+            if not hits.size:
+                return []
+            reasons = np.where(stop[hits], "sl", "tp")
+        return [(self.symbols[s], self.tokens[s], "SELL" if side[s] > 0 else "BUY", int(self.qty[s]), str(r))
+                for s, r in zip(hits, reasons)]
+
+    def summary(self):
+        unrealized = float(self.mtm[:self.n].sum())
+        return {"open": self.n, "lots": int(self.lots[:self.n].sum()), "realized": self.realized,
+                "unrealized": unrealized, "total": self.realized + unrealized, "halted": self.halted,
+                "exposure": self.exposure()}
+
+    # ----- warm start -----
+
+    def state(self):
+        """Open positions and session P&L as plain arrays and lists (saved by warm_start.py)"""
+        n = self.n
+        return {
+            "columns": {name: getattr(self, name)[:n].copy() for name in COLUMNS},
+            "symbols": list(self.symbols), "tokens": list(self.tokens), "underlyings": dict(self.underlyings),
+            "realized": self.realized, "halted": self.halted,
+        }
+
+    def restore(self, state):
+        """Replace the book's contents with a state(); the limits stay as configured"""
+        n = len(state["symbols"])
+        self.n = 0
+        self._allocate(max(len(self.side), n))
+        for name, values in state["columns"].items():
+            getattr(self, name)[:n] = values
+        self.symbols = list(state["symbols"])
+        self.tokens = list(state["tokens"])
+        self.slots = {symbol: slot for slot, symbol in enumerate(self.symbols)}
+        self.underlyings = dict(state["underlyings"])
+        self.realized = float(state["realized"])
+        self.halted = bool(state["halted"])
+        self.n = n
+
+    # ----- dict interface (Ai_bot's `positions`) -----
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, symbol):
+        return symbol in self.slots
+
+    def __iter__(self):
+        return iter(list(self.symbols))
+
+    def __getitem__(self, symbol):
+        slot = self.slots[symbol]
+        return {
+            "side": "BUY" if self.side[slot] > 0 else "SELL", "sl": float(self.sl[slot]),
+            "tp": float(self.tp[slot]), "entry": float(self.entry[slot]), "qty": int(self.qty[slot]),
+            "lots": int(self.lots[slot]), "ltp": float(self.ltp[slot]), "mtm": float(self.mtm[slot]),
+            "token": self.tokens[slot],
+        }
+
+    def get(self, symbol, default=None):
+        return self[symbol] if symbol in self.slots else default
+
+    def __setitem__(self, symbol, pos):
+        """positions[symbol] = {"side", "sl", "tp", "entry", "qty", ...} opens a position"""
+        self.open(symbol, pos["side"], pos["entry"], pos["sl"], pos["tp"], pos["qty"], pos.get("lots", 1),
+                  pos.get("token", ""), pos.get("underlying", ""))
+
+    def __delitem__(self, symbol):
+        self.close(symbol)
+
+
+def loop_exits(positions, ltp):
+    """Reference: Ai_bot's one-symbol-at-a-time SL/TP check over a plain dict"""
+    exits = []
+    for symbol, pos in positions.items():
+        price = ltp[symbol]
+        if pos["side"] == "BUY" and (price <= pos["sl"] or price >= pos["tp"]):
+            exits.append(symbol)
+        elif pos["side"] == "SELL" and (price >= pos["sl"] or price <= pos["tp"]):
+            exits.append(symbol)
+    return exits
+
+
+# =========================
+# CHECK / BENCHMARK
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and time the vectorized position book")
+    parser.add_argument("--positions", type=int, default=500)
+    parser.add_argument("--ticks", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    symbols = [f"SIM{k}" for k in range(args.positions)]
+    entry = rng.uniform(50, 300, args.positions)
+    sides = rng.choice(["BUY", "SELL"], args.positions)
+    sl_points = rng.uniform(5, 15, args.positions)
+    book = PositionBook()
+    plain = {}
+    for k, symbol in enumerate(symbols):
+        sign = SIDES[sides[k]]
+        pos = {"side": sides[k], "entry": entry[k], "sl": entry[k] - sign * sl_points[k],
+               "tp": entry[k] + sign * 1.8 * sl_points[k], "qty": 30, "underlying": ["NIFTY", "BANKNIFTY"][k % 2]}
+        book[symbol] = pos
+        plain[symbol] = pos
+    ltp = dict(zip(symbols, entry))
+
+    # Random-walk ticks; exits from the book must match the per-symbol loop every tick
+    walk = rng.normal(0, 1.0, args.ticks)
+    which = rng.integers(0, args.positions, args.ticks)
+    mismatches = 0
+    exit_price = {}
+    book_time = loop_time = 0.0
+    for step in range(args.ticks):
+        symbol = symbols[which[step]]
+        ltp[symbol] += walk[step]
+        start = time.perf_counter()
+        batch = book.mark(symbol, ltp[symbol])
+        book_time += time.perf_counter() - start
+        start = time.perf_counter()
+        expected = loop_exits(plain, ltp)
+        loop_time += time.perf_counter() - start
+        if sorted(s for s, *_ in batch) != sorted(expected):
+            mismatches += 1
+        for s, *_ in batch:
+            book.close(s)
+            del plain[s]
+            exit_price[s] = ltp[s]
+
+    expected_pnl = sum((exit_price.get(s, ltp[s]) - entry[k]) * SIDES[sides[k]] * 30 for k, s in enumerate(symbols))
+    summary = book.summary()
+    pnl_error = abs(summary["total"] - expected_pnl)
+    print(f"{args.positions} positions, {args.ticks:,} ticks: {args.positions - book.n} exited, "
+          f"{mismatches} exit mismatches, P&L error {pnl_error:.2e}")
+    print(f"book.mark(): {book_time / args.ticks * 1e6:.1f} µs/tick   "
+          f"dict loop: {loop_time / args.ticks * 1e6:.1f} µs/tick")
+    print(f"summary: {summary}")
+    exit(0 if mismatches == 0 and pnl_error < 1e-6 else 1)
@@ -0,0 +1,176 @@
+import argparse
+import threading
+import time
+
+import pandas as pd
+from logzero import logger
+
+from tick_feed import ReplayTickSource, TickFeed
+
+# ================= POSITION MONITOR =================
+# Watches an open position's trailing stop from the cheapest price source available:
+# websocket ticks when the feed is live, otherwise one ltpData quote per MONITOR_INTERVAL.
+# A full candle refresh (the 10-day fetch used for indicators) only happens when the
+# quotes keep failing.
+MONITOR_INTERVAL = 0.25  # Seconds between LTP quotes while ticks are not flowing
+TICK_FRESH_SECONDS = 2  # Ticks older than this no longer count as a live price
+QUOTE_FAILURES_BEFORE_REFRESH = 3  # Consecutive failed quotes before falling back to candles
+
+
+class TrailingStop:
+    """
+    trade.py's trailing SL, applied one price at a time: starts at entry - offset and,
+    on any price at least `trigger` above the entry, ratchets up to price - difference.
+    The level is moved before the hit check, exactly as the original 5-second loop did.
+    """
+
+    def __init__(self, entry_price, offset, trigger, difference):
+        self.entry_price = float(entry_price)
+        self.trigger = self.entry_price + trigger
+        self.difference = difference
+        self.sl = self.entry_price - offset
+        self.last_price = None
+
+    def update(self, price):
+        """Returns (hit, moved) for one observed price"""
+        self.last_price = price
+        moved = False
+        if price >= self.trigger and price - self.difference > self.sl:
+            self.sl = price - self.difference
+            moved = True
+        return price <= self.sl, moved
+
+
+class PositionMonitor:
+    """
+    Blocks in run() until the stop is hit.
+    quote():   latest traded price, or None on failure (e.g. an ltpData call)
+    refresh(): full candle DataFrame with a Close column, or None (e.g. fetch_market_data)
+    feed/token: optional TickFeed whose ticks for token update the stop immediately
+    lock: guards the stop; hold it to read the stop consistently from another thread
+    """
+
+    def __init__(self, stop, quote, refresh=None, feed=None, token=None, interval=MONITOR_INTERVAL,
+                 tick_fresh=TICK_FRESH_SECONDS, max_failures=QUOTE_FAILURES_BEFORE_REFRESH,
+                 clock=time.monotonic):
+        self.stop = stop
+        self.quote = quote
+        self.refresh = refresh
+        self.feed = feed
+        self.token = None if token is None else str(token)
+        self.interval = interval
+        self.tick_fresh = tick_fresh
+        self.max_failures = max_failures
+        self.clock = clock
+        self.calls = {"tick": 0, "quote": 0, "refresh": 0}
+        self.exit_reason = None
+        self._hit = threading.Event()
+        self.lock = threading.Lock()
+        if feed is not None:
+            feed.on_tick(self._on_tick)
+
+    @property
+    def exited(self):
+        """True once the stop has been hit"""
+        return self._hit.is_set()
+
+    def _on_tick(self, token, ts, price, volume):
+        if token == self.token and not self._hit.is_set():
+            self.calls["tick"] += 1
+            self.observe(price, "tick")
+
+    def observe(self, price, source):
+        """Feed one price into the stop; returns True once the stop is hit"""
+        with self.lock:
+            if self._hit.is_set():
+                return True
+            hit, moved = self.stop.update(price)
+            if moved:
+                logger.info(f"🔄 Trailing SL updated to {self.stop.sl} ({source} {price})")
+            if hit:
+                self.exit_reason = f"SL hit on {source} {price}"
+                self._hit.set()
+        return hit
+
+    def _ticks_live(self):
+        return self.feed is not None and self.feed.silence(self.token) <= self.tick_fresh
+
+    def _refresh(self):
+        self.calls["refresh"] += 1
+        df = self.refresh() if self.refresh is not None else None
+        if df is None or df.empty:
+            return None
+        return df
+
+    def run(self, timeout=None):
+        """Wait for the stop to be hit; returns the SL level in force (None on timeout)"""
+        failures = 0
+        start = self.clock()
+        while not self._hit.is_set():
+            if timeout is not None and self.clock() - start >= timeout:
+                return None
+
+            if not self._ticks_live():
+                self.calls["quote"] += 1
+                price = self.quote()
+                if price is not None:
+                    failures = 0
+                    if self.observe(price, "quote"):
+                        break
+                else:
+                    failures += 1
+                    if failures >= self.max_failures:
+                        failures = 0
+                        df = self._refresh()
+                        if df is not None and self.observe(float(df['Close'].iloc[-1]), "candle"):
+                            break
+
+            # Ticks set the event from the feed thread, so a hit ends the wait at once
+            self._hit.wait(self.interval)
+        return self.stop.sl
+
+
+def close_loop_exit(closes, stop):
+    """Index of the first close that hits the stop, as the old 5-second candle loop saw it"""
+    for i, price in enumerate(closes):
+        if stop.update(price)[0]:
+            return i
+    return None
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay candles as ticks through the position monitor")
+    parser.add_argument("csv", help="Candle CSV with Datetime/Open/High/Low/Close/Volume columns")
+    parser.add_argument("--entry-bar", type=int, default=0, help="Bar whose close is the entry price")
+    parser.add_argument("--offset", type=float, default=5)
+    parser.add_argument("--trigger", type=float, default=1)
+    parser.add_argument("--difference", type=float, default=0.5)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    entry_price = float(df['Close'].iloc[args.entry_bar])
+    after = df.iloc[args.entry_bar + 1:].reset_index(drop=True)
+    make_stop = lambda: TrailingStop(entry_price, args.offset, args.trigger, args.difference)
+
+    feed = TickFeed(intervals=(1,))
+    monitor = PositionMonitor(make_stop(), quote=lambda: None, feed=feed, token="replay")
+    ticks = ReplayTickSource.from_candles("replay", after).ticks
+    exit_tick = None
+    for k, tick in enumerate(ticks):
+        feed.ingest(*tick)
+        if monitor.exited:
+            exit_tick = k
+            break
+
+    bar = close_loop_exit(after['Close'].to_numpy(dtype=float), make_stop())
+    logger.info(f"📥 Entry {entry_price} at bar {args.entry_bar}")
+    if exit_tick is None:
+        logger.info("Tick monitor: SL never hit")
+    else:
+        logger.info(f"⚡ Tick monitor: {monitor.exit_reason}, SL {monitor.stop.sl} "
+                    f"in bar {exit_tick // 4} ({after['Datetime'].iloc[exit_tick // 4]})")
+    if bar is None:
+        logger.info("Candle-close loop: SL never hit")
+    else:
+        logger.info(f"🕯️ Candle-close loop: SL hit on the close of bar {bar} ({after['Datetime'].iloc[bar]})")
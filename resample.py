@@ -0,0 +1,206 @@
+import argparse
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+from candle_store import INTERVAL_MINUTES, PRICE_COLUMNS, arrays_to_frame, frame_to_arrays
+from tick_feed import SESSION_OPEN_OFFSET
+
+# ================= MULTI-TIMEFRAME RESAMPLING =================
+# Derives higher timeframes (3/5/15/30-minute, ...) from one stored base interval
+# (normally 1-minute bars), with every bucket aligned to the 09:15 IST session open
+# like the exchange's own candles and tick_feed's aggregators. The same code path
+# serves backtests (whole arrays at once) and live loops (TimeframeCache tops up only
+# the buckets touched by new base bars).
+TIMEFRAMES = (3, 5, 15, 30)
+SESSION_MINUTES = 375  # 09:15-15:30
+CACHE_ENTRIES = 512  # (symbol, interval) results kept by a TimeframeCache
+
+
+def bar_starts(timestamps, minutes):
+    """Vectorised tick_feed.bar_start: start (epoch seconds) of each timestamp's bucket"""
+    width = minutes * 60
+    ts = np.asarray(timestamps, dtype=np.int64)
+    return (ts - SESSION_OPEN_OFFSET) // width * width + SESSION_OPEN_OFFSET
+
+
+def resample_arrays(cols, minutes, base_minutes=1, complete_only=False):
+    """
+    Aggregate sorted base bars ({timestamp, open, high, low, close, volume} arrays, as
+    CandleStore.arrays returns) into `minutes` bars: first open, max high, min low,
+    last close, summed volume. complete_only drops a last bucket whose base bars do
+    not yet cover it (up to the session close), i.e. the still-forming bar.
+    """
+    if minutes % base_minutes:
+        raise ValueError(f"{minutes}-minute bars cannot be built from {base_minutes}-minute bars")
+    ts = np.asarray(cols["timestamp"], dtype=np.int64)
+    if ts.size == 0:
+        return {"timestamp": ts.copy(), **{c: np.empty(0) for c in PRICE_COLUMNS}}
+    starts = bar_starts(ts, minutes)
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    last = np.r_[first[1:] - 1, ts.size - 1]
+    out = {
+        "timestamp": starts[first],
+        "open": np.asarray(cols["open"], dtype=np.float64)[first],
+        "high": np.maximum.reduceat(np.asarray(cols["high"], dtype=np.float64), first),
+        "low": np.minimum.reduceat(np.asarray(cols["low"], dtype=np.float64), first),
+        "close": np.asarray(cols["close"], dtype=np.float64)[last],
+        "volume": np.add.reduceat(np.asarray(cols["volume"], dtype=np.float64), first),
+    }
+    if complete_only:
+        session_close = bar_starts(starts[-1:], 24 * 60)[0] + SESSION_MINUTES * 60
+        bucket_end = min(starts[-1] + minutes * 60, session_close)
+        if ts[-1] + base_minutes * 60 < bucket_end:
+            out = {c: v[:-1] for c, v in out.items()}
+    return out
+
+
+def resample_frame(df, minutes, base_minutes=1, complete_only=False):
+    """resample_arrays for a Datetime/Open/High/Low/Close/Volume frame (extra columns are dropped)"""
+    return arrays_to_frame(resample_arrays(frame_to_arrays(df), minutes, base_minutes, complete_only))
+
+
+def timeframes(df, minutes_list=TIMEFRAMES, base_minutes=1, complete_only=False):
+    """Several timeframes from one base frame at once: {minutes: frame}"""
+    cols = frame_to_arrays(df)
+    return {m: arrays_to_frame(resample_arrays(cols, m, base_minutes, complete_only)) for m in minutes_list}
+
+
+class TimeframeCache:
+    """
+    Derived bars per (symbol, minutes), kept up to date from a growing base series.
+    sync() only re-aggregates from the bucket holding the first new (or re-fetched)
+    base bar, so a live loop pays for the new bars, not the whole history. A base
+    window that also drops bars at the front (a rolling "since yesterday 09:15" fetch)
+    just drops the buckets before it, re-aggregating only a bucket it now starts inside.
+    Least recently used entries are evicted beyond max_entries.
+    """
+
+    def __init__(self, base_minutes=1, max_entries=CACHE_ENTRIES):
+        self.base_minutes = base_minutes
+        self.max_entries = max_entries
+        # (symbol, minutes) -> {"arrays", "base_first"/"base_last": first/last base bar time}
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _slice(self, base, lo, hi, minutes):
+        return resample_arrays({c: np.asarray(v)[lo:hi] for c, v in base.items()}, minutes, self.base_minutes)
+
+    def _update(self, key, base, minutes):
+        entry = self.entries.get(key)
+        ts = np.asarray(base["timestamp"], dtype=np.int64)
+        if entry is None or not ts.size or ts[0] < entry["base_first"] or ts[-1] < entry["base_first"]:
+            # New symbol, or the base now reaches further back than the cached bars: rebuild
+            arrays = resample_arrays(base, minutes, self.base_minutes)
+        else:
+            cached = entry["arrays"]
+            first = int(bar_starts(ts[:1], minutes)[0])
+            # The window may have dropped bars at the front: a bucket it now starts inside
+            # is re-aggregated, earlier ones are dropped
+            partial = ts[0] != entry["base_first"] and ts[0] != first
+            head_from = int(np.searchsorted(cached["timestamp"], first, side="right" if partial else "left"))
+            # The last processed base bar may have been re-fetched, so restart at its bucket
+            start = int(bar_starts([min(entry["base_last"], ts[-1])], minutes)[0])
+            keep = max(head_from, int(np.searchsorted(cached["timestamp"], start, side="left")))
+            lo = int(np.searchsorted(ts, start, side="left"))
+            parts = [{c: v[head_from:keep] for c, v in cached.items()}, self._slice(base, lo, None, minutes)]
+            if partial and start > first:
+                parts.insert(0, self._slice(base, 0, int(np.searchsorted(ts, first + minutes * 60)), minutes))
+            arrays = {c: np.concatenate([part[c] for part in parts]) for c in cached}
+        self.entries[key] = {"arrays": arrays, "base_first": int(ts[0]) if ts.size else 0,
+                             "base_last": int(ts[-1]) if ts.size else 0}
+        self.entries.move_to_end(key)
+        return arrays
+
+    def sync(self, symbol, base, minutes_list=TIMEFRAMES, as_frames=True):
+        """
+        Bring every requested timeframe of symbol up to date with base (a frame or
+        {timestamp, open, ...} arrays); returns {minutes: frame or arrays}
+        """
+        if isinstance(base, pd.DataFrame):
+            base = frame_to_arrays(base)
+        out = {}
+        with self._lock:
+            for m in minutes_list:
+                arrays = self._update((symbol, m), base, m)
+                out[m] = arrays_to_frame(arrays) if as_frames else arrays
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return out
+
+    def from_store(self, store, exchange, token, minutes_list=TIMEFRAMES, base_interval="ONE_MINUTE",
+                   as_frames=True):
+        """Derive timeframes from the memory-mapped base interval of a CandleStore"""
+        return self.sync(f"{exchange}:{token}", store.arrays(exchange, token, base_interval), minutes_list,
+                         as_frames)
+
+    def get(self, symbol, minutes):
+        """Cached arrays of one timeframe, or None"""
+        with self._lock:
+            entry = self.entries.get((symbol, minutes))
+            return None if entry is None else entry["arrays"]
+
+
+def verify(days=("2026-02-02", "2026-02-03", "2026-02-04"), tokens=("42544", "42545"),
+           minutes_list=TIMEFRAMES, chunk=37, window=400):
+    """
+    Check batch and incremental resampling of FakeSmartConnect's 1-minute bars
+    against the candles it serves for each interval directly (intervals SmartAPI has),
+    and a rolling `window`-bar base against batch resampling of the same bars
+    """
+    from fake_smartapi import FakeSmartConnect
+
+    api = FakeSmartConnect()
+    names = {v: k for k, v in INTERVAL_MINUTES.items()}
+    mismatches = 0
+    minutes_list = [m for m in minutes_list if m in names]
+    for token in tokens:
+        base = frame_to_arrays(pd.concat([api.day_candles(token, day) for day in days], ignore_index=True))
+        cache = TimeframeCache()
+        rolling = TimeframeCache()
+        for stop in range(chunk, len(base["timestamp"]) + chunk, chunk):
+            live = cache.sync(token, {c: v[:stop] for c, v in base.items()}, minutes_list, as_frames=False)
+            recent = {c: v[max(0, stop - window):stop] for c, v in base.items()}
+            for m, got in rolling.sync(token, recent, minutes_list, as_frames=False).items():
+                expected = resample_arrays(recent, m)
+                if not all(np.array_equal(got[c], expected[c]) for c in expected):
+                    mismatches += 1
+                    logger.error(f"❌ rolling {m}-minute bars differ for token {token} at bar {stop}")
+        for m in minutes_list:
+            expected = frame_to_arrays(pd.concat(
+                [api.day_candles(token, day, names[m]) for day in days], ignore_index=True))
+            batch = resample_arrays(base, m)
+            for label, got in (("batch", batch), ("incremental", live[m])):
+                ok = all(np.allclose(got[c], expected[c]) for c in PRICE_COLUMNS) and \
+                    np.array_equal(got["timestamp"], expected["timestamp"])
+                if not ok:
+                    mismatches += 1
+                    logger.error(f"❌ {label} {m}-minute bars differ for token {token}")
+    logger.info(f"Checked {len(tokens)} tokens x {len(days)} days x {list(minutes_list)} minutes, "
+                f"{mismatches} mismatches")
+    return mismatches == 0
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    import csv_cache
+
+    parser = argparse.ArgumentParser(description="Derive higher timeframes from a base-interval candle CSV")
+    parser.add_argument("csv", nargs="?", help="Candle CSV (Datetime/Open/High/Low/Close/Volume)")
+    parser.add_argument("--base", type=int, default=1, help="Minutes per bar in the CSV")
+    parser.add_argument("--to", type=int, nargs="+", default=list(TIMEFRAMES), help="Target intervals in minutes")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check against the synthetic API's native intervals (needs no CSV)")
+    args = parser.parse_args()
+
+    if args.verify:
+        exit(0 if verify(minutes_list=args.to) else 1)
+    if not args.csv:
+        parser.error("a CSV is required unless --verify is given")
+
+    df = csv_cache.load_csv(args.csv)
+    for m, frame in timeframes(df, [m for m in args.to if m % args.base == 0], args.base).items():
+        logger.info(f"\n{m}-minute bars ({len(frame)}):\n{frame.to_string(index=False)}")
@@ -0,0 +1,326 @@
+import argparse
+import glob
+import math
+import os
+
+import numpy as np
+from logzero import logger
+
+import csv_cache
+import execution
+import indicators
+from signals import Rules, inputs
+from streaming_indicators import IndicatorState
+from trade_store import TradeStore, report
+
+# =========================
+# STRATEGY PARAMETERS
+# =========================
+# The MACD/RSI/VWAP/ATR/ADX scalp rules that Ai_bot trades live. Ai_bot imports these,
+# so the backtest below always runs the same numbers as the bot.
+
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+ADX_PERIOD = 14
+EMA_SHORT = 12
+EMA_LONG = 26
+MACD_SHORT = 12
+MACD_LONG = 26
+MACD_SIGNAL = 9
+
+MACD_NEAR_ZERO_THRESHOLD = 0.5
+ATR_SL_MULTIPLIER = 1.5
+TP_SL_RATIO = 1.8
+MIN_SL_POINTS = 10
+ADX_THRESHOLD = 18
+VWAP_LOOKBACK = 60
+INDICATOR_SMOOTHING = "sma"  # RSI/ATR/ADX: "sma" = rolling means, "wilder" = true Wilder smoothing
+WARMUP_BARS = 50  # Candles (including the forming one) needed before the first decision
+
+# Backtest sizing; the bot trades one BANKNIFTY lot
+QUANTITY = 30
+BROKERAGE_CHARGE = 90  # Fixed ₹90 per order, as in strategy_backtest.py
+EXIT_SCAN_WINDOW = 256  # Bars scanned per step while looking for the SL/TP hit
+
+LONG, SHORT = 1, -1
+
+
+# =========================
+# SIGNALS
+# =========================
+
+def _scalp_rules():
+    macd, signal, ema_s, ema_l, close, vwap, rsi, adx = inputs(
+        "macd", "signal", "ema_s", "ema_l", "close", "vwap", "rsi", "adx")
+    near_zero = (abs(macd) < MACD_NEAR_ZERO_THRESHOLD) & (adx > ADX_THRESHOLD)
+    buy = near_zero & (macd > signal) & (ema_s > ema_l) & (close > vwap) & (rsi > 50)
+    sell = near_zero & (macd < signal) & (ema_s < ema_l) & (close < vwap) & (rsi < 50)
+    return Rules({"BUY": buy, "SELL": sell & ~buy})
+
+
+# Ai_bot.decide's entry rules; "close" is the bar's close in a backtest and the LTP live
+SCALP_RULES = _scalp_rules()
+
+
+def scalp_inputs(high, low, close, volume):
+    """Indicator arrays SCALP_RULES reads (plus ATR for sizing), one element per bar"""
+    close = np.asarray(close, dtype=np.float64)
+    macd, signal, ema_s, ema_l = indicators.macd(close, MACD_SHORT, MACD_LONG, MACD_SIGNAL)
+    adx, _, _ = indicators.adx(high, low, close, ADX_PERIOD, INDICATOR_SMOOTHING)
+    return {
+        "close": close,
+        "vwap": indicators.rolling_vwap(close, volume, VWAP_LOOKBACK),
+        "rsi": indicators.rsi(close, RSI_PERIOD, INDICATOR_SMOOTHING),
+        "macd": macd, "signal": signal, "ema_s": ema_s, "ema_l": ema_l,
+        "atr": indicators.atr(high, low, close, ATR_PERIOD, INDICATOR_SMOOTHING),
+        "adx": adx,
+    }
+
+
+def scalp_signals(high, low, close, volume):
+    """
+    Buy/sell conditions of Ai_bot.decide for every bar at once.
+    Bar t is evaluated as the bot would with the candle forming and the LTP at its close.
+    Returns (buy, sell, atr) arrays.
+    """
+    env = scalp_inputs(high, low, close, volume)
+    signals = SCALP_RULES.arrays(env)
+    warm = np.arange(len(env["close"])) + 1 >= WARMUP_BARS
+    return signals["BUY"] & warm, signals["SELL"] & warm, env["atr"]
+
+
+def sl_tp_levels(entry_price, side, atr):
+    """Stop and target as set by Ai_bot.enter_position; a NaN ATR falls back to MIN_SL_POINTS"""
+    sl_points = np.fmax(MIN_SL_POINTS, atr * ATR_SL_MULTIPLIER)
+    return entry_price - side * sl_points, entry_price + side * sl_points * TP_SL_RATIO
+
+
+def scalp_indicator_state():
+    """Streaming IndicatorState with this strategy's periods and smoothing"""
+    return IndicatorState(rsi_period=RSI_PERIOD, atr_period=ATR_PERIOD, adx_period=ADX_PERIOD,
+                          macd_short=MACD_SHORT, macd_long=MACD_LONG, macd_signal=MACD_SIGNAL,
+                          vwap_lookback=VWAP_LOOKBACK, smoothing=INDICATOR_SMOOTHING)
+
+
+def snapshot_signal(ind, ltp):
+    """
+    SCALP_RULES for one IndicatorState.snapshot(ltp): "BUY", "SELL" or None
+    (NaN indicators fail every comparison; no VWAP yet counts as NaN)
+    """
+    vwap = ind["vwap"]
+    return SCALP_RULES.first({**ind, "close": ltp, "vwap": math.nan if vwap is None else vwap})
+
+
+# =========================
+# ARRAY BACKTEST ENGINE
+# =========================
+
+def _first_exit(close, start, lower, upper):
+    """
+    First index >= start with close <= lower or close >= upper, or -1.
+    Scans forward in doubling windows so a trade only costs about its own length.
+    """
+    n = len(close)
+    width = EXIT_SCAN_WINDOW
+    while start < n:
+        stop = min(n, start + width)
+        window = close[start:stop]
+        hits = np.flatnonzero((window <= lower) | (window >= upper))
+        if hits.size:
+            return start + hits[0]
+        start = stop
+        width *= 2
+    return -1
+
+
+def backtest_scalp_arrays(high, low, close, volume, path=None, model=None):
+    """
+    Long and short scalp trades on one series: enter at the signal bar's close, exit at
+    the close of the first later bar at or beyond the SL or TP (the bot exits at market
+    on the LTP), or at the last bar.
+    With an execution.IntrabarPath and ExecutionModel, SL/TP are checked against the
+    path's highs/lows and filled per the model instead.
+    Returns (entry_idx, exit_idx, exit_price, side, end_of_data) arrays, one element per trade.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    buy, sell, atr = scalp_signals(high, low, close, volume)
+    signal_idx = np.flatnonzero(buy | sell)
+    n = len(close)
+
+    entries, exits, exit_prices, sides, end_flags = [], [], [], [], []
+    pos = 0  # First bar allowed to open a new trade
+    while True:
+        k = np.searchsorted(signal_idx, pos)
+        if k >= signal_idx.size:
+            break
+        entry_index = signal_idx[k]
+        side = LONG if buy[entry_index] else SHORT
+        sl, tp = sl_tp_levels(close[entry_index], side, atr[entry_index])
+        if path is None:
+            lower, upper = (sl, tp) if side == LONG else (tp, sl)
+            exit_index = _first_exit(close, entry_index + 1, lower, upper)
+            exit_price = close[exit_index]
+        else:
+            exit_index, exit_price = execution.bracket_exit(path, entry_index, side, sl, tp, model)
+
+        entries.append(entry_index)
+        sides.append(side)
+        if exit_index < 0:
+            exits.append(n - 1)
+            exit_prices.append(close[-1] if model is None else model.market_fill(close[-1], -side))
+            end_flags.append(True)
+            break
+        exits.append(exit_index)
+        exit_prices.append(exit_price)
+        end_flags.append(False)
+        pos = exit_index + 1
+
+    return (np.array(entries, dtype=np.int64), np.array(exits, dtype=np.int64),
+            np.array(exit_prices, dtype=np.float64), np.array(sides, dtype=np.int64),
+            np.array(end_flags, dtype=bool))
+
+
+def scalp_trade_arrays(df, model=None, sub_bars=None):
+    """
+    Scalp backtest of one candle frame (Datetime/Open/High/Low/Close/Volume), as column arrays
+    in the strategy_backtest trade schema plus Side (1 long, -1 short).
+    model/sub_bars select intrabar execution as in strategy_backtest.trade_arrays.
+    """
+    close = df['Close'].to_numpy(dtype=np.float64)
+    path = None
+    if model is not None or sub_bars is not None:
+        model = model or execution.ExecutionModel()
+        path = (execution.IntrabarPath.from_bars(df) if sub_bars is None
+                else execution.IntrabarPath.from_sub_bars(df, sub_bars))
+    entries, exits, exit_prices, sides, end_flags = backtest_scalp_arrays(
+        df['High'].to_numpy(dtype=np.float64),
+        df['Low'].to_numpy(dtype=np.float64),
+        close,
+        df['Volume'].to_numpy(dtype=np.float64),
+        path=path, model=model,
+    )
+    times = df['Datetime'].array
+    entry_prices = close[entries] if model is None else model.market_fill(close[entries], sides)
+    return {
+        'Entry_Time': times[entries],
+        'Exit_Time': times[exits],
+        'Entry_Price': entry_prices,
+        'Exit_Price': exit_prices,
+        'P&L': (exit_prices - entry_prices) * sides * QUANTITY - (2 * BROKERAGE_CHARGE),
+        'P&L%': ((exit_prices - entry_prices) / entry_prices) * sides * 100,
+        'Candles': np.where(end_flags, len(df), exits) - entries,
+        'Side': sides,
+    }
+
+
+def backtest_scalp(df):
+    """Scalp backtest of one candle frame as a list of trade dicts"""
+    if df.empty:
+        return []
+    arrays = scalp_trade_arrays(df)
+    arrays['Candles'] = arrays['Candles'].tolist()
+    arrays['Side'] = ["LONG" if s == LONG else "SHORT" for s in arrays['Side']]
+    return [dict(zip(arrays, values)) for values in zip(*arrays.values())]
+
+
+def backtest_scalp_reference(df):
+    """
+    Bar-by-bar replay of Ai_bot.decide through the streaming IndicatorState and the
+    last-bar SCALP_RULES, with the LTP at each bar's close. Slow; used to check the array engine.
+    Returns (entry_idx, exit_idx, exit_price, side, end_of_data) like backtest_scalp_arrays.
+    """
+    state = scalp_indicator_state()
+    rows = df[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(dtype=np.float64)
+    trades = []
+    position = None  # (entry_index, side, sl, tp)
+    for t, (o, h, l, c, v) in enumerate(rows):
+        state.set_forming(o, h, l, c, v)
+        ltp = c
+        if position is None:
+            if state.bars + 1 >= WARMUP_BARS:
+                ind = state.snapshot(ltp)
+                entry = snapshot_signal(ind, ltp)
+                if entry is not None:
+                    side = LONG if entry == "BUY" else SHORT
+                    sl, tp = sl_tp_levels(ltp, side, ind["atr"])
+                    position = (t, side, sl, tp)
+        else:
+            entry_index, side, sl, tp = position
+            if (side == LONG and (ltp <= sl or ltp >= tp)) or (side == SHORT and (ltp >= sl or ltp <= tp)):
+                trades.append((entry_index, t, side, False))
+                position = None
+        state.update(h, l, c, v)
+    if position is not None:
+        trades.append((position[0], len(rows) - 1, position[1], True))
+    if not trades:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0), empty, np.empty(0, dtype=bool)
+    entries, exits, sides, ends = zip(*trades)
+    exits = np.array(exits, dtype=np.int64)
+    return (np.array(entries, dtype=np.int64), exits, rows[exits, 3],
+            np.array(sides, dtype=np.int64), np.array(ends, dtype=bool))
+
+
+def verify_scalp_engine(files):
+    """Check backtest_scalp_arrays against the streaming replay on each file"""
+    mismatches = 0
+    for file, df in zip(files, csv_cache.load_many(files)):
+        columns = [df[c].to_numpy(dtype=np.float64) for c in ('High', 'Low', 'Close', 'Volume')]
+        actual = backtest_scalp_arrays(*columns)
+        expected = backtest_scalp_reference(df)
+        if not all(np.array_equal(a, e) for a, e in zip(actual, expected)):
+            mismatches += 1
+            logger.error(f"❌ Scalp engine mismatch on {file}: {len(expected[0])} vs {len(actual[0])} trades")
+    logger.info(f"Checked {len(files)} files, {mismatches} mismatches")
+    return mismatches == 0
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the Ai_bot MACD/RSI/VWAP/ATR/ADX scalp strategy")
+    parser.add_argument("--pattern", default="NIFTY_*MIN_*_*.csv")
+    parser.add_argument("--quiet", action="store_true", help="Skip per-trade log lines")
+    parser.add_argument("--save", metavar="DIR", help="Write the trade store here")
+    parser.add_argument("--verify", action="store_true", help="Compare with a bar-by-bar streaming replay")
+    parser.add_argument("--intrabar", action="store_true", help="Check SL/TP against High/Low instead of Close")
+    parser.add_argument("--slippage", type=float, default=0.0, help="Points lost per market fill (with --intrabar)")
+    parser.add_argument("--gap-fill", choices=execution.GAP_FILLS, default="open")
+    parser.add_argument("--same-bar", choices=execution.SAME_BAR, default="stop",
+                        help="Leg assumed hit first when a bar touches both SL and TP")
+    args = parser.parse_args()
+    model = execution.ExecutionModel(args.slippage, args.gap_fill, args.same_bar) if args.intrabar else None
+
+    files = sorted(glob.glob(args.pattern))
+    if not files:
+        logger.error("❌ No CSV files found. Make sure data files exist.")
+        exit()
+
+    if args.verify:
+        exit(0 if verify_scalp_engine(files) else 1)
+
+    logger.info(f"🚀 Scalp backtest over {len(files)} CSV files\n")
+    csv_cache.warm(files)
+    store = TradeStore()
+    for file in files:
+        try:
+            df = csv_cache.load_csv(file)
+            name = os.path.basename(file)[:-4]
+            interval = name.split("_")[1]
+            side = "CALL" if "CALL" in name else "PUT" if "PUT" in name else "OTHER"
+            arrays = scalp_trade_arrays(df, model)
+            store.add(name, *list(arrays.values())[:7], group=f"{interval}_{side}", bars=len(df))
+
+            if not args.quiet:
+                for entry_time, exit_time, entry, exit_price, pnl, direction in zip(
+                        arrays['Entry_Time'], arrays['Exit_Time'], arrays['Entry_Price'],
+                        arrays['Exit_Price'], arrays['P&L'], arrays['Side']):
+                    emoji = "🟢" if direction == LONG else "🔴"
+                    logger.info(f"{emoji} {name} {'LONG' if direction == LONG else 'SHORT'} "
+                                f"{entry_time} @ {entry:.2f} -> {exit_time} @ {exit_price:.2f} | P&L: ₹{pnl:.2f}")
+        except Exception as e:
+            logger.error(f"❌ Error processing {file}: {e}")
+
+    if args.save:
+        store.save(args.save)
+        logger.info(f"✅ Trade store saved to {args.save}")
+    report(store)
@@ -0,0 +1,125 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# =========================
+# SENTIMENT SERVICE
+# =========================
+# Keeps the trading loop off the network: get() answers from a per-underlying TTL
+# cache straight away (NEU until something is known) and schedules a background
+# refresh when the entry is missing or expired. Concurrent requests for the same
+# underlying share one in-flight backend call.
+
+SENTIMENTS = ("POS", "NEG", "NEU")
+DEFAULT_SENTIMENT = "NEU"
+SENTIMENT_TTL = 300  # Seconds a cached sentiment stays fresh
+SENTIMENT_MAX_ENTRIES = 256  # Least recently used underlyings are evicted beyond this
+SENTIMENT_WORKERS = 2
+
+_UNDERLYING = re.compile(r"^([A-Z&-]+?)(?=\d)")
+
+
+def underlying_of(symbol):
+    """'BANKNIFTY27MAR2551700PE' -> 'BANKNIFTY'; symbols without digits map to themselves"""
+    match = _UNDERLYING.match(symbol.upper())
+    return match.group(1) if match else symbol.upper()
+
+
+class GeminiBackend:
+    """Asks a google.generativeai GenerativeModel for a one-word classification"""
+
+    PROMPT = """
+    You are an intraday options trader.
+    Classify short-term sentiment for {symbol}.
+    Reply with only one word: POS, NEG, or NEU.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, underlying):
+        return self.model.generate_content(self.PROMPT.format(symbol=underlying)).text
+
+
+class StubBackend:
+    """Local backend for tests: a fixed mapping (or callable) with optional latency"""
+
+    def __init__(self, answers=None, latency=0.0):
+        self.answers = answers or {}
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, underlying):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if callable(self.answers):
+            return self.answers(underlying)
+        return self.answers.get(underlying, DEFAULT_SENTIMENT)
+
+
+class SentimentService:
+
+    def __init__(self, backend, ttl=SENTIMENT_TTL, max_entries=SENTIMENT_MAX_ENTRIES,
+                 workers=SENTIMENT_WORKERS, clock=time.monotonic):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.cache = OrderedDict()  # underlying -> (sentiment, fetched_at)
+        self.inflight = {}  # underlying -> Future
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sentiment")
+        self._lock = threading.Lock()
+
+    def _refresh(self, underlying):
+        try:
+            sentiment = str(self.backend(underlying)).strip().upper()
+            if sentiment not in SENTIMENTS:
+                sentiment = DEFAULT_SENTIMENT
+        except Exception as e:
+            print(f"[sentiment] {underlying} error: {e}")
+            sentiment = None  # Keep the last known value
+        with self._lock:
+            self.inflight.pop(underlying, None)
+            if sentiment is not None:
+                self.cache[underlying] = (sentiment, self.clock())
+                self.cache.move_to_end(underlying)
+                while len(self.cache) > self.max_entries:
+                    self.cache.popitem(last=False)
+        return sentiment
+
+    def _schedule(self, underlying):
+        # Caller holds the lock
+        future = self.inflight.get(underlying)
+        if future is None:
+            future = self.pool.submit(self._refresh, underlying)
+            self.inflight[underlying] = future
+        return future
+
+    def get(self, symbol, wait=False):
+        """
+        Last known sentiment for the symbol's underlying (NEU if none yet).
+        A missing or expired entry is refreshed in the background; wait=True blocks for it.
+        """
+        underlying = underlying_of(symbol)
+        with self._lock:
+            entry = self.cache.get(underlying)
+            if entry is not None:
+                self.cache.move_to_end(underlying)
+            fresh = entry is not None and self.clock() - entry[1] < self.ttl
+            future = None if fresh else self._schedule(underlying)
+        if future is not None and wait:
+            result = future.result()
+            if result is not None:
+                return result
+        return entry[0] if entry is not None else DEFAULT_SENTIMENT
+
+    def prefetch(self, symbols):
+        """Start refreshes for several symbols without waiting"""
+        for symbol in symbols:
+            self.get(symbol)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,252 @@
+import argparse
+import glob
+import time
+
+import numpy as np
+
+# =========================
+# SIGNAL RULES
+# =========================
+# Entry rules written once as expressions over named inputs (indicator values, prices,
+# thresholds), e.g.
+#     ema_5, ema_9, adx = inputs("ema_5", "ema_9", "adx")
+#     TREND_RULES = Rules({"BUY": (ema_5 > ema_9) & (adx > 25)})
+# A Rules set is compiled to two plain Python functions over the same expression graph.
+# arrays(env) evaluates every bar at once with NumPy for backtests. first(env) and
+# scalars(env) evaluate one bar (the latest) from plain floats for live trading. Identical subexpressions
+# are computed once per call, across all rules in the set. NaN inputs fail every
+# comparison in both modes, so live and backtest signals agree bar for bar.
+
+# op -> (array code, scalar code); {0}/{1} are the operands
+OPS = {
+    "gt": ("{0} > {1}", "{0} > {1}"),
+    "ge": ("{0} >= {1}", "{0} >= {1}"),
+    "lt": ("{0} < {1}", "{0} < {1}"),
+    "le": ("{0} <= {1}", "{0} <= {1}"),
+    "and": ("{0} & {1}", "{0} and {1}"),
+    "or": ("{0} | {1}", "{0} or {1}"),
+    "not": ("~{0}", "not {0}"),
+    "abs": ("np.abs({0})", "abs({0})"),
+    "neg": ("-{0}", "-{0}"),
+    "add": ("{0} + {1}", "{0} + {1}"),
+    "sub": ("{0} - {1}", "{0} - {1}"),
+    "mul": ("{0} * {1}", "{0} * {1}"),
+}
+
+
+class Expr:
+    """A node of a rule: an input, a constant or an operation on other nodes"""
+
+    def __init__(self, op, args=(), value=None):
+        self.op = op
+        self.args = tuple(args)
+        self.value = value
+        # Structural identity: equal keys are the same subexpression
+        if op == "input":
+            self.key = ("input", value)
+        elif op == "const":
+            self.key = ("const", type(value).__name__, repr(value))
+        else:
+            self.key = (op,) + tuple(arg.key for arg in self.args)
+
+    def _op(self, op, *others):
+        return Expr(op, (self,) + tuple(_expr(other) for other in others))
+
+    def _rop(self, op, other):
+        return Expr(op, (_expr(other), self))
+
+    def __gt__(self, other):
+        return self._op("gt", other)
+
+    def __ge__(self, other):
+        return self._op("ge", other)
+
+    def __lt__(self, other):
+        return self._op("lt", other)
+
+    def __le__(self, other):
+        return self._op("le", other)
+
+    def __and__(self, other):
+        return self._op("and", other)
+
+    def __rand__(self, other):
+        return self._rop("and", other)
+
+    def __or__(self, other):
+        return self._op("or", other)
+
+    def __ror__(self, other):
+        return self._rop("or", other)
+
+    def __invert__(self):
+        return self._op("not")
+
+    def __abs__(self):
+        return self._op("abs")
+
+    def __neg__(self):
+        return self._op("neg")
+
+    def __add__(self, other):
+        return self._op("add", other)
+
+    def __radd__(self, other):
+        return self._rop("add", other)
+
+    def __sub__(self, other):
+        return self._op("sub", other)
+
+    def __rsub__(self, other):
+        return self._rop("sub", other)
+
+    def __mul__(self, other):
+        return self._op("mul", other)
+
+    def __rmul__(self, other):
+        return self._rop("mul", other)
+
+    def __bool__(self):
+        raise TypeError("Rules combine with & | ~, not and / or / not")
+
+    def __repr__(self):
+        if self.op == "input":
+            return self.value
+        if self.op == "const":
+            return repr(self.value)
+        code = OPS[self.op][0] if self.op != "abs" else "abs({0})"
+        return "(" + code.format(*map(repr, self.args)) + ")"
+
+
+def _expr(value):
+    return value if isinstance(value, Expr) else Expr("const", value=value)
+
+
+def inputs(*names):
+    """Input nodes, one per name; a single name returns the node itself"""
+    nodes = tuple(Expr("input", value=name) for name in names)
+    return nodes[0] if len(nodes) == 1 else nodes
+
+
+class Rules:
+    """
+    Named boolean rules compiled for array and scalar evaluation.
+    rules: {name: Expr}, in priority order (first() returns the first name that holds)
+    env:   {input name: array or scalar}; extra keys are ignored
+    """
+
+    def __init__(self, rules):
+        self.names = tuple(rules)
+        self.rules = dict(rules)
+        self.inputs, self.constants, self.steps, self.outputs = self._plan()
+        self.nodes = sum(1 for _ in self._walk())
+        self.array_source, self._arrays = self._compile(0)
+        self.scalar_source, self._scalars = self._compile(1)
+
+    def _walk(self):
+        """Every node reference in the rules, shared ones once per use"""
+        stack = list(self.rules.values())
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.args)
+
+    def _plan(self):
+        """Topologically ordered steps, one per distinct subexpression"""
+        names, inputs, constants, steps = {}, [], [], []
+
+        def visit(node):
+            if node.key in names:
+                return names[node.key]
+            if node.op == "input":
+                name = f"i{len(inputs)}"
+                inputs.append((name, node.value))
+            elif node.op == "const":
+                name = f"c{len(constants)}"
+                constants.append((name, node.value))
+            else:
+                args = [visit(arg) for arg in node.args]
+                name = f"t{len(steps)}"
+                steps.append((name, node.op, args))
+            names[node.key] = name
+            return name
+
+        outputs = [visit(node) for node in self.rules.values()]
+        return inputs, constants, steps, outputs
+
+    def _compile(self, mode):
+        lines = ["def evaluate(env):"]
+        lines += [f"    {name} = env[{key!r}]" for name, key in self.inputs]
+        lines += [f"    {name} = {OPS[op][mode].format(*args)}" for name, op, args in self.steps]
+        lines.append(f"    return ({''.join(name + ', ' for name in self.outputs)})")
+        source = "\n".join(lines)
+        namespace = {"np": np, **dict(self.constants)}
+        exec(source, namespace)
+        return source, namespace["evaluate"]
+
+    def arrays(self, env):
+        """{name: bool array} for every bar at once"""
+        with np.errstate(invalid="ignore"):
+            values = self._arrays(env)
+        return {name: np.asarray(value, dtype=bool) for name, value in zip(self.names, values)}
+
+    def scalars(self, env):
+        """{name: bool} for one bar of scalar inputs"""
+        return dict(zip(self.names, map(bool, self._scalars(env))))
+
+    def first(self, env):
+        """Name of the first rule that holds for one bar of scalar inputs, or None"""
+        for name, value in zip(self.names, self._scalars(env)):
+            if value:
+                return name
+        return None
+
+    def __repr__(self):
+        return "\n".join(f"{name}: {rule!r}" for name, rule in self.rules.items())
+
+
+# =========================
+# CHECK / BENCHMARK
+# =========================
+
+if __name__ == "__main__":
+    import csv_cache
+    from scalp_strategy import SCALP_RULES, scalp_inputs
+    from strategy_backtest import TREND_RULES, trend_inputs
+
+    parser = argparse.ArgumentParser(description="Check array vs last-bar rule evaluation and time both")
+    parser.add_argument("--pattern", default="NIFTY_*MIN_*_*.csv")
+    parser.add_argument("--show", action="store_true", help="Print the compiled rule functions")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(args.pattern))
+    strategies = {"scalp": (SCALP_RULES, scalp_inputs), "trend": (TREND_RULES, trend_inputs)}
+    mismatches = bars = 0
+    array_time = {name: 0.0 for name in strategies}
+    scalar_time = {name: 0.0 for name in strategies}
+    for df in csv_cache.load_many(files):
+        columns = [df[c].to_numpy(dtype=np.float64) for c in ("High", "Low", "Close", "Volume")]
+        bars += len(df)
+        for name, (rules, build) in strategies.items():
+            env = build(*columns)
+            start = time.perf_counter()
+            batch = rules.arrays(env)
+            array_time[name] += time.perf_counter() - start
+            # The live path: one bar at a time from scalars
+            start = time.perf_counter()
+            for t in range(len(df)):
+                bar = rules.scalars({key: value[t] if np.ndim(value) else value for key, value in env.items()})
+                mismatches += any(bar[rule] != batch[rule][t] for rule in rules.names)
+            scalar_time[name] += time.perf_counter() - start
+
+    for name, (rules, _) in strategies.items():
+        shared = rules.nodes - len(rules.steps) - len(rules.inputs) - len(rules.constants)
+        print(f"{name}: {len(rules.names)} rules, {len(rules.steps)} operations ({shared} node uses shared)")
+        if args.show:
+            print(rules)
+            print(rules.array_source)
+            print(rules.scalar_source)
+        print(f"  arrays: {bars / max(array_time[name], 1e-9):,.0f} bars/s   "
+              f"one bar (incl. env): {scalar_time[name] / max(bars, 1) * 1e6:.1f} µs")
+    print(f"{len(files)} files, {bars:,} bars, {mismatches} array/last-bar mismatches")
+    exit(0 if mismatches == 0 else 1)
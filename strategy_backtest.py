@@ -2,6 +2,12 @@ import pandas as pd
 import numpy as np
 from logzero import logger
 from datetime import datetime
+import indicators
+import csv_cache
+import execution
+import resample
+from signals import Rules, inputs
+from trade_store import TradeStore, report
 
 # ================= STRATEGY PARAMETERS =================
 BROKERAGE_CHARGE = 90  # Fixed ₹90 per trade
@@ -11,37 +17,39 @@ SL_SHIFT_TRIGGER = 1  # Price move to start trailing SL
 SL_DIFFERENCE = 0.5  # Maintain SL = Current Price - 0.5
 ADX_THRESHOLD = 25  # ADX must be above this for a strong trend
 ADX_PERIOD = 14  # ADX Calculation Period
+ADX_SMOOTHING = "sma"  # "sma" = rolling means, "wilder" = true recursive Wilder smoothing
 
-def calculate_adx(df, period=ADX_PERIOD):
-    """Calculate ADX using Wilder's Smoothing"""
-    df['TR'] = np.maximum.reduce([
-        df['High'] - df['Low'],
-        abs(df['High'] - df['Close'].shift(1)),
-        abs(df['Low'] - df['Close'].shift(1))
-    ])
-    df['+DM'] = np.where((df['High'] - df['High'].shift(1)) > (df['Low'].shift(1) - df['Low']),
-                         df['High'] - df['High'].shift(1), 0)
-    df['-DM'] = np.where((df['Low'].shift(1) - df['Low']) > (df['High'] - df['High'].shift(1)),
-                         df['Low'].shift(1) - df['Low'], 0)
+def _trend_rules():
+    ema_5, ema_9, adx, adx_threshold = inputs("ema_5", "ema_9", "adx", "adx_threshold")
+    return Rules({"BUY": (ema_5 > ema_9) & (adx > adx_threshold)})
 
-    # Wilder's Smoothing (Rolling Mean)
-    df['TR_smooth'] = df['TR'].rolling(window=period).mean()
-    df['+DM_smooth'] = df['+DM'].rolling(window=period).mean()
-    df['-DM_smooth'] = df['-DM'].rolling(window=period).mean()
+# EMA5/EMA9/ADX entry, shared with batch_backtest.py and trade.py
+TREND_RULES = _trend_rules()
 
-    df['+DI'] = (df['+DM_smooth'] / df['TR_smooth']) * 100
-    df['-DI'] = (df['-DM_smooth'] / df['TR_smooth']) * 100
-    df['DX'] = (abs(df['+DI'] - df['-DI']) / abs(df['+DI'] + df['-DI'])) * 100
-    df['ADX'] = df['DX'].rolling(window=period).mean()
+def trend_inputs(high, low, close, volume=None, adx_threshold=ADX_THRESHOLD):
+    """Indicator arrays TREND_RULES reads, one element per bar (2-D columns work too)"""
+    adx, _, _ = indicators.adx(high, low, close, ADX_PERIOD, ADX_SMOOTHING)
+    return {"ema_5": indicators.ema(close, 5), "ema_9": indicators.ema(close, 9), "adx": adx,
+            "adx_threshold": adx_threshold}
 
-    return df
+def calculate_adx(df, period=ADX_PERIOD, smoothing=ADX_SMOOTHING):
+    """Calculate ADX (rolling-mean or true Wilder smoothing) as an array"""
+    adx, _, _ = indicators.adx(
+        df['High'].to_numpy(dtype=np.float64),
+        df['Low'].to_numpy(dtype=np.float64),
+        df['Close'].to_numpy(dtype=np.float64),
+        period, smoothing
+    )
+    return adx
 
 def calculate_indicators(df):
-    """Calculate EMA5, EMA9, and ADX"""
-    df['EMA_5'] = df['Close'].ewm(span=5, adjust=False).mean()
-    df['EMA_9'] = df['Close'].ewm(span=9, adjust=False).mean()
-    df = calculate_adx(df)
-    return df
+    """Return a copy of df with EMA5, EMA9, and ADX columns"""
+    close = df['Close'].to_numpy(dtype=np.float64)
+    return df.assign(
+        EMA_5=indicators.ema(close, 5),
+        EMA_9=indicators.ema(close, 9),
+        ADX=calculate_adx(df)
+    )
 
 def backtest_strategy(df, symbol_type="UNKNOWN"):
     """
@@ -49,6 +57,10 @@ def backtest_strategy(df, symbol_type="UNKNOWN"):
     Returns list of trades executed
     """
     df = calculate_indicators(df)
+    entry_signal = TREND_RULES.arrays({
+        "ema_5": df['EMA_5'].to_numpy(), "ema_9": df['EMA_9'].to_numpy(), "adx": df['ADX'].to_numpy(),
+        "adx_threshold": ADX_THRESHOLD,
+    })["BUY"]
     trades = []
     in_trade = False
     entry_price = 0
@@ -63,7 +75,7 @@ def backtest_strategy(df, symbol_type="UNKNOWN"):
         adx = row['ADX']
         
         # Entry Signal
-        if not in_trade and ema_5 > ema_9 and adx > ADX_THRESHOLD:
+        if not in_trade and entry_signal[i]:
             entry_price = current_price
             trailing_sl = entry_price - TRAILING_SL_OFFSET
             in_trade = True
@@ -119,6 +131,169 @@ def backtest_strategy(df, symbol_type="UNKNOWN"):
     
     return trades
 
+# ================= ARRAY BACKTEST ENGINE =================
+EXIT_SCAN_WINDOW = 256  # Bars scanned per step while looking for the SL hit
+
+def _find_exit(close, entry_index, trailing_sl_offset, sl_shift_trigger, sl_difference):
+    """
+    Find the trailing-SL exit of a trade entered at entry_index.
+    Scans forward in doubling windows so a trade only costs about its own length.
+    The scan starts on the entry bar itself: as in backtest_strategy, the entry close can
+    already move the SL (sl_shift_trigger <= 0) or hit it (trailing_sl_offset <= 0).
+    Returns (exit_index, exit_price), or (-1, nan) if the SL is never hit.
+    """
+    n = len(close)
+    entry_price = close[entry_index]
+    trigger = entry_price + sl_shift_trigger
+    trailing_sl = entry_price - trailing_sl_offset
+    start = entry_index
+    width = EXIT_SCAN_WINDOW
+
+    while start < n:
+        stop = min(n, start + width)
+        window = close[start:stop]
+        # SL only moves up on bars that cleared the trigger, so it is a running max
+        candidates = np.where(window >= trigger, window - sl_difference, -np.inf)
+        sl_path = np.maximum(np.maximum.accumulate(candidates), trailing_sl)
+        hits = np.flatnonzero(window <= sl_path)
+        if hits.size:
+            k = hits[0]
+            return start + k, sl_path[k]
+        trailing_sl = sl_path[-1]
+        start = stop
+        width *= 2
+
+    return -1, np.nan
+
+def backtest_arrays(close, ema_fast, ema_slow, adx,
+                    adx_threshold=ADX_THRESHOLD,
+                    trailing_sl_offset=TRAILING_SL_OFFSET,
+                    sl_shift_trigger=SL_SHIFT_TRIGGER,
+                    sl_difference=SL_DIFFERENCE,
+                    path=None, model=None):
+    """
+    Run the EMA/ADX entry + trailing SL exit on contiguous float64 arrays.
+    Same semantics as backtest_strategy, but loops once per trade instead of once per bar.
+    With an execution.IntrabarPath and ExecutionModel, the SL is checked against the
+    path's lows and filled per the model instead of at the close.
+    Returns (entry_idx, exit_idx, exit_price, end_of_data) arrays, one element per trade.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    signal = TREND_RULES.arrays({"ema_5": np.asarray(ema_fast), "ema_9": np.asarray(ema_slow),
+                                 "adx": np.asarray(adx), "adx_threshold": adx_threshold})["BUY"]
+    signal_idx = np.flatnonzero(signal)
+    n = len(close)
+
+    entries, exits, exit_prices, end_flags = [], [], [], []
+    pos = 0  # First bar allowed to open a new trade
+    while True:
+        k = np.searchsorted(signal_idx, pos)
+        if k >= signal_idx.size:
+            break
+        entry_index = signal_idx[k]
+        if path is None:
+            exit_index, exit_price = _find_exit(close, entry_index, trailing_sl_offset,
+                                                sl_shift_trigger, sl_difference)
+        else:
+            exit_index, exit_price = execution.trailing_stop_exit(
+                path, close, entry_index, model, trailing_sl_offset, sl_shift_trigger, sl_difference)
+        entries.append(entry_index)
+        if exit_index < 0:
+            # Still in trade at end of data
+            exits.append(n - 1)
+            exit_prices.append(close[-1] if model is None else model.market_fill(close[-1], -1))
+            end_flags.append(True)
+            break
+        exits.append(exit_index)
+        exit_prices.append(exit_price)
+        end_flags.append(False)
+        pos = exit_index + 1
+
+    return (np.array(entries, dtype=np.int64), np.array(exits, dtype=np.int64),
+            np.array(exit_prices, dtype=np.float64), np.array(end_flags, dtype=bool))
+
+def trade_arrays(df, model=None, sub_bars=None):
+    """
+    Array-engine backtest of one candle frame, as column arrays
+    model:    execution.ExecutionModel for intrabar High/Low stops, gaps and slippage
+              (None keeps the close-based fills of backtest_strategy)
+    sub_bars: optional finer candle frame for the intrabar path
+    Returns {Entry_Time, Exit_Time, Entry_Price, Exit_Price, P&L, P&L%, Candles}, one element per trade
+    """
+    df = calculate_indicators(df)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    path = None
+    if model is not None or sub_bars is not None:
+        model = model or execution.ExecutionModel()
+        path = (execution.IntrabarPath.from_bars(df) if sub_bars is None
+                else execution.IntrabarPath.from_sub_bars(df, sub_bars))
+    entries, exits, exit_prices, end_flags = backtest_arrays(
+        close,
+        df['EMA_5'].to_numpy(dtype=np.float64),
+        df['EMA_9'].to_numpy(dtype=np.float64),
+        df['ADX'].to_numpy(dtype=np.float64),
+        path=path, model=model,
+    )
+
+    times = df['Datetime'].array
+    entry_prices = close[entries] if model is None else model.market_fill(close[entries], 1)
+    return {
+        'Entry_Time': times[entries],
+        'Exit_Time': times[exits],
+        'Entry_Price': entry_prices,
+        'Exit_Price': exit_prices,
+        'P&L': (exit_prices - entry_prices) * QUANTITY - (2 * BROKERAGE_CHARGE),
+        'P&L%': ((exit_prices - entry_prices) / entry_prices) * 100,
+        'Candles': np.where(end_flags, len(df), exits) - entries,
+    }
+
+def backtest_strategy_fast(df, symbol_type="UNKNOWN"):
+    """
+    Array-engine version of backtest_strategy
+    Returns the same list of trade dicts without walking the DataFrame row by row
+    """
+    if df.empty:
+        return []
+
+    arrays = trade_arrays(df)
+    arrays['Candles'] = arrays['Candles'].tolist()
+    return [dict(zip(arrays, values)) for values in zip(*arrays.values())]
+
+def verify_fast_engine(files):
+    """Check backtest_strategy_fast against backtest_strategy on each file and report bars/sec"""
+    import time
+    import logging
+    import logzero
+
+    total_bars = 0
+    slow_time = 0.0
+    fast_time = 0.0
+    mismatches = 0
+    level = logger.level
+    logzero.loglevel(logging.WARNING)  # Keep the reference engine's per-trade logs out of the timing
+    try:
+        for file, df in zip(files, csv_cache.load_many(files)):
+            start = time.perf_counter()
+            expected = backtest_strategy(df.copy(), file)
+            slow_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = backtest_strategy_fast(df.copy(), file)
+            fast_time += time.perf_counter() - start
+
+            total_bars += len(df)
+            if expected != actual:
+                mismatches += 1
+                logger.error(f"❌ Engine mismatch on {file}: {len(expected)} vs {len(actual)} trades")
+    finally:
+        logzero.loglevel(level)
+
+    logger.info(f"Checked {len(files)} files, {total_bars} bars, {mismatches} mismatches")
+    if slow_time > 0 and fast_time > 0:
+        logger.info(f"Row loop:     {total_bars / slow_time:,.0f} bars/sec")
+        logger.info(f"Array engine: {total_bars / fast_time:,.0f} bars/sec")
+    return mismatches == 0
+
 def print_backtest_summary(trades, symbol_type):
     """Print summary statistics of backtesting"""
     logger.info("\n" + "="*70)
@@ -162,9 +337,24 @@ def print_backtest_summary(trades, symbol_type):
 
 # ================= MAIN BACKTESTING =================
 if __name__ == "__main__":
+    import argparse
     import glob
     import os
-    
+
+    parser = argparse.ArgumentParser(description="Backtest the EMA/ADX trailing-SL strategy on all CSVs")
+    parser.add_argument("--verify", action="store_true", help="Compare the array engine with the row loop")
+    parser.add_argument("--quiet", action="store_true", help="Skip per-file summaries and per-trade lines")
+    parser.add_argument("--save", metavar="DIR", help="Write the trade store here (report with trade_store.py DIR)")
+    parser.add_argument("--intrabar", action="store_true", help="Check the SL against High/Low instead of Close")
+    parser.add_argument("--slippage", type=float, default=0.0, help="Points lost per market fill (with --intrabar)")
+    parser.add_argument("--gap-fill", choices=execution.GAP_FILLS, default="open",
+                        help="Fill a gapped-through SL at the open or at the SL level")
+    parser.add_argument("--timeframes", type=int, nargs="+", default=[], metavar="MIN",
+                        help="Also backtest these intervals, derived from the --base files (e.g. 15 30)")
+    parser.add_argument("--base", default="3MIN", help="Stored interval the --timeframes are derived from")
+    args = parser.parse_args()
+    model = execution.ExecutionModel(args.slippage, args.gap_fill) if args.intrabar else None
+
     logger.info("🚀 Starting Comprehensive Strategy Backtest...\n")
     
     # Find all CSV files
@@ -176,100 +366,54 @@ if __name__ == "__main__":
     
     logger.info(f"✅ Found {len(all_files)} CSV files for backtesting\n")
     
-    # Group files by interval (3MIN, 5MIN)
-    files_3min = sorted([f for f in all_files if "3MIN" in f])
-    files_5min = sorted([f for f in all_files if "5MIN" in f])
+    # python strategy_backtest.py --verify : compare the array engine with the row loop
+    if args.verify:
+        ok = verify_fast_engine(sorted(all_files))
+        exit(0 if ok else 1)
     
-    all_results = []
+    # Parse any new or changed CSV into the binary cache once, in parallel
+    csv_cache.warm(all_files)
+    store = TradeStore()
     
-    # ================= BACKTEST 3MIN DATA =================
-    if files_3min:
-        logger.info("="*70)
-        logger.info("BACKTESTING 3-MINUTE CANDLES")
-        logger.info("="*70 + "\n")
+    # Group files by interval (3MIN, 5MIN), then any interval derived from the base files
+    stored = [("3MIN", 3), ("5MIN", 5)]
+    runs = stored + [(f"{m}MIN", m) for m in args.timeframes if m not in dict(stored).values()]
+    base_minutes = int(args.base[:-3])
+    derived = {}  # base file -> {minutes: frame}; every requested timeframe is built in one pass
+    for interval, minutes in runs:
+        derive = (interval, minutes) not in stored
+        files = sorted([f for f in all_files if f"_{args.base if derive else interval}_" in f])
+        if not files:
+            continue
+        if not args.quiet:
+            logger.info("="*70)
+            logger.info(f"BACKTESTING {minutes}-MINUTE CANDLES")
+            logger.info("="*70 + "\n")
         
-        interval_results = {"3MIN_CALL": [], "3MIN_PUT": []}
-        
-        for file in files_3min:
+        for file in files:
+            side = "CALL" if "CALL" in file else "PUT" if "PUT" in file else None
+            if side is None:
+                continue
             try:
-                df = pd.read_csv(file)
-                df['Datetime'] = pd.to_datetime(df['Datetime'])
+                df = csv_cache.load_csv(file)
+                if derive:
+                    if file not in derived:
+                        derived[file] = resample.timeframes(df, args.timeframes, base_minutes)
+                    df = derived[file][minutes]
+                label = f"{interval} {os.path.basename(file)[:-4]}"
+                arrays = trade_arrays(df, model)
+                store.add(label, *arrays.values(), group=f"{interval}_{side}", bars=len(df))
                 
-                if "CALL" in file:
-                    label = f"3MIN {os.path.basename(file)[:-4]}"
-                    trades = backtest_strategy(df.copy(), label)
-                    interval_results["3MIN_CALL"].extend(trades)
-                    print_backtest_summary(trades, label)
-                    
-                elif "PUT" in file:
-                    label = f"3MIN {os.path.basename(file)[:-4]}"
-                    trades = backtest_strategy(df.copy(), label)
-                    interval_results["3MIN_PUT"].extend(trades)
+                if not args.quiet:
+                    trades = [dict(zip(arrays, values)) for values in zip(*arrays.values())]
                     print_backtest_summary(trades, label)
                     
             except Exception as e:
                 logger.error(f"❌ Error processing {file}: {e}")
-        
-        all_results.append(interval_results)
     
-    # ================= BACKTEST 5MIN DATA =================
-    if files_5min:
-        logger.info("="*70)
-        logger.info("BACKTESTING 5-MINUTE CANDLES")
-        logger.info("="*70 + "\n")
-        
-        interval_results = {"5MIN_CALL": [], "5MIN_PUT": []}
-        
-        for file in files_5min:
-            try:
-                df = pd.read_csv(file)
-                df['Datetime'] = pd.to_datetime(df['Datetime'])
-                
-                if "CALL" in file:
-                    label = f"5MIN {os.path.basename(file)[:-4]}"
-                    trades = backtest_strategy(df.copy(), label)
-                    interval_results["5MIN_CALL"].extend(trades)
-                    print_backtest_summary(trades, label)
-                    
-                elif "PUT" in file:
-                    label = f"5MIN {os.path.basename(file)[:-4]}"
-                    trades = backtest_strategy(df.copy(), label)
-                    interval_results["5MIN_PUT"].extend(trades)
-                    print_backtest_summary(trades, label)
-                    
-            except Exception as e:
-                logger.error(f"❌ Error processing {file}: {e}")
-        
-        all_results.append(interval_results)
+    if args.save:
+        store.save(args.save)
+        logger.info(f"✅ Trade store saved to {args.save}")
     
     # ================= GRAND SUMMARY =================
-    logger.info("\n" + "="*70)
-    logger.info("GRAND SUMMARY - ALL DATASETS")
-    logger.info("="*70)
-    
-    total_all_trades = 0
-    total_all_pnl = 0
-    
-    for interval_results in all_results:
-        for interval_type, trades in interval_results.items():
-            if trades:
-                interval_total = len(trades)
-                interval_pnl = sum([t['P&L'] for t in trades])
-                total_all_trades += interval_total
-                total_all_pnl += interval_pnl
-                
-                trades_df = pd.DataFrame(trades)
-                win_rate = (len(trades_df[trades_df['P&L'] > 0]) / len(trades) * 100) if len(trades) > 0 else 0
-                
-                logger.info(f"\n{interval_type}:")
-                logger.info(f"  Total Trades: {interval_total}")
-                logger.info(f"  Win Rate: {win_rate:.2f}%")
-                logger.info(f"  Total P&L: ₹{interval_pnl:.2f}")
-                logger.info(f"  Avg P&L per Trade: ₹{interval_pnl/interval_total:.2f}")
-    
-    logger.info("\n" + "-"*70)
-    logger.info(f"📊 OVERALL RESULTS:")
-    logger.info(f"   Total Trades Across All Datasets: {total_all_trades}")
-    logger.info(f"   Overall P&L: ₹{total_all_pnl:.2f}")
-    logger.info(f"   Avg P&L per Trade: ₹{total_all_pnl/total_all_trades:.2f}" if total_all_trades > 0 else "   No trades executed")
-    logger.info("="*70)
+    report(store)
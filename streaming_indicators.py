@@ -0,0 +1,367 @@
+import math
+from collections import deque
+
+import numpy as np
+
+# =========================
+# STREAMING INDICATORS
+# =========================
+# Stateful O(1)-per-bar versions of the Ai_bot indicator functions.
+# update() commits a closed candle; peek() returns the provisional value for the
+# forming candle (e.g. priced at the current LTP) without changing any state.
+# Values match the batch kernels in indicators.py (NaN until warmed up).
+
+NAN = float("nan")
+
+
+def _div(a, b):
+    """a / b with pandas semantics: x/0 -> +-inf, 0/0 -> NaN"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(np.float64(a) / np.float64(b))
+
+
+class RunningSum:
+    """
+    Sum of the last `size` values, updated on append and evict instead of re-summed.
+    Kahan-compensated, and resynced with math.fsum every `size` appends so rounding
+    cannot drift over a long session. Any NaN in the window makes the sum NaN, as fsum does.
+    """
+
+    def __init__(self, size):
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.carry = 0.0  # Kahan compensation: the low-order bits lost from total
+        self.nans = 0
+        self.appends = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def _add(self, x):
+        y = x - self.carry
+        t = self.total + y
+        self.carry = (t - self.total) - y
+        self.total = t
+
+    def _resync(self):
+        self.total = math.fsum(x for x in self.values if not math.isnan(x))
+        self.carry = 0.0
+
+    def append(self, x):
+        if len(self.values) == self.values.maxlen:
+            old = self.values[0]
+            if math.isnan(old):
+                self.nans -= 1
+            else:
+                self._add(-old)
+        self.values.append(x)
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            self._add(x)
+        self.appends += 1
+        if self.appends % self.values.maxlen == 0:
+            self._resync()
+
+    def sum(self):
+        return NAN if self.nans else self.total
+
+    def peek(self, x):
+        """The sum after append(x), without appending"""
+        nans, total = self.nans, self.total
+        if len(self.values) == self.values.maxlen:
+            old = self.values[0]
+            if math.isnan(old):
+                nans -= 1
+            else:
+                total -= old
+        return NAN if nans or math.isnan(x) else total + x
+
+
+class RollingMean:
+    """Simple moving average over a fixed window (pandas rolling(n).mean())"""
+
+    def __init__(self, period):
+        self.period = period
+        self.window = RunningSum(period)
+
+    def update(self, x):
+        self.window.append(x)
+        return self.window.sum() / self.period if len(self.window) == self.period else NAN
+
+    def peek(self, x):
+        if len(self.window) + 1 < self.period:
+            return NAN
+        return self.window.peek(x) / self.period
+
+
+class WilderMean:
+    """Wilder smoothing (indicators.wilder): SMA seed, then y += (x - y) / period; leading NaNs skipped"""
+
+    def __init__(self, period):
+        self.period = period
+        self.seed = []
+        self.value = NAN
+
+    def _step(self, x):
+        if not math.isnan(self.value):
+            return self.seed, self.value + (x - self.value) / self.period
+        if math.isnan(x):
+            return self.seed, NAN
+        seed = self.seed + [x]
+        value = math.fsum(seed) / self.period if len(seed) == self.period else NAN
+        return seed, value
+
+    def update(self, x):
+        self.seed, self.value = self._step(x)
+        if not math.isnan(self.value):
+            self.seed = []
+        return self.value
+
+    def peek(self, x):
+        return self._step(x)[1]
+
+
+def smoother(period, smoothing="sma"):
+    """Streaming counterpart of indicators._smooth"""
+    if smoothing == "wilder":
+        return WilderMean(period)
+    if smoothing == "sma":
+        return RollingMean(period)
+    raise ValueError(f"Unknown smoothing: {smoothing}")
+
+
+class StreamingEMA:
+    """Exponential moving average matching pandas ewm(span=...).mean()"""
+
+    def __init__(self, span, adjust=True):
+        self.alpha = 2.0 / (span + 1.0)
+        self.adjust = adjust
+        self.num = 0.0
+        self.den = 0.0
+        self.value = NAN
+
+    def _step(self, x):
+        decay = 1.0 - self.alpha
+        if self.adjust:
+            num = x + decay * self.num
+            den = 1.0 + decay * self.den
+            return num, den, num / den
+        if math.isnan(self.value):
+            return 0.0, 0.0, x
+        value = self.alpha * x + decay * self.value
+        return 0.0, 0.0, value
+
+    def update(self, x):
+        self.num, self.den, self.value = self._step(x)
+        return self.value
+
+    def peek(self, x):
+        return self._step(x)[2]
+
+
+class StreamingMACD:
+    """MACD line, signal line and the two EMAs, as returned by calculate_macd"""
+
+    def __init__(self, short=12, long=26, signal=9):
+        self.ema_short = StreamingEMA(short)
+        self.ema_long = StreamingEMA(long)
+        self.signal = StreamingEMA(signal)
+
+    def update(self, close):
+        ema_s = self.ema_short.update(close)
+        ema_l = self.ema_long.update(close)
+        macd = ema_s - ema_l
+        return macd, self.signal.update(macd), ema_s, ema_l
+
+    def peek(self, close):
+        ema_s = self.ema_short.peek(close)
+        ema_l = self.ema_long.peek(close)
+        macd = ema_s - ema_l
+        return macd, self.signal.peek(macd), ema_s, ema_l
+
+
+class StreamingRSI:
+    """RSI over smoothed gains and losses, as in indicators.rsi"""
+
+    def __init__(self, period=14, smoothing="sma"):
+        self.gain = smoother(period, smoothing)
+        self.loss = smoother(period, smoothing)
+        self.prev_close = None
+
+    @staticmethod
+    def _rsi(gain, loss):
+        return 100 - (100 / (1 + _div(gain, loss)))
+
+    def _delta(self, close):
+        return NAN if self.prev_close is None else close - self.prev_close
+
+    def update(self, close):
+        delta = self._delta(close)
+        gain = self.gain.update(max(delta, 0.0) if delta == delta else NAN)
+        loss = self.loss.update(-min(delta, 0.0) if delta == delta else NAN)
+        self.prev_close = close
+        return self._rsi(gain, loss)
+
+    def peek(self, close):
+        delta = self._delta(close)
+        gain = self.gain.peek(max(delta, 0.0) if delta == delta else NAN)
+        loss = self.loss.peek(-min(delta, 0.0) if delta == delta else NAN)
+        return self._rsi(gain, loss)
+
+
+def _true_range(high, low, prev_close):
+    if prev_close is None:
+        return high - low
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+class StreamingATR:
+    """Smoothed true range, as in indicators.atr"""
+
+    def __init__(self, period=14, smoothing="sma"):
+        self.tr = smoother(period, smoothing)
+        self.prev_close = None
+
+    def update(self, high, low, close):
+        atr = self.tr.update(_true_range(high, low, self.prev_close))
+        self.prev_close = close
+        return atr
+
+    def peek(self, high, low, close):
+        return self.tr.peek(_true_range(high, low, self.prev_close))
+
+
+class StreamingADX:
+    """ADX from smoothed TR/+DM/-DM and DX, as in indicators.adx"""
+
+    def __init__(self, period=14, smoothing="sma"):
+        self.tr = smoother(period, smoothing)
+        self.plus_dm = smoother(period, smoothing)
+        self.minus_dm = smoother(period, smoothing)
+        self.dx = smoother(period, smoothing)
+        self.prev = None  # (high, low, close) of the last closed bar
+
+    def _inputs(self, high, low):
+        if self.prev is None:
+            return high - low, 0.0, 0.0
+        prev_high, prev_low, prev_close = self.prev
+        up = high - prev_high
+        down = prev_low - low
+        plus_dm = up if (up > down and up > 0) else 0.0
+        minus_dm = down if (down > up and down > 0) else 0.0
+        return _true_range(high, low, prev_close), plus_dm, minus_dm
+
+    @staticmethod
+    def _dx(atr, plus_dm, minus_dm):
+        plus_di = 100 * _div(plus_dm, atr)
+        minus_di = 100 * _div(minus_dm, atr)
+        return _div(abs(plus_di - minus_di), plus_di + minus_di) * 100
+
+    def update(self, high, low, close):
+        tr, plus_dm, minus_dm = self._inputs(high, low)
+        dx = self._dx(self.tr.update(tr), self.plus_dm.update(plus_dm), self.minus_dm.update(minus_dm))
+        self.prev = (high, low, close)
+        return self.dx.update(dx)
+
+    def peek(self, high, low, close):
+        tr, plus_dm, minus_dm = self._inputs(high, low)
+        dx = self._dx(self.tr.peek(tr), self.plus_dm.peek(plus_dm), self.minus_dm.peek(minus_dm))
+        return self.dx.peek(dx)
+
+
+class RollingVWAP:
+    """Volume-weighted close over the last `lookback` candles, as in indicators.rolling_vwap"""
+
+    def __init__(self, lookback=60):
+        self.pv = RunningSum(lookback)
+        self.vol = RunningSum(lookback)
+
+    @staticmethod
+    def _vwap(pv, total):
+        return pv / total if total > 0 else None
+
+    def update(self, close, volume):
+        self.pv.append(close * volume)
+        self.vol.append(volume)
+        return self._vwap(self.pv.sum(), self.vol.sum())
+
+    def peek(self, close, volume):
+        return self._vwap(self.pv.peek(close * volume), self.vol.peek(volume))
+
+
+# =========================
+# PER-SYMBOL BUNDLE
+# =========================
+
+class IndicatorState:
+    """
+    All indicators the scalp loop needs for one symbol.
+    Seed it from history with sync(df); afterwards sync() only feeds the candles
+    that closed since the last call, and snapshot(ltp) prices the forming candle.
+    """
+
+    def __init__(self, rsi_period=14, atr_period=14, adx_period=14,
+                 macd_short=12, macd_long=26, macd_signal=9, vwap_lookback=60, smoothing="sma"):
+        self.rsi = StreamingRSI(rsi_period, smoothing)
+        self.atr = StreamingATR(atr_period, smoothing)
+        self.adx = StreamingADX(adx_period, smoothing)
+        self.macd = StreamingMACD(macd_short, macd_long, macd_signal)
+        self.vwap = RollingVWAP(vwap_lookback)
+        self.last_time = None  # Timestamp of the last committed candle
+        self.bars = 0
+        self.forming = None  # (open, high, low, close, volume) of the open candle
+
+    def update(self, high, low, close, volume, time=None):
+        """Commit one closed candle (time, if given, becomes last_time)"""
+        self.rsi.update(close)
+        self.atr.update(high, low, close)
+        self.adx.update(high, low, close)
+        self.macd.update(close)
+        self.vwap.update(close, volume)
+        self.bars += 1
+        if time is not None:
+            self.last_time = time
+
+    def set_forming(self, open, high, low, close, volume):
+        """Replace the forming candle, e.g. from a tick aggregator"""
+        self.forming = (float(open), float(high), float(low), float(close), float(volume))
+
+    def sync(self, df):
+        """
+        Feed candles from a fetch_candles() frame that closed after last_time.
+        The last row is treated as the still-forming candle.
+        """
+        if df is None or df.empty:
+            return 0
+        closed = df.iloc[:-1]
+        if self.last_time is not None:
+            closed = closed[closed.index > self.last_time]
+        for high, low, close, volume in zip(closed["high"].to_numpy(), closed["low"].to_numpy(),
+                                            closed["close"].to_numpy(), closed["volume"].to_numpy()):
+            self.update(float(high), float(low), float(close), float(volume))
+        if len(closed):
+            self.last_time = closed.index[-1]
+        last = df.iloc[-1]
+        self.forming = (float(last["open"]), float(last["high"]), float(last["low"]),
+                        float(last["close"]), float(last["volume"]))
+        return len(closed)
+
+    def snapshot(self, ltp=None):
+        """Indicator values with the forming candle priced at ltp (or its own close)"""
+        if self.forming is None:
+            return None
+        _, high, low, close, volume = self.forming
+        if ltp is not None:
+            high, low, close = max(high, ltp), min(low, ltp), ltp
+        macd, signal, ema_s, ema_l = self.macd.peek(close)
+        return {
+            "vwap": self.vwap.peek(close, volume),
+            "rsi": self.rsi.peek(close),
+            "macd": macd,
+            "signal": signal,
+            "ema_s": ema_s,
+            "ema_l": ema_l,
+            "atr": self.atr.peek(high, low, close),
+            "adx": self.adx.peek(high, low, close),
+        }
@@ -0,0 +1,122 @@
+import pandas as pd
+import pytest
+
+import backfill
+from backfill import RateLimiter, day_key, run_backfill, split_windows
+from candle_store import CandleStore
+from fake_smartapi import FakeSmartConnect
+
+INSTRUMENTS = [{"symbol": "SIM1", "token": "1001"}, {"symbol": "SIM2", "token": "1002"}]
+
+
+def no_sleep(seconds):
+    pass
+
+
+def backfill_range(api, store, start, end, today="2026-03-31", **kwargs):
+    kwargs.setdefault("rate", 1000)
+    return run_backfill(api, INSTRUMENTS, start, end, ["FIVE_MINUTE"], store=store, workers=2,
+                        sleep=no_sleep, today=today, **kwargs)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CandleStore(str(tmp_path / "store"))
+
+
+def test_split_windows_respects_api_limit_and_gaps():
+    days = pd.bdate_range("2026-01-01", "2026-03-31")
+    windows = split_windows(days, "ONE_MINUTE")
+    assert [d for _, _, group in windows for d in group] == list(days)
+    for _, _, group in windows:
+        assert group[-1] - group[0] < pd.Timedelta(days=backfill.MAX_DAYS_PER_REQUEST["ONE_MINUTE"])
+    # A fetched day in the middle splits the window around it
+    missing = [d for d in pd.bdate_range("2026-02-02", "2026-02-13") if d != pd.Timestamp("2026-02-05")]
+    assert [(f, t) for f, t, _ in split_windows(missing, "FIVE_MINUTE")] == [
+        ("2026-02-02 09:15", "2026-02-04 15:30"), ("2026-02-06 09:15", "2026-02-13 15:30")]
+
+
+def test_backfill_stores_every_day(store):
+    api = FakeSmartConnect()
+    summary = backfill_range(api, store, "2026-02-02", "2026-02-06")
+    assert summary["failed"] == 0 and summary["fetched"] == 2
+    df = store.read("NFO", "1001", "FIVE_MINUTE")
+    assert df["Datetime"].dt.date.nunique() == 5
+    assert len(df) == 5 * 75
+
+
+def test_resume_with_a_different_start_only_fetches_new_days(store):
+    api = FakeSmartConnect()
+    backfill_range(api, store, "2026-02-02", "2026-02-27")
+    calls = api.calls["getCandleData"]
+
+    summary = backfill_range(api, store, "2026-02-10", "2026-02-20")
+    assert summary["fetched"] == 0 and summary["skipped"] == 2 * 9
+    assert api.calls["getCandleData"] == calls
+
+    summary = backfill_range(api, store, "2026-01-26", "2026-02-27")
+    assert summary["fetched"] == 2  # One window per instrument, for the new week only
+    requested = pd.Timestamp(store.read("NFO", "1001", "FIVE_MINUTE")["Datetime"].iloc[0]).date()
+    assert str(requested) == "2026-01-26"
+
+
+def test_current_session_is_never_marked_done(store, tmp_path):
+    api = FakeSmartConnect()
+    backfill_range(api, store, "2026-02-02", "2026-02-06", today="2026-02-06")
+    manifest = backfill.BackfillManifest(str(tmp_path / "store" / backfill.MANIFEST_NAME))
+    assert day_key("NFO", "1001", "FIVE_MINUTE", "2026-02-05") in manifest
+    assert day_key("NFO", "1001", "FIVE_MINUTE", "2026-02-06") not in manifest
+
+    # The next run fetches only today again, which later completes it
+    summary = backfill_range(api, store, "2026-02-02", "2026-02-06", today="2026-02-06")
+    assert summary["fetched"] == 2 and summary["skipped"] == 2 * 4
+    backfill_range(api, store, "2026-02-02", "2026-02-06", today="2026-02-09")
+    assert day_key("NFO", "1001", "FIVE_MINUTE", "2026-02-06") in backfill.BackfillManifest(manifest.path)
+
+
+def test_days_after_today_are_not_requested(store):
+    api = FakeSmartConnect()
+    summary = backfill_range(api, store, "2026-02-02", "2026-02-13", today="2026-02-04")
+    assert summary["fetched"] == 2
+    assert store.read("NFO", "1001", "FIVE_MINUTE")["Datetime"].dt.date.nunique() == 3
+
+
+def test_failed_calls_are_retried(store):
+    api = FakeSmartConnect(fail_rate=0.4, seed=3)
+    summary = backfill_range(api, store, "2026-02-02", "2026-02-27", retries=20)
+    assert summary["failed"] == 0
+    assert api.calls["getCandleData"] > summary["fetched"]
+    assert store.read("NFO", "1002", "FIVE_MINUTE")["Datetime"].dt.date.nunique() == 20
+
+
+def test_exhausted_retries_leave_days_for_the_next_run(store):
+    summary = backfill_range(FakeSmartConnect(fail_rate=1.0), store, "2026-02-02", "2026-02-06", retries=2)
+    assert summary["failed"] == 2 and summary["fetched"] == 0
+    summary = backfill_range(FakeSmartConnect(), store, "2026-02-02", "2026-02-06")
+    assert summary["fetched"] == 2 and summary["skipped"] == 0
+
+
+def test_rate_limiter_spaces_requests():
+    now = [0.0]
+    limiter = RateLimiter(rate=4, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+    for _ in range(12):
+        limiter.acquire()
+    # A burst of 4, then one every 1/4 s
+    assert now[0] == pytest.approx(2.0)
+
+
+def test_backfill_requests_go_through_the_rate_limit(store):
+    now = [0.0]
+    stamps = []
+
+    class TimedApi(FakeSmartConnect):
+        def getCandleData(self, params):
+            stamps.append(now[0])
+            return super().getCandleData(params)
+
+    advance = lambda s: now.__setitem__(0, now[0] + s)
+    run_backfill(TimedApi(), INSTRUMENTS + INSTRUMENTS[:1], "2026-02-02", "2026-03-13", ["ONE_MINUTE"], store=store,
+                 workers=1, rate=2, sleep=advance, clock=lambda: now[0], today="2026-03-31")
+    # 3 instruments x 2 thirty-day windows at 2 requests/s after a burst of 2
+    assert len(stamps) == 6
+    assert stamps[-1] == pytest.approx((6 - 2) / 2)
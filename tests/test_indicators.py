@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+
+
+@pytest.fixture
+def ohlcv():
+    rng = np.random.default_rng(7)
+    close = 200 + np.cumsum(rng.normal(0, 1.5, 300))
+    high = close + rng.uniform(0, 3, 300)
+    low = close - rng.uniform(0, 3, 300)
+    volume = rng.integers(100, 10_000, 300).astype(np.float64)
+    return high, low, close, volume
+
+
+def wilder_reference(x, period):
+    out = np.full(len(x), np.nan)
+    out[period - 1] = np.mean(x[:period])
+    for i in range(period, len(x)):
+        out[i] = out[i - 1] + (x[i] - out[i - 1]) / period
+    return out
+
+
+def pandas_true_range(high, low, close):
+    prev = pd.Series(close).shift()
+    h, l = pd.Series(high), pd.Series(low)
+    return pd.concat([h - l, (h - prev).abs(), (l - prev).abs()], axis=1).max(axis=1)
+
+
+# ----- smoothing -----
+
+@pytest.mark.parametrize("period", [1, 5, 14])
+def test_sma_matches_pandas_rolling(ohlcv, period):
+    close = ohlcv[2]
+    expected = pd.Series(close).rolling(period).mean().to_numpy()
+    np.testing.assert_allclose(indicators.sma(close, period), expected, equal_nan=True)
+
+
+@pytest.mark.parametrize("adjust", [False, True])
+@pytest.mark.parametrize("span", [5, 9, 26])
+def test_ema_matches_pandas_ewm(ohlcv, span, adjust):
+    close = ohlcv[2]
+    expected = pd.Series(close).ewm(span=span, adjust=adjust).mean().to_numpy()
+    np.testing.assert_allclose(indicators.ema(close, span, adjust=adjust), expected, rtol=1e-10)
+
+
+def test_wilder_hand_computed_values():
+    out = indicators.wilder(np.array([1.0, 2.0, 3.0, 4.0, 5.0]), 3)
+    assert np.isnan(out[:2]).all()
+    np.testing.assert_allclose(out[2:], [2.0, 2.0 + 2.0 / 3.0, 2.0 + 2.0 / 3.0 + (5.0 - 2.0 - 2.0 / 3.0) / 3.0])
+
+
+def test_wilder_matches_recursive_reference(ohlcv):
+    close = ohlcv[2]
+    np.testing.assert_allclose(indicators.wilder(close, 14), wilder_reference(close, 14), equal_nan=True)
+
+
+def test_wilder_starts_after_leading_nans(ohlcv):
+    close = ohlcv[2].copy()
+    close[:4] = np.nan
+    out = indicators.wilder(close, 14)
+    assert np.isnan(out[:4 + 13]).all()
+    np.testing.assert_allclose(out[4:], wilder_reference(close[4:], 14), equal_nan=True)
+
+
+def test_short_series_is_all_nan():
+    assert np.isnan(indicators.sma(np.arange(3.0), 5)).all()
+    assert np.isnan(indicators.wilder(np.arange(3.0), 5)).all()
+
+
+# ----- trend / volatility -----
+
+@pytest.mark.parametrize("smoothing", ["sma", "wilder"])
+def test_atr_matches_pandas(ohlcv, smoothing):
+    high, low, close, _ = ohlcv
+    tr = pandas_true_range(high, low, close).to_numpy()
+    expected = (pd.Series(tr).rolling(14).mean().to_numpy() if smoothing == "sma"
+                else wilder_reference(tr, 14))
+    out = indicators.atr(high, low, close, 14, smoothing)
+    np.testing.assert_allclose(out, expected, equal_nan=True)
+    assert np.isnan(out[:13]).all() and not np.isnan(out[13:]).any()
+
+
+def test_adx_matches_pandas_rolling(ohlcv):
+    high, low, close, _ = ohlcv
+    h, l = pd.Series(high), pd.Series(low)
+    up, down = h.diff(), -l.diff()
+    plus_dm = pd.Series(np.where((up > down) & (up > 0), up, 0.0))
+    minus_dm = pd.Series(np.where((down > up) & (down > 0), down, 0.0))
+    tr = pandas_true_range(high, low, close).rolling(14).mean()
+    plus_di = 100 * plus_dm.rolling(14).mean() / tr
+    minus_di = 100 * minus_dm.rolling(14).mean() / tr
+    dx = (plus_di - minus_di).abs() / (plus_di + minus_di).abs() * 100
+    expected = dx.rolling(14).mean().to_numpy()
+
+    adx, pdi, mdi = indicators.adx(high, low, close, 14, "sma")
+    np.testing.assert_allclose(adx, expected, equal_nan=True)
+    np.testing.assert_allclose(pdi, plus_di.to_numpy(), equal_nan=True)
+    np.testing.assert_allclose(mdi, minus_di.to_numpy(), equal_nan=True)
+    assert np.isnan(adx[:26]).all() and not np.isnan(adx[26:]).any()
+
+
+# ----- momentum -----
+
+def test_rsi_matches_pandas_rolling(ohlcv):
+    close = pd.Series(ohlcv[2])
+    delta = close.diff()
+    gain = delta.clip(lower=0).rolling(14).mean()
+    loss = (-delta.clip(upper=0)).rolling(14).mean()
+    expected = (100 - 100 / (1 + gain / loss)).to_numpy()
+    out = indicators.rsi(ohlcv[2], 14, "sma")
+    np.testing.assert_allclose(out, expected, equal_nan=True)
+    assert np.isnan(out[:14]).all()
+
+
+def test_rsi_wilder_hand_computed_values():
+    close = np.array([10.0, 11.0, 10.5, 12.0, 11.0, 13.0])
+    # Gains 1, 0, 1.5, 0, 2 and losses 0, .5, 0, 1, 0; Wilder seed over the first 3
+    gain = [2.5 / 3]
+    loss = [0.5 / 3]
+    for g, l in [(0.0, 1.0), (2.0, 0.0)]:
+        gain.append(gain[-1] + (g - gain[-1]) / 3)
+        loss.append(loss[-1] + (l - loss[-1]) / 3)
+    expected = [100 - 100 / (1 + g / l) for g, l in zip(gain, loss)]
+    out = indicators.rsi(close, 3, "wilder")
+    assert np.isnan(out[:3]).all()
+    np.testing.assert_allclose(out[3:], expected)
+
+
+def test_macd_matches_pandas_ewm(ohlcv):
+    close = pd.Series(ohlcv[2])
+    fast = close.ewm(span=12, adjust=True).mean()
+    slow = close.ewm(span=26, adjust=True).mean()
+    line = fast - slow
+    signal = line.ewm(span=9, adjust=True).mean()
+    for got, want in zip(indicators.macd(ohlcv[2], 12, 26, 9), (line, signal, fast, slow)):
+        np.testing.assert_allclose(got, want.to_numpy(), rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("lookback", [1, 20, 60])
+def test_rolling_vwap_matches_pandas(ohlcv, lookback):
+    _, _, close, volume = ohlcv
+    c, v = pd.Series(close), pd.Series(volume)
+    expected = ((c * v).rolling(lookback, min_periods=1).sum() / v.rolling(lookback, min_periods=1).sum()).to_numpy()
+    np.testing.assert_allclose(indicators.rolling_vwap(close, volume, lookback), expected, rtol=1e-10)
+
+
+def test_rolling_vwap_zero_volume_is_nan():
+    out = indicators.rolling_vwap(np.array([1.0, 2.0, 3.0]), np.zeros(3), 2)
+    assert np.isnan(out).all()
+
+
+# ----- 2-D inputs -----
+
+def test_2d_columns_match_1d_with_late_starts(ohlcv):
+    high, low, close, volume = ohlcv
+    shifts = [0, 7, 40]
+    def stack(x):
+        out = np.full((len(x), len(shifts)), np.nan)
+        for k, shift in enumerate(shifts):
+            out[shift:, k] = x[:len(x) - shift]
+        return out
+    H, L, C, V = (stack(x) for x in (high, low, close, volume))
+    cases = [
+        (lambda h, l, c, v: indicators.sma(c, 10)),
+        (lambda h, l, c, v: indicators.ema(c, 9)),
+        (lambda h, l, c, v: indicators.ema(c, 9, adjust=True)),
+        (lambda h, l, c, v: indicators.wilder(c, 14)),
+        (lambda h, l, c, v: indicators.atr(h, l, c, 14, "wilder")),
+        (lambda h, l, c, v: indicators.adx(h, l, c, 14, "sma")[0]),
+        (lambda h, l, c, v: indicators.rsi(c, 14, "wilder")),
+        (lambda h, l, c, v: indicators.macd(c)[1]),
+        (lambda h, l, c, v: indicators.rolling_vwap(c, v, 60)),
+    ]
+    for fn in cases:
+        matrix = fn(H, L, C, V)
+        assert matrix.shape == H.shape
+        for k, shift in enumerate(shifts):
+            n = len(close) - shift
+            column = fn(high[:n], low[:n], close[:n], volume[:n])
+            assert np.isnan(matrix[:shift, k]).all()
+            np.testing.assert_allclose(matrix[shift:, k], column, rtol=1e-9, atol=1e-9, equal_nan=True)
@@ -0,0 +1,21 @@
+import math
+
+import numpy as np
+import pytest
+
+import scalp_strategy as scalp
+
+
+@pytest.mark.parametrize("side", [scalp.LONG, scalp.SHORT])
+@pytest.mark.parametrize("atr", [0.0, 1.0, 7.5, math.nan])
+def test_sl_tp_levels_match_the_scalar_formula(side, atr):
+    # Python's max keeps MIN_SL_POINTS for a NaN ATR instead of propagating it
+    sl_points = max(scalp.MIN_SL_POINTS, atr * scalp.ATR_SL_MULTIPLIER)
+    sl, tp = scalp.sl_tp_levels(100.0, side, atr)
+    assert sl == pytest.approx(100.0 - side * sl_points)
+    assert tp == pytest.approx(100.0 + side * sl_points * scalp.TP_SL_RATIO)
+
+
+def test_sl_tp_levels_never_nan_for_arrays():
+    sl, tp = scalp.sl_tp_levels(np.full(3, 100.0), np.array([1, -1, 1]), np.array([np.nan, 2.0, np.nan]))
+    assert np.isfinite(sl).all() and np.isfinite(tp).all()
@@ -0,0 +1,120 @@
+import threading
+
+import pytest
+
+from sentiment import SentimentService, StubBackend, underlying_of
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def service(backend, clock, **kwargs):
+    return SentimentService(backend, ttl=300, clock=clock, **kwargs)
+
+
+def settle(svc):
+    """Wait for every scheduled refresh"""
+    with svc._lock:
+        futures = list(svc.inflight.values())
+    for future in futures:
+        future.result()
+
+
+def test_underlying_of_option_symbols():
+    assert underlying_of("BANKNIFTY27MAR2551700PE") == "BANKNIFTY"
+    assert underlying_of("nifty06feb2625950ce") == "NIFTY"
+    assert underlying_of("M&M") == "M&M"
+
+
+def test_cold_key_answers_neu_at_once_and_refreshes_in_the_background(clock):
+    release = threading.Event()
+    backend = StubBackend(lambda underlying: release.wait(5) and "POS")
+    svc = service(backend, clock)
+    assert svc.get("NIFTY06FEB2625950CE") == "NEU"  # Does not wait for the slow backend
+    release.set()
+    settle(svc)
+    assert svc.get("NIFTY06FEB2626000PE") == "POS"
+    assert backend.calls == 1
+    svc.shutdown()
+
+
+def test_fresh_entry_is_not_refetched_until_the_ttl_expires(clock):
+    answers = iter(["POS", "NEG"])
+    backend = StubBackend(lambda underlying: next(answers))
+    svc = service(backend, clock)
+    assert svc.get("NIFTY", wait=True) == "POS"
+    clock.now += 299
+    assert svc.get("NIFTY") == "POS"
+    assert backend.calls == 1
+    clock.now += 2
+    assert svc.get("NIFTY") == "POS"  # Stale value served while the refresh runs
+    settle(svc)
+    assert backend.calls == 2
+    assert svc.get("NIFTY") == "NEG"
+    svc.shutdown()
+
+
+def test_concurrent_requests_for_one_underlying_share_one_call(clock):
+    release = threading.Event()
+    backend = StubBackend(lambda underlying: release.wait(5) and "NEG")
+    svc = service(backend, clock, workers=4)
+    # Every strike of the underlying asks while the first call is still in flight
+    assert [svc.get(f"BANKNIFTY27MAR25{strike}CE") for strike in range(51000, 52000, 100)] == ["NEU"] * 10
+    assert list(svc.inflight) == ["BANKNIFTY"]
+    results = []
+    threads = [threading.Thread(target=lambda k=k: results.append(svc.get(f"BANKNIFTY27MAR2551{k}00PE", wait=True)))
+               for k in range(8)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["NEG"] * 8
+    assert backend.calls == 1
+    svc.shutdown()
+
+
+def test_least_recently_used_underlyings_are_evicted(clock):
+    backend = StubBackend({"A": "POS", "B": "NEG", "C": "POS"})
+    svc = service(backend, clock, max_entries=2)
+    svc.get("A", wait=True)
+    svc.get("B", wait=True)
+    svc.get("A")  # A is now the most recently used
+    svc.get("C", wait=True)
+    assert list(svc.cache) == ["A", "C"]
+    assert svc.get("B") == "NEU"  # Evicted: cold again, and refetched
+    settle(svc)
+    assert backend.calls == 4
+    svc.shutdown()
+
+
+def test_backend_error_keeps_the_last_value(clock):
+    def answer(underlying):
+        if backend.calls > 1:
+            raise RuntimeError("quota exceeded")
+        return "POS"
+
+    backend = StubBackend(answer)
+    svc = service(backend, clock)
+    assert svc.get("NIFTY", wait=True) == "POS"
+    clock.now += 301
+    assert svc.get("NIFTY", wait=True) == "POS"
+    assert backend.calls == 2
+    assert not svc.inflight  # A later get() can retry
+    svc.shutdown()
+
+
+def test_unexpected_reply_counts_as_neutral(clock):
+    svc = service(StubBackend({"NIFTY": " bullish\n"}), clock)
+    assert svc.get("NIFTY", wait=True) == "NEU"
+    svc.shutdown()
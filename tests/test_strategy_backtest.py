@@ -0,0 +1,101 @@
+import logging
+
+import logzero
+import numpy as np
+import pandas as pd
+import pytest
+
+import strategy_backtest as sb
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    level = sb.logger.level
+    logzero.loglevel(logging.WARNING)
+    yield
+    logzero.loglevel(level)
+
+
+def candles(seed, bars=1_500):
+    rng = np.random.default_rng(seed)
+    # Alternating trends so the EMA/ADX entry fires often
+    drift = np.repeat(rng.choice([-0.6, 0.6], bars // 50 + 1), 50)[:bars]
+    close = 200 + np.cumsum(drift + rng.normal(0, 1.5, bars))
+    return pd.DataFrame({
+        "Datetime": pd.date_range("2026-01-05 09:15", periods=bars, freq="min"),
+        "High": close + rng.uniform(0, 2, bars),
+        "Low": close - rng.uniform(0, 2, bars),
+        "Close": close,
+    })
+
+
+def array_trades(df, offset, trigger, difference):
+    """backtest_arrays with explicit SL parameters, as backtest_strategy's trade tuples"""
+    df = sb.calculate_indicators(df)
+    close = df["Close"].to_numpy(dtype=np.float64)
+    entries, exits, prices, end_flags = sb.backtest_arrays(
+        close, df["EMA_5"].to_numpy(), df["EMA_9"].to_numpy(), df["ADX"].to_numpy(),
+        trailing_sl_offset=offset, sl_shift_trigger=trigger, sl_difference=difference)
+    times = df["Datetime"].array
+    return [(times[e], times[x], p, len(df) - e if end else x - e)
+            for e, x, p, end in zip(entries, exits, prices, end_flags)]
+
+
+def row_trades(df, monkeypatch, offset, trigger, difference):
+    monkeypatch.setattr(sb, "TRAILING_SL_OFFSET", offset)
+    monkeypatch.setattr(sb, "SL_SHIFT_TRIGGER", trigger)
+    monkeypatch.setattr(sb, "SL_DIFFERENCE", difference)
+    return [(t["Entry_Time"], t["Exit_Time"], t["Exit_Price"], t["Candles"])
+            for t in sb.backtest_strategy(df.copy())]
+
+
+@pytest.mark.parametrize("offset, trigger, difference", [
+    (sb.TRAILING_SL_OFFSET, sb.SL_SHIFT_TRIGGER, sb.SL_DIFFERENCE),
+    (2.0, 3.0, 1.0),
+    (5.0, 0.0, 0.5),  # The entry bar itself moves the SL
+    (5.0, -1.0, 0.5),
+    (5.0, 1.0, 0.0),  # Any bar that moves the SL also hits it
+    (5.0, 0.0, 0.0),  # Exit on the entry bar
+    (5.0, 1.0, -0.5),
+    (0.0, 1.0, 0.5),  # SL starts at the entry price
+    (-1.0, 1.0, 0.5),
+])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_array_engine_matches_row_loop(monkeypatch, seed, offset, trigger, difference):
+    df = candles(seed)
+    expected = row_trades(df, monkeypatch, offset, trigger, difference)
+    assert len(expected) > 5
+    assert array_trades(df, offset, trigger, difference) == expected
+
+
+def test_exit_on_entry_bar_when_the_stop_starts_above_the_entry():
+    close = np.array([100.0, 101.0, 102.0])
+    assert sb._find_exit(close, 0, -1.0, 1.0, 0.5) == (0, 101.0)
+
+
+def test_no_exit_returns_minus_one():
+    close = np.linspace(100, 200, 1_000)
+    index, price = sb._find_exit(close, 0, 5.0, 1.0, 0.5)
+    assert index == -1 and np.isnan(price)
+
+
+@pytest.mark.parametrize("window", [1, 3, 256])
+def test_exit_scan_window_does_not_change_the_exit(monkeypatch, window):
+    df = candles(2)
+    expected = array_trades(df, 5.0, 1.0, 0.5)
+    monkeypatch.setattr(sb, "EXIT_SCAN_WINDOW", window)
+    assert array_trades(df, 5.0, 1.0, 0.5) == expected
+
+
+def test_intrabar_exit_applies_the_entry_bar_like_the_row_loop():
+    df = candles(3, bars=300)
+    df["Open"] = df["Close"].shift(fill_value=df["Close"].iloc[0])
+    path = sb.execution.IntrabarPath.from_bars(df)
+    model = sb.execution.ExecutionModel()
+    close = df["Close"].to_numpy(dtype=np.float64)
+    # SL starts at the entry: stopped out at the entry close
+    assert sb.execution.trailing_stop_exit(path, close, 10, model, 0.0, 1.0, 0.5) == (10, close[10])
+    # The entry close moves the SL to entry - 0.5 before the next bar is checked
+    shifted = sb.execution.trailing_stop_exit(path, close, 10, model, 5.0, 0.0, 0.5)
+    unshifted = sb.execution.trailing_stop_exit(path, close, 10, model, 0.5, 1e9, 0.5)
+    assert shifted == unshifted
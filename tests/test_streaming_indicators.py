@@ -0,0 +1,164 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+from streaming_indicators import (
+    IndicatorState, RollingMean, RollingVWAP, RunningSum, StreamingADX, StreamingATR, StreamingEMA, StreamingMACD,
+    StreamingRSI,
+)
+
+
+@pytest.fixture
+def closes():
+    rng = np.random.default_rng(11)
+    return 200 + np.cumsum(rng.normal(0, 1.5, 500))
+
+
+@pytest.fixture
+def ohlcv(closes):
+    rng = np.random.default_rng(12)
+    high = closes + rng.uniform(0, 3, closes.size)
+    low = closes - rng.uniform(0, 3, closes.size)
+    volume = rng.integers(100, 10_000, closes.size).astype(np.float64)
+    return high, low, closes, volume
+
+
+def assert_streams(indicator, columns, expected):
+    """peek() before and update() on each bar both equal the batch value, NaN warm-up included"""
+    for t, bar in enumerate(zip(*columns)):
+        bar = [float(x) for x in bar]
+        for value in (indicator.peek(*bar), indicator.update(*bar)):
+            assert value == pytest.approx(expected[t], rel=1e-9, abs=1e-9, nan_ok=True), t
+
+
+# ----- running sums -----
+
+def test_running_sum_matches_fsum_of_window(closes):
+    window = RunningSum(20)
+    for t, x in enumerate(closes):
+        assert window.peek(x) == pytest.approx(math.fsum(closes[max(0, t - 19):t + 1]), rel=1e-13)
+        window.append(x)
+        assert window.sum() == pytest.approx(math.fsum(closes[max(0, t - 19):t + 1]), rel=1e-13)
+
+
+def test_running_sum_does_not_drift_over_a_long_session():
+    # Large and tiny values alternate: a plain running sum loses the tiny ones
+    window = RunningSum(60)
+    values = [1e9 if k % 2 else 1e-3 for k in range(200_000)]
+    for x in values:
+        window.append(x)
+    assert window.sum() == math.fsum(values[-60:])
+
+
+def test_running_sum_nan_leaves_with_eviction():
+    window = RunningSum(3)
+    for x in (1.0, float("nan"), 2.0):
+        window.append(x)
+    assert math.isnan(window.sum())
+    assert math.isnan(window.peek(4.0))
+    window.append(4.0)
+    assert math.isnan(window.sum())
+    assert window.peek(5.0) == 11.0
+    window.append(5.0)
+    assert window.sum() == 11.0
+
+
+# ----- streaming vs batch -----
+
+@pytest.mark.parametrize("period", [1, 5, 14])
+def test_rolling_mean_update_and_peek_match_pandas(closes, period):
+    x = closes.copy()
+    x[:3] = np.nan  # The first RSI gain/loss is NaN
+    expected = pd.Series(x).rolling(period).mean().to_numpy()
+    mean = RollingMean(period)
+    for t, value in enumerate(x):
+        peeked = mean.peek(value)
+        assert peeked == pytest.approx(expected[t], rel=1e-12, nan_ok=True)
+        assert mean.update(value) == pytest.approx(expected[t], rel=1e-12, nan_ok=True)
+
+
+@pytest.mark.parametrize("lookback", [1, 20, 60])
+def test_rolling_vwap_update_and_peek_match_batch(closes, lookback):
+    rng = np.random.default_rng(3)
+    volume = rng.integers(0, 5_000, len(closes)).astype(np.float64)
+    volume[40:45] = 0.0
+    expected = indicators.rolling_vwap(closes, volume, lookback)
+    vwap = RollingVWAP(lookback)
+    for t, (close, vol) in enumerate(zip(closes, volume)):
+        for value in (vwap.peek(close, vol), vwap.update(close, vol)):
+            if np.isnan(expected[t]):
+                assert value is None
+            else:
+                assert value == pytest.approx(expected[t], rel=1e-9)  # The batch kernel differences cumsums
+
+
+@pytest.mark.parametrize("adjust", [False, True])
+@pytest.mark.parametrize("span", [5, 12, 26])
+def test_streaming_ema_matches_batch(closes, span, adjust):
+    assert_streams(StreamingEMA(span, adjust), [closes], indicators.ema(closes, span, adjust=adjust))
+
+
+@pytest.mark.parametrize("output", range(4))
+def test_streaming_macd_matches_batch(closes, output):
+    class Output:  # One of (macd, signal, ema_short, ema_long)
+        def __init__(self):
+            self.macd = StreamingMACD(12, 26, 9)
+
+        def peek(self, close):
+            return self.macd.peek(close)[output]
+
+        def update(self, close):
+            return self.macd.update(close)[output]
+
+    assert_streams(Output(), [closes], indicators.macd(closes, 12, 26, 9)[output])
+
+
+@pytest.mark.parametrize("smoothing", ["sma", "wilder"])
+@pytest.mark.parametrize("period", [2, 14])
+def test_streaming_rsi_matches_batch(closes, period, smoothing):
+    assert_streams(StreamingRSI(period, smoothing), [closes], indicators.rsi(closes, period, smoothing))
+
+
+@pytest.mark.parametrize("smoothing", ["sma", "wilder"])
+@pytest.mark.parametrize("period", [2, 14])
+def test_streaming_atr_matches_batch(ohlcv, period, smoothing):
+    high, low, close, _ = ohlcv
+    assert_streams(StreamingATR(period, smoothing), [high, low, close],
+                   indicators.atr(high, low, close, period, smoothing))
+
+
+@pytest.mark.parametrize("smoothing", ["sma", "wilder"])
+@pytest.mark.parametrize("period", [2, 14])
+def test_streaming_adx_matches_batch(ohlcv, period, smoothing):
+    high, low, close, _ = ohlcv
+    assert_streams(StreamingADX(period, smoothing), [high, low, close],
+                   indicators.adx(high, low, close, period, smoothing)[0])
+
+
+@pytest.mark.parametrize("smoothing", ["sma", "wilder"])
+@pytest.mark.parametrize("seeded", [10, 40, 300])  # Seeded inside and after the warm-up
+def test_indicator_state_seeded_then_streamed_matches_batch(ohlcv, smoothing, seeded):
+    high, low, close, volume = ohlcv
+    df = pd.DataFrame({"open": close, "high": high, "low": low, "close": close, "volume": volume},
+                      index=pd.date_range("2026-02-03 09:15", periods=close.size, freq="min"))
+    batch = {
+        "vwap": indicators.rolling_vwap(close, volume, 60),
+        "rsi": indicators.rsi(close, 14, smoothing),
+        "atr": indicators.atr(high, low, close, 14, smoothing),
+        "adx": indicators.adx(high, low, close, 14, smoothing)[0],
+    }
+    batch.update(zip(("macd", "signal", "ema_s", "ema_l"), indicators.macd(close, 12, 26, 9)))
+
+    state = IndicatorState(smoothing=smoothing)
+    assert state.sync(df.iloc[:seeded]) == seeded - 1  # The last row is the forming candle
+    for t in range(seeded - 1, close.size):
+        if t >= seeded:
+            state.update(high[t - 1], low[t - 1], close[t - 1], volume[t - 1])
+        state.set_forming(close[t], high[t], low[t], close[t], volume[t])
+        snapshot = state.snapshot()
+        for name, values in batch.items():
+            got = math.nan if snapshot[name] is None else snapshot[name]
+            assert got == pytest.approx(values[t], rel=1e-9, abs=1e-9, nan_ok=True), (name, t)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from fake_smartapi import FakeSmartConnect
+from resample import TimeframeCache
+from tick_feed import ReplayTickSource, TickFeed
+
+CANDLE_MINUTES = 3
+
+
+def fetch_candles(base, minutes):
+    """Ai_bot.fetch_candles at `minutes`: derived from 1-minute bars, lowercase columns, time index"""
+    df = TimeframeCache().sync("42544", base, [minutes])[minutes]
+    df.columns = ["timestamp", "open", "high", "low", "close", "volume"]
+    return df.set_index("timestamp")
+
+
+@pytest.mark.parametrize("fetched", [10, 11, 12])  # REST fetch lands 1, 2 and 3 minutes into a bucket
+def test_seeded_forming_bar_closes_as_the_full_candle(fetched):
+    api = FakeSmartConnect()
+    base = api.day_candles("42544", "2026-02-03")
+    bucket = (fetched - 1) // CANDLE_MINUTES  # The fetch's last (forming) candle
+    expected = api.day_candles("42544", "2026-02-03", "THREE_MINUTE").iloc[bucket]
+
+    feed = TickFeed(intervals=(CANDLE_MINUTES,))
+    closed = []
+    feed.on_bar(lambda token, minutes, bar: closed.append((minutes, bar)))
+    feed.seed("42544", CANDLE_MINUTES, fetch_candles(base.iloc[:fetched], CANDLE_MINUTES))
+    # Ticks after the connect: the rest of the forming bucket, then the next bucket's first minute
+    rest = base.iloc[fetched:(bucket + 1) * CANDLE_MINUTES + 1]
+    for tick in ReplayTickSource.from_candles("42544", rest).ticks:
+        feed.ingest(*tick)
+
+    assert len(closed) == 1
+    minutes, (start, o, h, l, c, v) = closed[0]
+    assert minutes == CANDLE_MINUTES
+    assert start == expected["Datetime"].timestamp()
+    np.testing.assert_allclose([o, h, l, c, v], expected[["Open", "High", "Low", "Close", "Volume"]].to_numpy(float))
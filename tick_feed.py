@@ -0,0 +1,294 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from candle_store import STORE_TZ
+
+# =========================
+# TICK FEED + BAR AGGREGATION
+# =========================
+# Ticks (token, epoch seconds, price, volume) come from a websocket, a local replay or
+# an LTP-polling fallback. Each token/interval has an aggregator that builds OHLCV bars
+# aligned to the 09:15 IST session open into a preallocated ring buffer, and the feed
+# pushes tick and bar-close events to strategy callbacks.
+
+SESSION_OPEN_OFFSET = 3 * 3600 + 45 * 60  # 09:15 IST is 03:45 UTC, in seconds past midnight UTC
+RING_CAPACITY = 2048  # Closed bars kept per token/interval
+EXCHANGE_TYPES = {"NSE": 1, "NFO": 2, "BSE": 3, "BFO": 4, "MCX": 5}  # SmartWebSocketV2 codes
+
+
+def bar_start(ts, minutes):
+    """Start (epoch seconds) of the bar containing ts, aligned to the session open"""
+    width = minutes * 60
+    return (int(ts) - SESSION_OPEN_OFFSET) // width * width + SESSION_OPEN_OFFSET
+
+
+class BarRing:
+    """Fixed-capacity ring of closed OHLCV bars on preallocated NumPy arrays"""
+
+    FIELDS = ("open", "high", "low", "close", "volume")
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self.time = np.zeros(capacity, dtype=np.int64)
+        self.data = np.zeros((len(self.FIELDS), capacity), dtype=np.float64)
+        self.count = 0  # Total bars ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, ts, o, h, l, c, v):
+        i = self.count % self.capacity
+        self.time[i] = ts
+        self.data[:, i] = (o, h, l, c, v)
+        self.count += 1
+
+    def _order(self, n=None):
+        size = len(self)
+        n = size if n is None else min(n, size)
+        return (np.arange(self.count - n, self.count) % self.capacity)
+
+    def last(self, n=None):
+        """Last n bars, oldest first, as {field: array} (copies)"""
+        idx = self._order(n)
+        out = {"time": self.time[idx]}
+        for k, field in enumerate(self.FIELDS):
+            out[field] = self.data[k, idx]
+        return out
+
+    def to_frame(self, n=None):
+        bars = self.last(n)
+        df = pd.DataFrame({f: bars[f] for f in self.FIELDS})
+        df.index = pd.to_datetime(bars["time"], unit="s", utc=True).tz_convert(STORE_TZ)
+        df.index.name = "timestamp"
+        return df
+
+
+class BarAggregator:
+    """Builds bars of `minutes` length from ticks; closed bars go to the ring"""
+
+    def __init__(self, minutes, capacity=RING_CAPACITY):
+        self.minutes = minutes
+        self.ring = BarRing(capacity)
+        self.start = None  # Start time of the forming bar
+        self.forming = None  # [open, high, low, close, volume]
+
+    def seed(self, ts, o, h, l, c, v):
+        """Resume a partly built bar, e.g. the forming candle from a REST fetch"""
+        self.start = bar_start(ts, self.minutes)
+        self.forming = [o, h, l, c, v]
+
+    def on_tick(self, ts, price, volume=0.0):
+        """Add a tick; returns the closed bar (start, o, h, l, c, v) if this tick closed one"""
+        start = bar_start(ts, self.minutes)
+        closed = None
+        if self.start is not None and start != self.start:
+            if start < self.start:
+                return None  # Late tick for an already-closed bar
+            closed = (self.start, *self.forming)
+            self.ring.append(*closed)
+            self.start = None
+        if self.start is None:
+            self.start = start
+            self.forming = [price, price, price, price, volume]
+        else:
+            bar = self.forming
+            bar[1] = max(bar[1], price)
+            bar[2] = min(bar[2], price)
+            bar[3] = price
+            bar[4] += volume
+        return closed
+
+    def flush(self):
+        """Close the forming bar (end of session / replay)"""
+        if self.start is None:
+            return None
+        closed = (self.start, *self.forming)
+        self.ring.append(*closed)
+        self.start = None
+        self.forming = None
+        return closed
+
+
+class TickFeed:
+    """
+    Routes ticks to per-(token, interval) aggregators and fires callbacks:
+      on_tick(token, ts, price, volume)
+      on_bar(token, minutes, (start, o, h, l, c, v))
+    Bar-close events fire before the tick that caused them.
+    """
+
+    def __init__(self, intervals=(1,), capacity=RING_CAPACITY):
+        self.intervals = tuple(intervals)
+        self.capacity = capacity
+        self.aggregators = {}  # (token, minutes) -> BarAggregator
+        self.tick_handlers = []
+        self.bar_handlers = []
+        self.last_tick_time = {}  # token -> time.monotonic() of the last tick
+        self._lock = threading.Lock()
+
+    def on_tick(self, handler):
+        self.tick_handlers.append(handler)
+        return handler
+
+    def on_bar(self, handler):
+        self.bar_handlers.append(handler)
+        return handler
+
+    def aggregator(self, token, minutes):
+        key = (str(token), minutes)
+        if key not in self.aggregators:
+            self.aggregators[key] = BarAggregator(minutes, self.capacity)
+        return self.aggregators[key]
+
+    def seed(self, token, minutes, df):
+        """
+        Resume token's forming `minutes` bar from the last row of a fetch_candles() frame
+        (open/high/low/close/volume columns, time index) built at that same interval
+        """
+        last = df.iloc[-1]
+        self.aggregator(token, minutes).seed(df.index[-1].timestamp(), last["open"], last["high"], last["low"],
+                                             last["close"], last["volume"])
+
+    def ingest(self, token, ts, price, volume=0.0):
+        token = str(token)
+        with self._lock:
+            closed = [(m, self.aggregator(token, m).on_tick(ts, price, volume)) for m in self.intervals]
+            self.last_tick_time[token] = time.monotonic()
+        for minutes, bar in closed:
+            if bar is not None:
+                for handler in self.bar_handlers:
+                    handler(token, minutes, bar)
+        for handler in self.tick_handlers:
+            handler(token, ts, price, volume)
+
+    def flush(self):
+        for (token, minutes), agg in list(self.aggregators.items()):
+            bar = agg.flush()
+            if bar is not None:
+                for handler in self.bar_handlers:
+                    handler(token, minutes, bar)
+
+    def silence(self, token):
+        """Seconds since the last tick for token (inf if none yet)"""
+        last = self.last_tick_time.get(str(token))
+        return float("inf") if last is None else time.monotonic() - last
+
+
+# =========================
+# TICK SOURCES
+# =========================
+
+class ReplayTickSource:
+    """Replays (token, ts, price, volume) ticks from memory, e.g. synthesised from candles"""
+
+    def __init__(self, ticks):
+        self.ticks = ticks
+
+    @classmethod
+    def from_candles(cls, token, df):
+        """
+        Four ticks per candle (open, then low/high in the likelier order, then close),
+        volume split evenly, so an aggregator of the same interval rebuilds each candle.
+        Expects Datetime/Open/High/Low/Close/Volume columns.
+        """
+        ts = pd.to_datetime(df["Datetime"])
+        epoch = ((ts - pd.Timestamp("1970-01-01", tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy()
+        o, h, l, c, v = (df[col].to_numpy(dtype=np.float64) for col in ["Open", "High", "Low", "Close", "Volume"])
+        up = c >= o
+        mid1 = np.where(up, l, h)
+        mid2 = np.where(up, h, l)
+        prices = np.stack([o, mid1, mid2, c], axis=1).ravel()
+        times = np.repeat(epoch, 4) + np.tile([0, 1, 2, 3], len(epoch))
+        volumes = np.repeat(v / 4, 4)
+        return cls([(str(token), int(t), float(p), float(q)) for t, p, q in zip(times, prices, volumes)])
+
+    def run(self, feed, speed=None):
+        """Push every tick into feed; speed=None replays as fast as possible"""
+        prev = None
+        for token, ts, price, volume in self.ticks:
+            if speed and prev is not None and ts > prev:
+                time.sleep((ts - prev) / speed)
+            prev = ts
+            feed.ingest(token, ts, price, volume)
+        feed.flush()
+
+
+class PollingTickSource:
+    """Fallback source: turns periodic ltpData calls into ticks (no volume)"""
+
+    def __init__(self, api, instruments, exchange="NFO", interval=1.0):
+        self.api = api
+        self.instruments = instruments  # [{"symbol", "token"}]
+        self.exchange = exchange
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def poll_once(self, feed):
+        for inst in self.instruments:
+            try:
+                ltp = float(self.api.ltpData(self.exchange, inst["symbol"], inst["token"])["data"]["ltp"])
+            except Exception:
+                continue
+            feed.ingest(inst["token"], time.time(), ltp, 0.0)
+
+    def start(self, feed):
+        def loop():
+            while not self._stop.is_set():
+                self.poll_once(feed)
+                self._stop.wait(self.interval)
+        thread = threading.Thread(target=loop, name="ltp-poll", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+
+class SmartWebSocketSource:
+    """Live ticks from SmartAPI's SmartWebSocketV2 (QUOTE mode, for traded volume)"""
+
+    QUOTE_MODE = 2
+
+    def __init__(self, auth_token, api_key, client_code, feed_token, tokens, exchange="NFO"):
+        self.auth_token = auth_token
+        self.api_key = api_key
+        self.client_code = client_code
+        self.feed_token = feed_token
+        self.tokens = [str(t) for t in tokens]
+        self.exchange_type = EXCHANGE_TYPES[exchange]
+        self.day_volume = {}  # token -> cumulative day volume at the last tick
+        self.sws = None
+
+    def _on_data(self, feed, message):
+        token = str(message.get("token"))
+        price = message.get("last_traded_price")
+        if price is None:
+            return
+        total = message.get("volume_trade_for_the_day")
+        volume = 0.0
+        if total is not None:
+            previous = self.day_volume.get(token)
+            volume = float(total - previous) if previous is not None and total >= previous else 0.0
+            self.day_volume[token] = total
+        ts = message.get("exchange_timestamp", time.time() * 1000) / 1000.0
+        feed.ingest(token, ts, price / 100.0, volume)  # Prices arrive in paise
+
+    def start(self, feed, on_error=None):
+        from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+
+        self.sws = SmartWebSocketV2(self.auth_token, self.api_key, self.client_code, self.feed_token)
+        token_list = [{"exchangeType": self.exchange_type, "tokens": self.tokens}]
+        self.sws.on_open = lambda wsapp: self.sws.subscribe("tickfeed", self.QUOTE_MODE, token_list)
+        self.sws.on_data = lambda wsapp, message: self._on_data(feed, message)
+        self.sws.on_error = on_error or (lambda *args: print("[tick_feed] websocket error", args))
+        self.sws.on_close = lambda wsapp: print("[tick_feed] websocket closed")
+        thread = threading.Thread(target=self.sws.connect, name="smart-ws", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        if self.sws is not None:
+            self.sws.close_connection()
@@ -1,10 +1,17 @@
 import numpy as np
-import pandas as pd
 from SmartApi import SmartConnect
 import pyotp
 from logzero import logger
 import time
 from datetime import datetime, timedelta
+from candle_store import CandleStore, fetch_with_store
+import indicators
+from latency import LatencyRecorder
+from position_monitor import PositionMonitor, TrailingStop
+from tick_feed import SmartWebSocketSource, TickFeed
+from instruments import SCRIP_MASTER_FILE, InstrumentMaster, downloaded_on, downloaded_today
+from strategy_backtest import TREND_RULES
+import warm_start
 
 # Trading parameters
 BROKERAGE_CHARGE = 90  # Fixed ₹90 per trade
@@ -14,6 +21,16 @@ SL_SHIFT_TRIGGER = 1  # Price move to start trailing SL
 SL_DIFFERENCE = 0.5  # Maintain SL = Current Price - 0.5
 ADX_THRESHOLD = 25  # ADX must be above this for a strong trend
 ADX_PERIOD = 14  # ADX Calculation Period
+ADX_SMOOTHING = "sma"  # "sma" = rolling means, "wilder" = true recursive Wilder smoothing
+USE_TICK_FEED = True  # Trail the SL on websocket ticks; LTP quotes cover any gap in the feed
+SLEEP_LOOP = 5  # Seconds between trend checks while flat
+USE_METRICS = True  # Per-stage latency histograms and loop overruns
+METRICS_PORT = 9109  # Local /metrics and /metrics.csv endpoint; None = no server
+USE_WARM_START = True  # Resume trailing an open position from SNAPSHOT_FILE after a restart
+SNAPSHOT_FILE = "trade.snapshot"
+SNAPSHOT_INTERVAL = 1  # Seconds between snapshots of the trailing SL while a position is open
+
+latency = LatencyRecorder(enabled=USE_METRICS)
 
 # API credentials
 api_key = ''
@@ -38,20 +55,38 @@ symbol = "CRUDEOIL16APR255750CE"
 symbol_token = "447574"
 exchange = "MCX"
 
-def fetch_market_data():
+# Resolve the same strike on the nearest expiry from the local scrip master, so the
+# contract above does not go stale at expiry (instruments.py)
+USE_INSTRUMENT_MASTER = True
+UNDERLYING = "CRUDEOIL"
+STRIKE = 5750
+OPTION_TYPE = "CE"
+
+if USE_INSTRUMENT_MASTER:
+    try:
+        contract = InstrumentMaster.load().option(UNDERLYING, STRIKE, OPTION_TYPE, exchange=exchange)
+        if not downloaded_today():
+            logger.warning(f"{SCRIP_MASTER_FILE} is from {downloaded_on()}; "
+                           f"new expiries may be missing (python instruments.py --download)")
+    except Exception as e:
+        logger.warning(f"Instrument master unavailable ({e}); trading {symbol}")
+        contract = None
+    if contract is not None:
+        symbol, symbol_token = contract["symbol"], contract["token"]
+        logger.info(f"Trading {symbol} ({symbol_token}), expiry {contract['expiry']}")
+
+# Local candle history; each fetch only asks the API for bars after the last stored one
+candle_store = CandleStore()
+
+def fetch_market_data(verbose=True):
     """Fetch recent market data (candles)"""
     try:
-        response = smartApi.getCandleData({
-            "exchange": exchange,
-            "symboltoken": symbol_token,
-            "interval": "ONE_MINUTE",
-            "fromdate": (datetime.now() - timedelta(days=10)).strftime("%Y-%m-%d %H:%M"),
-            "todate": datetime.now().strftime("%Y-%m-%d %H:%M")
-        })
-        if 'data' in response and response['data']:
-            df = pd.DataFrame(response['data'], columns=['Datetime', 'Open', 'High', 'Low', 'Close', 'Volume'])
-            df[['Open', 'High', 'Low', 'Close', 'Volume']] = df[['Open', 'High', 'Low', 'Close', 'Volume']].astype(float)
-            logger.info(f"✅ Market Data Fetched! Last 5 Candles:\n{df.tail(5)}")  # Compare with Angel One
+        with latency.timed("candles", symbol):
+            df = fetch_with_store(smartApi, candle_store, exchange, symbol_token, "ONE_MINUTE",
+                                  datetime.now() - timedelta(days=10))
+        if not df.empty:
+            if verbose:
+                logger.info(f"✅ Market Data Fetched! Last 5 Candles:\n{df.tail(5)}")  # Compare with Angel One
             return df
         else:
             logger.error("Empty market data response")
@@ -60,43 +95,124 @@ def fetch_market_data():
         logger.error(f"Data fetch error: {e}")
         return None
 
-def calculate_adx(df, period=ADX_PERIOD):
-    """Calculate ADX using Wilder’s Smoothing"""
-    df['TR'] = np.maximum.reduce([
-        df['High'] - df['Low'],
-        abs(df['High'] - df['Close'].shift(1)),
-        abs(df['Low'] - df['Close'].shift(1))
-    ])
-    df['+DM'] = np.where((df['High'] - df['High'].shift(1)) > (df['Low'].shift(1) - df['Low']),
-                         df['High'] - df['High'].shift(1), 0)
-    df['-DM'] = np.where((df['Low'].shift(1) - df['Low']) > (df['High'] - df['High'].shift(1)),
-                         df['Low'].shift(1) - df['Low'], 0)
-
-    # Wilder’s Smoothing (Rolling Mean)
-    df['TR_smooth'] = df['TR'].rolling(window=period).mean()
-    df['+DM_smooth'] = df['+DM'].rolling(window=period).mean()
-    df['-DM_smooth'] = df['-DM'].rolling(window=period).mean()
-
-    df['+DI'] = (df['+DM_smooth'] / df['TR_smooth']) * 100
-    df['-DI'] = (df['-DM_smooth'] / df['TR_smooth']) * 100
-    df['DX'] = (abs(df['+DI'] - df['-DI']) / abs(df['+DI'] + df['-DI'])) * 100
-    df['ADX'] = df['DX'].rolling(window=period).mean()
-
-    return df
+def get_ltp():
+    """Last traded price from a single ltpData quote, None on failure"""
+    try:
+        with latency.timed("ltp", symbol):
+            quote = smartApi.ltpData(exchange, symbol, symbol_token)
+        return float(quote["data"]["ltp"])
+    except Exception as e:
+        logger.error(f"LTP fetch error: {e}")
+        return None
+
+# Ticks for the traded symbol; only started once a position is open
+tick_feed = TickFeed(intervals=(1,))
+tick_source = None
+
+def start_tick_feed():
+    """Subscribe to websocket ticks for symbol_token (once); failures leave LTP polling in charge"""
+    global tick_source
+    if tick_source is not None:
+        return
+    try:
+        tick_source = SmartWebSocketSource(data['data']['jwtToken'], api_key, username,
+                                           smartApi.getfeedToken(), [symbol_token], exchange)
+        tick_source.start(tick_feed)
+        logger.info("📡 Tick feed connected")
+    except Exception as e:
+        tick_source = None
+        logger.error(f"Tick feed error: {e}")
 
 def calculate_indicators(df):
-    """Calculate EMA5, EMA9, and ADX"""
-    df['EMA_5'] = df['Close'].ewm(span=5, adjust=False).mean()
-    df['EMA_9'] = df['Close'].ewm(span=9, adjust=False).mean()
-    df = calculate_adx(df)
-    return df
+    """Return a copy of df with EMA5, EMA9, and ADX columns"""
+    close = df['Close'].to_numpy(dtype=np.float64)
+    with latency.timed("adx", symbol):
+        adx, _, _ = indicators.adx(
+            df['High'].to_numpy(dtype=np.float64),
+            df['Low'].to_numpy(dtype=np.float64),
+            close,
+            ADX_PERIOD, ADX_SMOOTHING
+        )
+    with latency.timed("ema", symbol):
+        ema_5, ema_9 = indicators.ema(close, 5), indicators.ema(close, 9)
+    return df.assign(EMA_5=ema_5, EMA_9=ema_9, ADX=adx)
+
+def exit_position(stop):
+    """Trail the SL until it is hit, then sell; the stop is snapshotted while it trails"""
+    # Trail the SL on ticks / LTP quotes; candles are only fetched if quotes keep failing
+    if USE_TICK_FEED:
+        start_tick_feed()
+    monitor = PositionMonitor(
+        stop,
+        quote=get_ltp,
+        refresh=lambda: fetch_market_data(verbose=False),
+        feed=tick_feed if USE_TICK_FEED else None,
+        token=symbol_token,
+    )
+    # Snapshots take the monitor's lock, so a tick never moves the stop mid-pickle
+    position = {"symbol": symbol, "token": symbol_token, "stop": stop, "exiting": False}
+    snapshots = warm_start.Snapshotter(SNAPSHOT_FILE, lambda: dict(position), SNAPSHOT_INTERVAL,
+                                       lock=monitor.lock)
+    if USE_WARM_START:
+        snapshots.save()
+        snapshots.start()
+
+    trailing_sl = monitor.run()
+    logger.info(f"❌ SL Hit at {trailing_sl}, EXIT TRADE! ({monitor.exit_reason})")
+    if USE_WARM_START:
+        # Recorded before the SELL: a restart after this point must not trail and sell again
+        with monitor.lock:
+            position["exiting"] = True
+        snapshots.save()
+    order_start = time.perf_counter()
+    smartApi.placeOrder({
+        "variety": "NORMAL",
+        "tradingsymbol": symbol,
+        "symboltoken": symbol_token,
+        "transactiontype": "SELL",
+        "exchange": exchange,
+        "ordertype": "LIMIT",
+        "producttype": "INTRADAY",
+        "duration": "DAY",
+        "price": str(trailing_sl),
+        "quantity": str(QUANTITY)
+    })
+    latency.observe("order", time.perf_counter() - order_start, symbol)
+    if USE_WARM_START:
+        # The last snapshot records the position as closed
+        with monitor.lock:
+            position["stop"] = None
+        snapshots.stop()
+    logger.info(f"\n{latency.csv_text()}")
+
+def resume_position():
+    """Trail and exit a position left open by a previous run today; True if there was one"""
+    saved = warm_start.load(SNAPSHOT_FILE)
+    if saved is None or saved["state"]["stop"] is None:
+        return False
+    if saved["state"]["token"] != symbol_token:
+        logger.warning(f"Snapshot holds {saved['state']['symbol']}, not {symbol}; not resumed")
+        return False
+    if saved["state"].get("exiting"):
+        # The SELL may or may not have reached the exchange; placing another could go short
+        logger.warning(f"Snapshot shows {saved['state']['symbol']} mid-exit; check the order book before trading it")
+        return True
+    stop = saved["state"]["stop"]
+    logger.info(f"♻️ Resuming position from {saved['age']:.0f}s ago: entry {stop.entry_price}, SL {stop.sl}")
+    exit_position(stop)
+    return True
 
 def trade():
     """Continuously check for a bullish trend and execute one trade with trailing SL"""
+    if USE_METRICS and METRICS_PORT is not None:
+        latency.serve(port=METRICS_PORT)
+    if USE_WARM_START and resume_position():
+        return  # The restart finished the trade it was in
     while True:
+        loop_start = time.perf_counter()
         df = fetch_market_data()
         if df is None:
-            time.sleep(5)
+            time.sleep(SLEEP_LOOP)
             continue
         
         df = calculate_indicators(df)
@@ -105,11 +221,13 @@ def trade():
         
         logger.info(f"📊 Checking trend - EMA5: {ema_5:.2f}, EMA9: {ema_9:.2f}, ADX: {adx:.2f}")
 
-        if ema_5 > ema_9 and adx > ADX_THRESHOLD:
+        # Same entry rule as strategy_backtest.py, on the latest candle only
+        if TREND_RULES.first({"ema_5": ema_5, "ema_9": ema_9, "adx": adx, "adx_threshold": ADX_THRESHOLD}):
             logger.info(f"✅ Bullish Signal! EMA_5: {ema_5}, EMA_9: {ema_9}, ADX: {adx}")
             entry_price = latest['Close']
             
             # Place Buy Order
+            order_start = time.perf_counter()
             buy_order = smartApi.placeOrder({
                 "variety": "NORMAL",
                 "tradingsymbol": symbol,
@@ -122,42 +240,14 @@ def trade():
                 "price": str(entry_price),
                 "quantity": str(QUANTITY)
             })
+            latency.observe("order", time.perf_counter() - order_start, symbol)
             logger.info(f"BUY Order Placed at {entry_price}")
             
-            # Implement Trailing Stop Loss
-            trailing_sl = entry_price - TRAILING_SL_OFFSET
-            while True:
-                df = fetch_market_data()
-                if df is None:
-                    time.sleep(5)
-                    continue
-                
-                current_price = df.iloc[-1]['Close']
-                if current_price >= entry_price + SL_SHIFT_TRIGGER:
-                    new_sl = current_price - SL_DIFFERENCE
-                    if new_sl > trailing_sl:
-                        trailing_sl = new_sl
-                        logger.info(f"🔄 Trailing SL updated to {trailing_sl}")
-
-                if current_price <= trailing_sl:
-                    logger.info(f"❌ SL Hit at {trailing_sl}, EXIT TRADE!")
-                    smartApi.placeOrder({
-                        "variety": "NORMAL",
-                        "tradingsymbol": symbol,
-                        "symboltoken": symbol_token,
-                        "transactiontype": "SELL",
-                        "exchange": exchange,
-                        "ordertype": "LIMIT",
-                        "producttype": "INTRADAY",
-                        "duration": "DAY",
-                        "price": str(trailing_sl),
-                        "quantity": str(QUANTITY)
-                    })
-                    return  # Exit trade loop after one trade
-                
-                time.sleep(5)
+            exit_position(TrailingStop(entry_price, TRAILING_SL_OFFSET, SL_SHIFT_TRIGGER, SL_DIFFERENCE))
+            return  # Exit trade loop after one trade
         
-        time.sleep(5)
+        latency.loop_done("trend", time.perf_counter() - loop_start, SLEEP_LOOP)
+        time.sleep(SLEEP_LOOP)
 
 if __name__ == "__main__":
     trade()
\ No newline at end of file
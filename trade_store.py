@@ -0,0 +1,307 @@
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+# ================= TRADE STORE SETTINGS =================
+# Backtest results as a struct of arrays: one NumPy array per column in memory and one
+# raw little-endian file per column on disk (same layout idea as candle_store), plus
+# meta.json with the symbol table. Reports and metrics read these arrays directly.
+STORE_TZ = "Asia/Kolkata"
+TRADING_DAYS = 252  # Annualisation factor for Sharpe/Sortino on daily P&L
+META_FILE = "meta.json"
+
+COLUMNS = {
+    "symbol": np.dtype("<i4"),  # index into TradeStore.labels
+    "entry_time": np.dtype("<i8"),  # epoch seconds (UTC)
+    "exit_time": np.dtype("<i8"),
+    "entry_price": np.dtype("<f8"),
+    "exit_price": np.dtype("<f8"),
+    "pnl": np.dtype("<f8"),
+    "pnl_pct": np.dtype("<f8"),
+    "candles": np.dtype("<i4"),
+}
+
+# Column name -> key in the trade dicts the backtesters return
+TRADE_KEYS = {
+    "entry_time": "Entry_Time",
+    "exit_time": "Exit_Time",
+    "entry_price": "Entry_Price",
+    "exit_price": "Exit_Price",
+    "pnl": "P&L",
+    "pnl_pct": "P&L%",
+    "candles": "Candles",
+}
+
+
+def to_epoch(times):
+    """Datetime-like values -> int64 epoch seconds (naive times are taken as IST; integers pass through)"""
+    values = np.asarray(times)
+    if values.dtype.kind in "iu":
+        return values.astype(np.int64)
+    ts = pd.DatetimeIndex(pd.to_datetime(times))
+    if ts.tz is None:
+        ts = ts.tz_localize(STORE_TZ)
+    return np.asarray((ts - pd.Timestamp("1970-01-01", tz="UTC")) // pd.Timedelta(seconds=1), dtype=np.int64)
+
+
+class TradeStore:
+    """
+    Columnar store of closed trades.
+    Each symbol (label) also records its group (e.g. "3MIN_CALL") and how many bars
+    were backtested, which is what exposure is measured against.
+    """
+
+    def __init__(self):
+        self.labels = []
+        self.groups = []
+        self.bars = []
+        self._chunks = {name: [] for name in COLUMNS}
+        self._columns = None
+
+    # ----- building -----
+    def add(self, label, entry_time, exit_time, entry_price, exit_price, pnl, pnl_pct, candles,
+            group="", bars=0):
+        """Append one symbol's trades from equal-length arrays"""
+        code = len(self.labels)
+        self.labels.append(label)
+        self.groups.append(group)
+        self.bars.append(int(bars))
+        values = {
+            "entry_time": to_epoch(entry_time),
+            "exit_time": to_epoch(exit_time),
+            "entry_price": entry_price,
+            "exit_price": exit_price,
+            "pnl": pnl,
+            "pnl_pct": pnl_pct,
+            "candles": candles,
+        }
+        n = len(values["pnl"])
+        self._chunks["symbol"].append(np.full(n, code, dtype=COLUMNS["symbol"]))
+        for name, value in values.items():
+            self._chunks[name].append(np.asarray(value, dtype=COLUMNS[name]))
+        self._columns = None
+        return code
+
+    def add_trades(self, label, trades, group="", bars=0):
+        """Append a list of trade dicts as returned by the backtesters"""
+        return self.add(label, group=group, bars=bars,
+                        **{name: [t[key] for t in trades] for name, key in TRADE_KEYS.items()})
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            self._columns = {name: np.concatenate(chunks) if chunks else np.empty(0, dtype=COLUMNS[name])
+                             for name, chunks in self._chunks.items()}
+            self._chunks = {name: [values] for name, values in self._columns.items()}
+        return self._columns
+
+    def __len__(self):
+        return len(self.columns["pnl"])
+
+    def select(self, group=None, label=None):
+        """Boolean mask over trades for one group and/or label"""
+        codes = np.arange(len(self.labels))
+        keep = np.ones(len(codes), dtype=bool)
+        if group is not None:
+            keep &= np.array([g == group for g in self.groups], dtype=bool)
+        if label is not None:
+            keep &= np.array([l == label for l in self.labels], dtype=bool)
+        return np.isin(self.columns["symbol"], codes[keep])
+
+    def bars_for(self, group=None):
+        return sum(b for b, g in zip(self.bars, self.groups) if group is None or g == group)
+
+    def to_frame(self):
+        """Trades as a DataFrame with the backtesters' column names"""
+        cols = self.columns
+        df = pd.DataFrame({
+            "Symbol": pd.Categorical.from_codes(cols["symbol"], self.labels) if self.labels else [],
+            "Group": np.asarray(self.groups, dtype=object)[cols["symbol"]] if self.labels else [],
+        })
+        for name, key in TRADE_KEYS.items():
+            values = cols[name]
+            if name.endswith("_time"):
+                values = pd.to_datetime(values, unit="s", utc=True).tz_convert(STORE_TZ)
+            df[key] = values
+        return df
+
+    # ----- disk -----
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name, values in self.columns.items():
+            tmp = os.path.join(path, f"{name}.bin.tmp")
+            with open(tmp, "wb") as f:
+                f.write(np.ascontiguousarray(values, dtype=COLUMNS[name]).tobytes())
+            os.replace(tmp, os.path.join(path, f"{name}.bin"))
+        with open(os.path.join(path, META_FILE), "w") as f:
+            json.dump({"labels": self.labels, "groups": self.groups, "bars": self.bars,
+                       "rows": len(self)}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        store = cls()
+        store.labels, store.groups, store.bars = meta["labels"], meta["groups"], meta["bars"]
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            file = os.path.join(path, f"{name}.bin")
+            if mmap and meta["rows"]:
+                columns[name] = np.memmap(file, dtype=dtype, mode="r", shape=(meta["rows"],))
+            else:
+                columns[name] = np.fromfile(file, dtype=dtype)
+        store._columns = columns
+        store._chunks = {name: [values] for name, values in columns.items()}
+        return store
+
+
+# ================= METRICS =================
+
+def equity_curve(store, mask=None):
+    """Cumulative realized P&L in exit-time order, indexed by exit time"""
+    cols = store.columns
+    mask = slice(None) if mask is None else mask
+    exit_time, pnl = cols["exit_time"][mask], cols["pnl"][mask]
+    order = np.argsort(exit_time, kind="stable")
+    index = pd.to_datetime(exit_time[order], unit="s", utc=True).tz_convert(STORE_TZ)
+    return pd.Series(np.cumsum(pnl[order]), index=index, name="Equity")
+
+
+def max_drawdown(equity):
+    """Largest peak-to-trough fall of an equity array (starting from 0)"""
+    equity = np.concatenate([[0.0], np.asarray(equity, dtype=np.float64)])
+    return float((np.maximum.accumulate(equity) - equity).max())
+
+
+def day_codes(epoch):
+    """Calendar day (in STORE_TZ) of each epoch second, as datetime64[D]"""
+    local = pd.to_datetime(epoch, unit="s", utc=True).tz_convert(STORE_TZ).tz_localize(None)
+    return local.to_numpy().astype("datetime64[D]")
+
+
+def daily_breakdown(store, mask=None):
+    """Trades, wins, P&L, win rate and max drawdown per exit day"""
+    cols = store.columns
+    mask = slice(None) if mask is None else mask
+    exit_time, pnl = cols["exit_time"][mask], cols["pnl"][mask]
+    if not len(pnl):
+        return pd.DataFrame(columns=["Trades", "Wins", "Win_Rate", "P&L", "Max_DD"])
+    days, day_idx = np.unique(day_codes(exit_time), return_inverse=True)
+    trades = np.bincount(day_idx, minlength=len(days))
+    wins = np.bincount(day_idx, weights=pnl > 0, minlength=len(days))
+    day_pnl = np.bincount(day_idx, weights=pnl, minlength=len(days))
+
+    # Intraday drawdown from each day's start. Running peaks restart every day, so each
+    # day is lifted above everything before it before taking one running max.
+    order = np.lexsort((exit_time, day_idx))
+    day_sorted = day_idx[order]
+    intraday = np.cumsum(pnl[order]) - np.r_[0.0, np.cumsum(day_pnl)][day_sorted]
+    lift = day_sorted * (2 * np.abs(intraday).max() + 1)
+    peak = np.maximum.accumulate(np.maximum(intraday, 0.0) + lift) - lift
+    drawdown = np.zeros(len(days))
+    np.maximum.at(drawdown, day_sorted, peak - intraday)
+
+    return pd.DataFrame({
+        "Trades": trades,
+        "Wins": wins.astype(np.int64),
+        "Win_Rate": wins / trades * 100,
+        "P&L": day_pnl,
+        "Max_DD": drawdown,
+    }, index=pd.Index(days.astype("datetime64[ns]"), name="Date"))
+
+
+def compute_metrics(store, mask=None, bars=None):
+    """Vectorized summary statistics over the (masked) trades"""
+    cols = store.columns
+    mask = slice(None) if mask is None else mask
+    pnl = cols["pnl"][mask]
+    exit_time = cols["exit_time"][mask]
+    candles = cols["candles"][mask]
+    bars = store.bars_for() if bars is None else bars
+
+    trades = int(pnl.size)
+    wins = int((pnl > 0).sum())
+    losses = int((pnl < 0).sum())
+    gross_profit = float(pnl[pnl > 0].sum())
+    gross_loss = float(-pnl[pnl < 0].sum())
+
+    order = np.argsort(exit_time, kind="stable")
+    daily = np.bincount(np.unique(day_codes(exit_time), return_inverse=True)[1], weights=pnl) \
+        if trades else np.empty(0)
+    sharpe = sortino = math.nan
+    if daily.size > 1:
+        std = daily.std(ddof=1)
+        downside = math.sqrt(np.mean(np.minimum(daily, 0.0) ** 2))
+        if std > 0:
+            sharpe = daily.mean() / std * math.sqrt(TRADING_DAYS)
+        if downside > 0:
+            sortino = daily.mean() / downside * math.sqrt(TRADING_DAYS)
+
+    return {
+        "Trades": trades,
+        "Wins": wins,
+        "Losses": losses,
+        "Win_Rate": wins / trades * 100 if trades else 0.0,
+        "Total_P&L": float(pnl.sum()),
+        "Avg_P&L": float(pnl.mean()) if trades else 0.0,
+        "Max_Profit": float(pnl.max()) if trades else 0.0,
+        "Max_Loss": float(pnl.min()) if trades else 0.0,
+        "Profit_Factor": gross_profit / gross_loss if gross_loss > 0 else (math.inf if gross_profit > 0 else math.nan),
+        "Max_Drawdown": max_drawdown(np.cumsum(pnl[order])),
+        "Sharpe": sharpe,
+        "Sortino": sortino,
+        "Exposure%": float(candles.sum()) / bars * 100 if bars else math.nan,
+        "Days": int(daily.size),
+    }
+
+
+def log_metrics(title, metrics):
+    logger.info(f"\n{title}:")
+    logger.info(f"  Total Trades: {metrics['Trades']} (W {metrics['Wins']} / L {metrics['Losses']})")
+    logger.info(f"  Win Rate: {metrics['Win_Rate']:.2f}%")
+    logger.info(f"  Total P&L: ₹{metrics['Total_P&L']:.2f}")
+    logger.info(f"  Avg P&L per Trade: ₹{metrics['Avg_P&L']:.2f}")
+    logger.info(f"  Profit Factor: {metrics['Profit_Factor']:.2f} | Max Drawdown: ₹{metrics['Max_Drawdown']:.2f}")
+    logger.info(f"  Sharpe: {metrics['Sharpe']:.2f} | Sortino: {metrics['Sortino']:.2f} "
+                f"(daily P&L over {metrics['Days']} days)")
+    logger.info(f"  Exposure: {metrics['Exposure%']:.2f}% of bars")
+
+
+def report(store, daily=True):
+    """Grand summary per group and overall, computed from the store"""
+    logger.info("\n" + "="*70)
+    logger.info("GRAND SUMMARY - ALL DATASETS")
+    logger.info("="*70)
+
+    for group in sorted(set(store.groups)):
+        mask = store.select(group=group)
+        if mask.any():
+            log_metrics(group, compute_metrics(store, mask, store.bars_for(group)))
+
+    logger.info("\n" + "-"*70)
+    if not len(store):
+        logger.info("📊 OVERALL RESULTS: No trades executed")
+        logger.info("="*70)
+        return
+    log_metrics("📊 OVERALL RESULTS", compute_metrics(store))
+    if daily:
+        logger.info(f"\nPer-day breakdown:\n{daily_breakdown(store).to_string(float_format=lambda v: f'{v:.2f}')}")
+    logger.info("="*70)
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report on a saved backtest trade store")
+    parser.add_argument("path", help="Directory written by strategy_backtest.py --save")
+    parser.add_argument("--trades", action="store_true", help="Also print every trade")
+    args = parser.parse_args()
+
+    store = TradeStore.load(args.path)
+    report(store)
+    if args.trades:
+        logger.info(f"\n{store.to_frame().to_string(index=False)}")
@@ -0,0 +1,210 @@
+import argparse
+import glob
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+import execution
+import parameter_sweep as ps
+from trade_store import STORE_TZ, TradeStore, equity_curve, report
+
+# ================= WALK-FORWARD SETTINGS =================
+# Trading days are split into consecutive train/test folds. Each fold picks the best
+# parameter combination on its train days and trades it, unchanged, on the following
+# test days. Only test-day trades make it into the stitched out-of-sample curve.
+TRAIN_DAYS = 3
+TEST_DAYS = 1
+OBJECTIVE = "Total_P&L"  # Column of the sweep stats row that ranks combinations
+
+# Per-worker state, filled by _init_worker: all series (indicators precomputed once
+# and shared by every fold), the combinations and the execution model
+_SERIES = []
+_COMBOS = []
+_MODEL = None
+
+
+def series_day(s):
+    """Trading day (IST) of a loaded series, from its first bar"""
+    first = pd.Timestamp(int(s["times"][0]), unit="s", tz="UTC").tz_convert(STORE_TZ)
+    return first.date().isoformat()
+
+
+def make_folds(days, train_days=TRAIN_DAYS, test_days=TEST_DAYS, anchored=False):
+    """
+    [(train_days, test_days)] over sorted unique days. Rolling folds slide a fixed
+    train window; anchored folds always train from the first day.
+    """
+    days = sorted(set(days))
+    folds = []
+    start = 0
+    while start + train_days + test_days <= len(days):
+        train_from = 0 if anchored else start
+        folds.append((days[train_from:start + train_days], days[start + train_days:start + train_days + test_days]))
+        start += test_days
+    return folds
+
+
+def _init_worker(series, combos, model):
+    global _SERIES, _COMBOS, _MODEL
+    _SERIES, _COMBOS, _MODEL = series, combos, model
+
+
+def run_fold(fold, series=None, combos=None, model=None, objective=OBJECTIVE):
+    """
+    Optimise on the fold's train days, then trade the winner on its test days
+    Returns a dict with the chosen params, train/test stats and the test trades
+    """
+    series = _SERIES if series is None else series
+    combos = _COMBOS if combos is None else combos
+    model = _MODEL if model is None else model
+    train_days, test_days = fold
+    train = [s for s in series if s["day"] in train_days]
+    test = [s for s in series if s["day"] in test_days]
+
+    rows = [ps.evaluate_params(p, train, model) for p in combos]
+    ranked = pd.DataFrame(rows, columns=ps.RESULT_COLUMNS)
+    best = ranked.sort_values([objective, "Win_Rate"], ascending=False, kind="stable").index[0]
+    params = combos[best]
+
+    trades = []
+    for s in test:
+        entries, exits, entry_prices, exit_prices, pnl, end_flags = ps.backtest_series(params, s, model)
+        trades.append({
+            "file": s["file"],
+            "bars": len(s["close"]),
+            "entry_time": s["times"][entries],
+            "exit_time": s["times"][exits],
+            "entry_price": entry_prices,
+            "exit_price": exit_prices,
+            "pnl": pnl,
+            "pnl_pct": (exit_prices - entry_prices) / entry_prices * 100,
+            "candles": np.where(end_flags, len(s["close"]), exits) - entries,
+        })
+
+    return {
+        "train_days": train_days,
+        "test_days": test_days,
+        "params": params,
+        "train": dict(zip(ps.RESULT_COLUMNS, rows[best])),
+        "test": ps.evaluate_params(params, test, model),
+        "trades": trades,
+    }
+
+
+def run_walk_forward(files, space=None, train_days=TRAIN_DAYS, test_days=TEST_DAYS, anchored=False,
+                     mode="grid", samples=1000, seed=None, workers=None, model=None):
+    """
+    Run every fold, concurrently across a process pool
+    Returns (fold results, TradeStore of out-of-sample trades)
+    """
+    space = space or ps.DEFAULT_SEARCH_SPACE
+    series = ps.load_series(files, space, intrabar=model is not None)
+    for s in series:
+        s["day"] = series_day(s)
+    folds = make_folds([s["day"] for s in series], train_days, test_days, anchored)
+    if not folds:
+        raise ValueError(f"Need at least {train_days + test_days} trading days for one fold")
+    if mode == "grid":
+        combos = list(ps.grid_combinations(space))
+    else:
+        combos = list(ps.random_combinations(space, samples, seed))
+
+    logger.info(f"🔁 {len(folds)} {'anchored' if anchored else 'rolling'} folds x {len(combos)} combinations "
+                f"over {len(series)} series")
+    start = time.perf_counter()
+    if workers == 1:
+        results = [run_fold(fold, series, combos, model) for fold in folds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(series, combos, model)) as pool:
+            results = list(pool.map(run_fold, folds))
+    logger.info(f"✅ Walk-forward finished in {time.perf_counter() - start:.2f}s")
+
+    store = TradeStore()
+    for k, result in enumerate(results, 1):
+        for t in result["trades"]:
+            store.add(f"fold{k} {t['file']}", t["entry_time"], t["exit_time"], t["entry_price"],
+                      t["exit_price"], t["pnl"], t["pnl_pct"], t["candles"],
+                      group=f"FOLD_{k}", bars=t["bars"])
+    return results, store
+
+
+def fold_table(results):
+    """One row per fold: days, chosen parameters, in-sample and out-of-sample P&L"""
+    rows = []
+    for k, result in enumerate(results, 1):
+        test = dict(zip(ps.RESULT_COLUMNS, result["test"]))
+        rows.append({
+            "Fold": k,
+            "Train": f"{result['train_days'][0]}..{result['train_days'][-1]}",
+            "Test": ",".join(result["test_days"]),
+            **result["params"],
+            "IS_P&L": result["train"]["Total_P&L"],
+            "IS_Trades": result["train"]["Trades"],
+            "OOS_P&L": test["Total_P&L"],
+            "OOS_Trades": test["Trades"],
+        })
+    return pd.DataFrame(rows)
+
+
+def parameter_stability(table):
+    """Per parameter: distinct values chosen, the most common one and how often it won"""
+    rows = []
+    for name in ps.PARAM_ORDER:
+        counts = table[name].value_counts()
+        rows.append({
+            "Parameter": name,
+            "Distinct": len(counts),
+            "Mode": counts.index[0],
+            "Mode_Share%": counts.iloc[0] / len(table) * 100,
+            "Min": table[name].min(),
+            "Max": table[name].max(),
+        })
+    return pd.DataFrame(rows)
+
+
+# ================= MAIN =================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward optimisation of the EMA/ADX trailing-SL strategy")
+    parser.add_argument("--train-days", type=int, default=TRAIN_DAYS)
+    parser.add_argument("--test-days", type=int, default=TEST_DAYS)
+    parser.add_argument("--anchored", action="store_true", help="Train from the first day in every fold")
+    parser.add_argument("--mode", choices=["grid", "random"], default="grid")
+    parser.add_argument("--samples", type=int, default=1000, help="Combinations to draw in random mode")
+    parser.add_argument("--space", help="JSON file mapping parameter name to a list of values")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--intrabar", action="store_true", help="Check the SL against High/Low instead of Close")
+    parser.add_argument("--slippage", type=float, default=0.0, help="Points lost per market fill (with --intrabar)")
+    parser.add_argument("--output", default="walk_forward", help="Prefix for the folds/equity CSV files")
+    parser.add_argument("--pattern", default="NIFTY_*MIN_*.csv")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(args.pattern))
+    if not files:
+        logger.error("❌ No CSV files found. Make sure data files exist.")
+        exit()
+
+    space = dict(ps.DEFAULT_SEARCH_SPACE)
+    if args.space:
+        with open(args.space) as f:
+            space.update(json.load(f))
+    model = execution.ExecutionModel(args.slippage) if args.intrabar else None
+
+    results, store = run_walk_forward(files, space, args.train_days, args.test_days, args.anchored,
+                                      args.mode, args.samples, args.seed, args.workers, model)
+    table = fold_table(results)
+    stability = parameter_stability(table)
+    curve = equity_curve(store)
+
+    table.to_csv(f"{args.output}_folds.csv", index=False)
+    curve.rename_axis("Exit_Time").to_csv(f"{args.output}_equity.csv")
+    logger.info(f"\nFolds:\n{table.to_string(index=False)}")
+    logger.info(f"\nParameter stability:\n{stability.to_string(index=False)}")
+    logger.info(f"\nIn-sample P&L ₹{table['IS_P&L'].sum():.2f} vs out-of-sample P&L ₹{table['OOS_P&L'].sum():.2f}")
+    report(store, daily=True)
+    logger.info(f"✅ Fold table and stitched out-of-sample equity saved to {args.output}_folds.csv / _equity.csv")
@@ -0,0 +1,267 @@
+import argparse
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# =========================
+# WARM START
+# =========================
+# Periodic snapshots of what a live process needs to carry on after a restart: the
+# position book, trailing stops and streaming indicator state. Without them a restart
+# forgets open positions and rebuilds every indicator from the whole history.
+# The snapshot is one small binary file: a fixed header (magic, version, CRC32, length)
+# followed by a pickle of the state. It is written to a temporary file and moved into
+# place with os.replace, so a crash mid-write leaves the previous snapshot intact.
+# The state is intraday only, so a snapshot saved on another session day is ignored.
+
+SNAPSHOT_MAGIC = b"ATXSNAP"
+SNAPSHOT_VERSION = 2  # Bump when the saved state's layout changes; older files are ignored
+SNAPSHOT_INTERVAL = 5  # Seconds between periodic saves
+SNAPSHOT_FSYNC = True  # fsync before the rename, so the snapshot also survives a power cut
+IST_OFFSET = 19800  # Seconds; session days roll over at IST midnight
+HEADER = struct.Struct("<7sBIQ")  # magic, version, crc32, payload length
+
+
+def session_day(now=None):
+    """IST calendar day of a time.time() value (default: now)"""
+    now = time.time() if now is None else now
+    return time.strftime("%Y-%m-%d", time.gmtime(now + IST_OFFSET))
+
+
+def dumps(state, now=None):
+    now = time.time() if now is None else now
+    payload = pickle.dumps({"saved_at": now, "session": session_day(now), "state": state},
+                           protocol=pickle.HIGHEST_PROTOCOL)
+    return HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, zlib.crc32(payload), len(payload)) + payload
+
+
+def loads(blob):
+    if len(blob) < HEADER.size:
+        raise ValueError("truncated snapshot")
+    magic, version, crc, length = HEADER.unpack_from(blob)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"not a version {SNAPSHOT_VERSION} snapshot")
+    payload = blob[HEADER.size:HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise ValueError("truncated or corrupt snapshot")
+    return pickle.loads(payload)
+
+
+def write(path, blob, fsync=SNAPSHOT_FSYNC):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def save(path, state, fsync=SNAPSHOT_FSYNC):
+    """Atomically replace the snapshot at path; returns its size in bytes"""
+    blob = dumps(state)
+    write(path, blob, fsync)
+    return len(blob)
+
+
+def load(path, now=None):
+    """
+    The snapshot saved at path as {"saved_at", "session", "age", "state"}, or None
+    if there is none, it cannot be read, or it belongs to another session day.
+    """
+    if not os.path.exists(path):
+        return None
+    now = time.time() if now is None else now
+    try:
+        with open(path, "rb") as f:
+            saved = loads(f.read())
+    except Exception as e:
+        print(f"[warm start] Ignoring {path}: {e}")
+        return None
+    if saved["session"] != session_day(now):
+        print(f"[warm start] Ignoring {path}: saved on {saved['session']}")
+        return None
+    saved["age"] = now - saved["saved_at"]
+    return saved
+
+
+class Snapshotter:
+    """
+    Saves collect() to path every `interval` seconds on a background thread.
+    collect() and the pickling run under `lock` (the caller's state lock), so the
+    snapshot is consistent; the file write happens after the lock is released.
+    request() asks for a save as soon as possible (e.g. right after an order) without
+    blocking the caller, and stop() writes one last snapshot.
+    """
+
+    def __init__(self, path, collect, interval=SNAPSHOT_INTERVAL, lock=None, fsync=SNAPSHOT_FSYNC):
+        self.path = path
+        self.collect = collect
+        self.interval = interval
+        self.lock = lock
+        self.fsync = fsync
+        self.saves = 0
+        self.last_bytes = 0
+        self.last_seconds = 0.0  # Wall time of the last save, pickling and write included
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def save(self):
+        start = time.perf_counter()
+        if self.lock is None:
+            blob = dumps(self.collect())
+        else:
+            with self.lock:
+                blob = dumps(self.collect())
+        with self._write_lock:
+            write(self.path, blob, self.fsync)
+        self.saves += 1
+        self.last_bytes = len(blob)
+        self.last_seconds = time.perf_counter() - start
+        return len(blob)
+
+    def request(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.save()
+            except Exception as e:
+                print(f"[warm start] Snapshot failed: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="snapshot", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.save()
+
+
+# =========================
+# CHECK / BENCHMARK
+# =========================
+
+def _candles(rng, bars):
+    close = 200 + np.cumsum(rng.normal(0, 1.0, bars))
+    high = close + rng.uniform(0, 2, bars)
+    low = close - rng.uniform(0, 2, bars)
+    volume = rng.integers(1_000, 50_000, bars).astype(np.float64)
+    return high, low, close, volume
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from position_book import PositionBook
+    from position_monitor import TrailingStop
+    from scalp_strategy import scalp_indicator_state
+
+    parser = argparse.ArgumentParser(description="Check and time warm-start snapshots")
+    parser.add_argument("--symbols", type=int, default=50, help="Streaming indicator states")
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--bars", type=int, default=375, help="Candles already seen per symbol")
+    parser.add_argument("--gap", type=int, default=15, help="Candles that close after the snapshot")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    symbols = [f"SIM{k}" for k in range(args.symbols)]
+    history = {symbol: _candles(rng, args.bars + args.gap) for symbol in symbols}
+
+    # Cold start: every indicator rebuilt from the full history
+    start = time.perf_counter()
+    states = {}
+    for symbol in symbols:
+        state = states[symbol] = scalp_indicator_state()
+        for high, low, close, volume in zip(*(column[:args.bars] for column in history[symbol])):
+            state.update(float(high), float(low), float(close), float(volume))
+        state.set_forming(close, high, low, close, volume)
+    cold = time.perf_counter() - start
+
+    book = PositionBook()
+    for k in range(args.positions):
+        entry = float(rng.uniform(50, 300))
+        side = ["BUY", "SELL"][k % 2]
+        sign = 1 if side == "BUY" else -1
+        book.open(f"OPT{k}", side, entry, entry - sign * 10, entry + sign * 18, 30, token=str(k),
+                  underlying=["NIFTY", "BANKNIFTY"][k % 2])
+    book.mark(prices={f"OPT{k}": float(rng.uniform(50, 300)) for k in range(args.positions)})
+    book.realized = -1234.5
+    stop = TrailingStop(100.0, 5, 10, 5)
+    for price in (104.0, 112.0, 118.5, 116.0):
+        stop.update(price)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bot.snapshot")
+        lock = threading.Lock()
+        snapshots = Snapshotter(path, lambda: {"positions": book.state(), "indicators": states, "stop": stop},
+                                lock=lock)
+        repeats = 20
+        start = time.perf_counter()
+        for _ in range(repeats):
+            with lock:
+                blob = dumps(snapshots.collect())
+        held = (time.perf_counter() - start) / repeats
+        start = time.perf_counter()
+        for _ in range(repeats):
+            snapshots.save()
+        saved_in = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        saved = load(path)
+        restored_in = time.perf_counter() - start
+        resumed = PositionBook()
+        resumed.restore(saved["state"]["positions"])
+        resumed_states = saved["state"]["indicators"]
+        resumed_stop = saved["state"]["stop"]
+
+        # Resuming must be exact: feed the gap to both and compare every indicator
+        mismatches = 0
+        start = time.perf_counter()
+        for symbol in symbols:
+            gap = [column[args.bars:] for column in history[symbol]]
+            for state in (states[symbol], resumed_states[symbol]):
+                for high, low, close, volume in zip(*gap):
+                    state.update(float(high), float(low), float(close), float(volume))
+                state.set_forming(close, high, low, close, volume)
+        gap_in = (time.perf_counter() - start) / 2
+        for symbol in symbols:
+            if states[symbol].snapshot(101.0) != resumed_states[symbol].snapshot(101.0):
+                mismatches += 1
+        prices = {f"OPT{k}": float(rng.uniform(50, 300)) for k in range(args.positions)}
+        if book.mark(prices=prices) != resumed.mark(prices=prices) or book.summary() != resumed.summary():
+            mismatches += 1
+        if [resumed_stop.update(p) for p in (121.0, 117.0)] != [stop.update(p) for p in (121.0, 117.0)]:
+            mismatches += 1
+
+        # A damaged or half-written file is ignored, not loaded
+        with open(path, "r+b") as f:
+            f.seek(len(blob) // 2)
+            f.write(b"\xff\xff\xff\xff")
+        corrupt_ignored = load(path) is None
+        write(path, dumps({}, now=time.time() - 86_400))
+        stale_ignored = load(path) is None
+
+    print(f"{args.symbols} indicator states, {args.positions} positions: snapshot {len(blob):,} bytes, "
+          f"{mismatches} mismatches after a {args.gap}-candle gap")
+    print(f"lock held {held * 1e3:.2f} ms   save {saved_in * 1e3:.2f} ms   load {restored_in * 1e3:.2f} ms   "
+          f"gap {gap_in * 1e3:.2f} ms   cold rebuild {cold * 1e3:.1f} ms")
+    print(f"corrupt file ignored: {corrupt_ignored}   other-day file ignored: {stale_ignored}")
+    exit(0 if mismatches == 0 and corrupt_ignored and stale_ignored else 1)